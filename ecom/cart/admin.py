@@ -1,3 +1,5 @@
 from django.contrib import admin
+from .models import CartItem
 
-# Register your models here.
+# Registrar el carrito persistente en el admin
+admin.site.register(CartItem)
@@ -1,5 +1,33 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
 from django.shortcuts import get_object_or_404
-from store.models import Book, Profile
+from store.models import Book, get_price_version
+from .models import CartItem
+
+
+# Clave de sesión con la instantánea de precios del carrito
+PRICE_SNAPSHOT_KEY = 'cart_prices'
+
+
+class CartLine():
+    """
+    Línea valorada del carrito: un libro con su cantidad y precios calculados.
+    
+    Atributos:
+        product (Book): Libro de la línea (proyección Book.objects.cart_lines())
+        quantity (int): Unidades en el carrito
+        unit_price (Decimal): Precio efectivo (Book.effective_price)
+        total (Decimal): unit_price * quantity
+    """
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+        self.unit_price = product.effective_price
+        self.total = self.unit_price * quantity
 
 
 class Cart():
@@ -18,7 +46,7 @@ class Cart():
     
     def __init__(self, request):
         """
-        Inicializa el carrito desde la sesión o crea uno nuevo.
+        Inicializa el carrito desde la sesión o crea uno nuevo (sin escribir en la sesión).
         
         Args:
             request: Objeto HttpRequest con información de sesión y usuario
@@ -26,24 +54,98 @@ class Cart():
         self.session = request.session
         self.request = request
 
-        # Obtener el carrito de la sesión si existe
-        cart = self.session.get('session_key')
+        # Obtener el carrito de la sesión si existe. Si el usuario es nuevo se usa
+        # un carrito vacío que solo se guarda en la sesión al modificarlo
+        # (ver _mark_dirty), para no crear sesiones en visitas sin carrito.
+        self.cart = self.session.get('session_key', {})
 
-        # Si el usuario es nuevo, crear un carrito vacío
-        if 'session_key' not in request.session:
-            cart = self.session['session_key'] = {}
+        # Líneas valoradas, calculadas bajo demanda (ver get_lines)
+        self._lines = None
+        self._lines_from_snapshot = False
+        self._total = 0
 
-        # Asegurar que el carrito esté disponible en toda la aplicación
-        self.cart = cart
 
+    def _mark_dirty(self):
+        """
+        Marca el carrito como modificado en esta petición.
+
+        Django guardará la sesión al final de la petición y, para usuarios
+        autenticados, CartPersistenceMiddleware escribirá el carrito en
+        CartItem una única vez (ver persist), en lugar de una vez por cambio.
+        """
+        self.session['session_key'] = self.cart
+        self.session.modified = True
+        self.request._cart_dirty = True
+        self._lines = None
+
+    def persist(self):
+        """
+        Guarda el carrito del usuario autenticado en la tabla CartItem.
+
+        Lo invoca CartPersistenceMiddleware al terminar la petición si el carrito
+        cambió. Escribe todas las líneas con un único upsert masivo y solo borra
+        filas si en la petición se eliminó algún producto del carrito.
+        """
+        if not self.request.user.is_authenticated:
+            return
+
+        user = self.request.user
+
+        # Descartar IDs de libros que ya no existen en el catálogo
+        product_ids = [int(product_id) for product_id in self.cart]
+        existing_ids = set(Book.objects.filter(id__in=product_ids).values_list('id', flat=True))
+
+        items = [
+            CartItem(user=user, book_id=int(product_id), quantity=quantity)
+            for product_id, quantity in self.cart.items()
+            if int(product_id) in existing_ids
+        ]
+
+        with transaction.atomic():
+            # Borrar las líneas eliminadas del carrito
+            if getattr(self.request, '_cart_removed', False):
+                CartItem.objects.filter(user=user).exclude(book_id__in=existing_ids).delete()
+
+            # Insertar o actualizar todas las líneas en una sola sentencia
+            if items:
+                CartItem.objects.bulk_create(
+                    items,
+                    update_conflicts=True,
+                    unique_fields=['user', 'book'],
+                    update_fields=['quantity', 'updated_at'],
+                )
+
+    def merge_saved(self):
+        """
+        Fusiona el carrito guardado del usuario con el carrito de la sesión.
+
+        Se usa al hacer login: lee las líneas de CartItem con una sola consulta
+        y añade las que no estén ya en la sesión (la sesión tiene prioridad, igual
+        que db_add). El resultado se escribe al final de la petición con un
+        único upsert (ver persist).
+        """
+        saved = {
+            str(book_id): quantity
+            for book_id, quantity in CartItem.objects.filter(user_id=self.request.user.id).values_list('book_id', 'quantity')
+        }
+
+        # Hay que escribir si la sesión tiene líneas que faltan en CartItem o
+        # con otra cantidad (el carrito anónimo), o si CartItem añade líneas
+        changed = any(saved.get(product_id) != quantity for product_id, quantity in self.cart.items())
+        for product_id, quantity in saved.items():
+            if product_id not in self.cart:
+                self.cart[product_id] = quantity
+                changed = True
+
+        if changed:
+            self._mark_dirty()
 
-        
     def db_add(self, product, quantity):
         """
-        Añade productos desde la base de datos (usado al cargar old_cart).
+        Añade productos desde la base de datos.
         
         Similar a add() pero acepta el product_id directamente como string.
-        Utilizado principalmente al restaurar el carrito desde old_cart al hacer login.
+        Para restaurar el carrito completo al hacer login usar merge_saved().
         
         Args:
             product (str o int): ID del producto
@@ -58,15 +160,8 @@ class Cart():
         else:
             self.cart[product_id] = int(product_qty)
 
-        # Marcar la sesión como modificada
-        self.session.modified = True
-
-        # Persistir en base de datos si está autenticado
-        if self.request.user.is_authenticated:
-            current_user = Profile.objects.filter(user_id=self.request.user.id)
-            cart_string = str(self.cart)
-            cart_string = cart_string.replace("'", '"')
-            current_user.update(old_cart=str(cart_string))
+            # Marcar la sesión como modificada (y el carrito como pendiente de persistir)
+            self._mark_dirty()
 
     
     def add(self, product, quantity):
@@ -74,7 +169,7 @@ class Cart():
         Añade un producto al carrito con la cantidad especificada.
         
         Si el producto ya existe en el carrito, no modifica la cantidad.
-        Para usuarios autenticados, persiste el carrito en la base de datos.
+        Para usuarios autenticados, el carrito se persiste al final de la petición.
         
         Args:
             product (Book): Instancia del libro a añadir
@@ -95,31 +190,219 @@ class Cart():
             # Guardar cantidad en el carrito
             self.cart[product_id] = int(product_qty)
 
-        # Marcar la sesión como modificada para que Django la guarde
-        self.session.modified = True
+            # Marcar la sesión como modificada para que Django la guarde
+            self._mark_dirty()
 
-        # Si el usuario está autenticado, guardar en base de datos
-        if self.request.user.is_authenticated:
-            # Obtener el perfil del usuario actual
-            current_user = Profile.objects.filter(user_id=self.request.user.id)
 
-            # Convertir el diccionario del carrito a string JSON
-            cart_string = str(self.cart)
-            cart_string = cart_string.replace("'", '"')
 
-            # Guardar en el campo old_cart del perfil
-            current_user.update(old_cart=str(cart_string))
+    
+    
+    def get_lines(self, use_snapshot=False):
+        """
+        Construye (una sola vez por petición) las líneas valoradas del carrito.
 
+        Realiza una única consulta a Book limitada a las columnas que necesitan
+        las plantillas y calcula para cada producto el precio unitario efectivo
+        (sale_price si está en oferta), el subtotal de la línea y el total.
+        El resultado se guarda en la instancia y se invalida al modificar el carrito.
 
+        Con use_snapshot=True las líneas se construyen desde la instantánea de
+        precios de la sesión si sigue vigente, sin consultar la base de datos.
+        Esos libros solo tienen id, nombre y precios (sin imagen ni descripción),
+        así que solo deben usarse en plantillas que no muestran más datos.
+
+        Args:
+            use_snapshot (bool): Permitir valorar el carrito desde la instantánea
+
+        Returns:
+            list[CartLine]: Líneas del carrito en el orden en que se añadieron
+
+        Ejemplo:
+            >>> for line in cart.get_lines():
+            ...     print(line.product.name, line.quantity, line.total)
+        """
+        if self._lines is None or (self._lines_from_snapshot and not use_snapshot):
+            products_by_id = self._load_snapshot() if use_snapshot else None
+            self._lines_from_snapshot = products_by_id is not None
+
+            if products_by_id is None:
+                products_by_id = self._fetch_products(self.cart.keys())
+                self._save_snapshot(products_by_id)
+
+            self._build_lines(products_by_id)
+
+        return self._lines
+
+    def _load_snapshot(self):
+        """
+        Reconstruye los libros del carrito desde la instantánea de precios.
+
+        Returns:
+            dict o None: {product_id (str): Book sin guardar con id, nombre y
+            precios}, o None si no hay instantánea, su versión no coincide con
+            la del catálogo o no cubre todos los productos del carrito.
+        """
+        snapshot = self.session.get(PRICE_SNAPSHOT_KEY)
+        if not snapshot or snapshot['version'] != get_price_version():
+            return None
+
+        prices = snapshot['prices']
+        if any(product_id not in prices for product_id in self.cart):
+            return None
+
+        products_by_id = {}
+        for product_id in self.cart:
+            name, price, sale_price, is_sale = prices[product_id]
+            product = Book(
+                id=int(product_id),
+                name=name,
+                price=Decimal(price),
+                sale_price=Decimal(sale_price),
+                is_sale=is_sale,
+            )
+            product.effective_price = product.get_effective_price()
+            products_by_id[product_id] = product
+        return products_by_id
+
+    def _save_snapshot(self, products_by_id):
+        """
+        Guarda en la sesión los precios de los libros del carrito recién consultados.
+
+        Solo escribe si la instantánea cambia, y nunca para carritos vacíos
+        (para no crear sesiones a visitantes sin carrito).
+        """
+        if not self.cart:
+            return
+
+        snapshot = {
+            'version': get_price_version(),
+            'prices': {
+                product_id: [product.name, str(product.price), str(product.sale_price), product.is_sale]
+                for product_id, product in products_by_id.items()
+                if product_id in self.cart
+            },
+        }
+        if self.session.get(PRICE_SNAPSHOT_KEY) != snapshot:
+            self.session[PRICE_SNAPSHOT_KEY] = snapshot
+
+    def _fetch_products(self, product_ids):
+        """
+        Consulta los libros indicados con la proyección de líneas del carrito.
+
+        Returns:
+            dict: Diccionario {product_id (str): Book}
+        """
+        products = Book.objects.cart_lines().filter(id__in=product_ids)
+        return {str(product.id): product for product in products}
+
+    def _build_lines(self, products_by_id):
+        """Calcula las líneas valoradas y el total a partir de los libros ya consultados."""
+        lines = []
+        total = 0
+        for product_id, quantity in self.cart.items():
+            product = products_by_id.get(product_id)
+            # El libro pudo ser eliminado del catálogo
+            if product is None:
+                continue
+            line = CartLine(product, quantity)
+            total += line.total
+            lines.append(line)
+
+        self._lines = lines
+        self._total = total
+
+    def apply(self, operations):
+        """
+        Aplica en una sola pasada una lista de operaciones sobre el carrito.
+
+        Cada operación es un diccionario con 'op' ('add', 'update' o 'remove'),
+        'product_id' y, salvo para 'remove', 'quantity'. 'add' respeta la misma
+        regla que add() (no modifica un producto que ya está en el carrito) y
+        'update' con cantidad 0 elimina el producto.
+
+        Todos los libros implicados (los del carrito y los de las operaciones)
+        se consultan con una única query, que además sirve para valorar las
+        líneas del carrito resultante (ver get_lines).
+
+        Args:
+            operations (list[dict]): Operaciones a aplicar, en orden
+
+        Returns:
+            list[dict]: Errores {'index', 'error'} de las operaciones rechazadas
+
+        Ejemplo:
+            >>> cart.apply([
+            ...     {'op': 'add', 'product_id': 5, 'quantity': 2},
+            ...     {'op': 'update', 'product_id': 3, 'quantity': 1},
+            ...     {'op': 'remove', 'product_id': 7},
+            ... ])
+            []
+        """
+        errors = []
+        parsed = []
+
+        # Validar las operaciones antes de consultar la base de datos
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                errors.append({'index': index, 'error': 'invalid'})
+                continue
+
+            action = operation.get('op')
+            if action not in ('add', 'update', 'remove'):
+                errors.append({'index': index, 'error': 'unknown_op'})
+                continue
+
+            try:
+                product_id = str(int(operation.get('product_id')))
+                quantity = int(operation.get('quantity', 1))
+            except (TypeError, ValueError):
+                errors.append({'index': index, 'error': 'invalid'})
+                continue
+
+            if quantity < 0 or (action == 'add' and quantity == 0):
+                errors.append({'index': index, 'error': 'invalid_quantity'})
+                continue
+
+            parsed.append((index, action, product_id, quantity))
+
+        # Una única consulta para todos los libros implicados
+        products_by_id = self._fetch_products(set(self.cart) | {product_id for _, _, product_id, _ in parsed})
+
+        changed = False
+        for index, action, product_id, quantity in parsed:
+            if action == 'remove' or (action == 'update' and quantity == 0):
+                if product_id in self.cart:
+                    del self.cart[product_id]
+                    self.request._cart_removed = True
+                    changed = True
+            elif product_id not in products_by_id:
+                errors.append({'index': index, 'error': 'not_found'})
+            elif action == 'add':
+                if product_id not in self.cart:
+                    self.cart[product_id] = quantity
+                    changed = True
+            elif self.cart.get(product_id) != quantity:
+                self.cart[product_id] = quantity
+                changed = True
+
+        if changed:
+            self._mark_dirty()
+
+        # Valorar el carrito resultante sin volver a consultar
+        self._build_lines(products_by_id)
+        self._lines_from_snapshot = False
+        self._save_snapshot(products_by_id)
+
+        errors.sort(key=lambda error: error['index'])
+        return errors
 
-    
-    
     def cart_total(self):
         """
         Calcula el precio total del carrito considerando ofertas.
         
-        Itera sobre todos los productos del carrito, aplicando el precio
-        de oferta (sale_price) cuando corresponda o el precio regular.
+        Lee el total de las líneas valoradas (ver get_lines), por lo que
+        no vuelve a consultar la base de datos si ya se calcularon o si la
+        instantánea de precios de la sesión sigue vigente.
         
         Returns:
             Decimal: Total a pagar por todos los productos del carrito
@@ -130,30 +413,35 @@ class Cart():
             >>> print(f"Total: €{total}")
             Total: €45.97
         """
-        # Obtener los IDs de los productos en el carrito
-        product_ids = self.cart.keys()
+        self.get_lines(use_snapshot=True)
+        return self._total
 
-        # Buscar esos productos en la base de datos
-        products = Book.objects.filter(id__in=product_ids)
+    def db_total(self):
+        """
+        Calcula el total del carrito en la base de datos con una única consulta.
 
-        # Obtener las cantidades del carrito
-        quantities = self.cart
+        Suma effective_price * cantidad de cada libro del carrito con un
+        SUM(CASE ...) en SQL, sin cargar filas ni usar la instantánea de la
+        sesión: es el importe que se cobra al procesar el pedido.
 
-        # Inicializar el total
-        total = 0
+        Returns:
+            Decimal: Total a pagar (0 si el carrito está vacío)
 
-        # Calcular el total considerando ofertas
-        for key, value in quantities.items():
-            key = int(key)  # Convertir la clave a entero
-            for product in products:
-                if product.id == key:
-                    # Aplicar precio de oferta si está activa
-                    if product.is_sale:
-                        total += product.sale_price * value
-                    else:
-                        total += product.price * value
+        Ejemplo:
+            >>> cart.db_total()
+            Decimal('45.97')
+        """
+        if not self.cart:
+            return Decimal('0')
 
-        return total
+        quantity = Case(
+            *[When(id=int(product_id), then=Value(quantity)) for product_id, quantity in self.cart.items()],
+            default=Value(0),
+        )
+        total = Book.objects.filter(id__in=[int(product_id) for product_id in self.cart]).aggregate(
+            total=Sum(F('effective_price') * quantity, output_field=DecimalField(max_digits=12, decimal_places=2))
+        )['total']
+        return total or Decimal('0')
 
 
 
@@ -168,21 +456,15 @@ class Cart():
     
     def get_prods(self):
         """
-        Obtiene los objetos Book completos de los productos en el carrito.
+        Obtiene los objetos Book de los productos en el carrito.
         
-        Consulta la base de datos para recuperar la información completa
-        (nombre, precio, imagen, etc.) de cada libro del carrito.
+        Reutiliza la consulta de get_lines(), con solo las columnas
+        que usan las plantillas (nombre, precio, imagen, etc.).
         
         Returns:
-            QuerySet: Conjunto de objetos Book presentes en el carrito
+            list: Objetos Book presentes en el carrito
         """
-        # Obtener IDs de productos del carrito
-        product_ids = self.cart.keys()
-        
-        # Buscar productos en la base de datos
-        products = Book.objects.filter(id__in=product_ids)
-        
-        return products
+        return [line.product for line in self.get_lines()]
     
     def get_quants(self):
         """
@@ -191,8 +473,7 @@ class Cart():
         Returns:
             dict: Diccionario {product_id: quantity}
         """
-        quantities = self.cart
-        return quantities
+        return {str(line.product.id): line.quantity for line in self.get_lines()}
     
     
     def update(self, product, quantity):
@@ -200,7 +481,7 @@ class Cart():
         Actualiza la cantidad de un producto específico en el carrito.
         
         Modifica la cantidad de unidades de un producto existente.
-        Para usuarios autenticados, sincroniza con la base de datos.
+        Para usuarios autenticados, se sincroniza al final de la petición.
         
         Args:
             product (int o str): ID del producto a actualizar
@@ -219,18 +500,12 @@ class Cart():
         # Obtener el carrito actual
         updated_cart = self.cart
 
-        # Actualizar la cantidad del producto
-        updated_cart[product_id] = product_qty
+        # Actualizar la cantidad del producto solo si cambia
+        if updated_cart.get(product_id) != product_qty:
+            updated_cart[product_id] = product_qty
 
-        # Marcar la sesión como modificada
-        self.session.modified = True
-
-        # Persistir en base de datos si el usuario está autenticado
-        if self.request.user.is_authenticated:
-            current_user = Profile.objects.filter(user_id=self.request.user.id)
-            cart_string = str(self.cart)
-            cart_string = cart_string.replace("'", '"')
-            current_user.update(old_cart=str(cart_string))
+            # Marcar la sesión como modificada (y el carrito como pendiente de persistir)
+            self._mark_dirty()
 
         return self.cart
     
@@ -240,7 +515,7 @@ class Cart():
         Elimina completamente un producto del carrito.
         
         Remueve el producto y todas sus unidades del carrito.
-        Actualiza la persistencia en base de datos para usuarios autenticados.
+        Para usuarios autenticados, se sincroniza al final de la petición.
         
         Args:
             product (int o str): ID del producto a eliminar
@@ -255,15 +530,21 @@ class Cart():
         # Eliminar del diccionario del carrito si existe
         if product_id in self.cart:
             del self.cart[product_id]
+            self.request._cart_removed = True
 
-        # Marcar la sesión como modificada
-        self.session.modified = True
+            # Marcar la sesión como modificada (y el carrito como pendiente de persistir)
+            self._mark_dirty()
 
-        # Actualizar base de datos para usuarios autenticados
-        if self.request.user.is_authenticated:
-            current_user = Profile.objects.filter(user_id=self.request.user.id)
-            cart_string = str(self.cart)
-            cart_string = cart_string.replace("'", '"')
-            current_user.update(old_cart=str(cart_string))
 
+def cart_for_request(request):
+    """
+    Retorna el carrito de la petición sin crear sesiones innecesariamente.
 
+    Si el visitante no tiene cookie de sesión ni se ha creado una sesión en
+    esta petición, no puede tener carrito: se devuelve un diccionario vacío
+    (que se comporta como un carrito vacío para len() y en las plantillas)
+    sin acceder a la sesión.
+    """
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES and not request.session.modified:
+        return {}
+    return Cart(request)
@@ -1,6 +1,21 @@
-from .cart import Cart
+from django.utils.functional import SimpleLazyObject
+from .cart import cart_for_request
+
 
-# Create context processor so our cart can work on all pages
 def cart(request):
-    # Return the default data from our Cart
-    return {'cart': Cart(request)}
\ No newline at end of file
+    """
+    Context processor que expone el carrito en todas las plantillas.
+
+    Devuelve un objeto perezoso: el carrito solo se construye cuando una
+    plantilla lo usa (p. ej. {{ cart|length }} en navbar.html). Si el visitante
+    no tiene cookie de sesión ni se ha creado una sesión en esta petición, no
+    puede tener carrito, así que se devuelve uno vacío sin tocar la sesión; de
+    este modo las páginas del catálogo no crean sesiones (ni envían su cookie)
+    a los visitantes anónimos.
+
+    Las páginas siguen llevando "Vary: Cookie": comprobar si el visitante ha
+    iniciado sesión (navbar) o tiene mensajes flash pendientes lee la sesión,
+    y la página cambia según esa cookie.
+    """
+    return {'cart': SimpleLazyObject(lambda: cart_for_request(request))}
+
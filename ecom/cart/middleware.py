@@ -0,0 +1,26 @@
+from .cart import Cart
+
+
+class CartPersistenceMiddleware:
+    """
+    Middleware que persiste el carrito de usuarios autenticados al final de la petición.
+
+    Las operaciones de Cart (add, update, delete, db_add) solo marcan el carrito
+    como modificado; este middleware hace una única escritura masiva en CartItem
+    cuando la respuesta ya está generada. Así, restaurar un carrito de 30 libros
+    al hacer login cuesta una escritura en lugar de 30.
+
+    Debe ir después de SessionMiddleware y AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        # Solo escribir si alguna operación modificó el carrito
+        if getattr(request, '_cart_dirty', False):
+            Cart(request).persist()
+
+        return response
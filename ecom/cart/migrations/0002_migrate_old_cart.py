@@ -0,0 +1,91 @@
+# Generated manually
+
+import json
+
+from django.db import migrations
+
+
+# Perfiles procesados por lote
+BATCH_SIZE = 500
+
+
+def old_cart_to_cart_items(apps, schema_editor):
+    """
+    Convierte los carritos serializados en Profile.old_cart en filas de CartItem.
+
+    Recorre los perfiles por lotes para no cargar la tabla entera en memoria.
+    Los carritos ilegibles (p. ej. truncados por el límite de 200 caracteres)
+    y los libros que ya no existen se descartan.
+    """
+    Profile = apps.get_model('store', 'Profile')
+    Book = apps.get_model('store', 'Book')
+    CartItem = apps.get_model('cart', 'CartItem')
+
+    profiles = (
+        Profile.objects.exclude(old_cart__isnull=True)
+        .exclude(old_cart='')
+        .values_list('user_id', 'old_cart')
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+
+    batch = []
+    for user_id, old_cart in profiles:
+        try:
+            saved_cart = json.loads(old_cart)
+        except ValueError:
+            continue
+        if not isinstance(saved_cart, dict):
+            continue
+
+        for book_id, quantity in saved_cart.items():
+            try:
+                batch.append((user_id, int(book_id), int(quantity)))
+            except (TypeError, ValueError):
+                continue
+
+        if len(batch) >= BATCH_SIZE:
+            _save_batch(Book, CartItem, batch)
+            batch = []
+
+    if batch:
+        _save_batch(Book, CartItem, batch)
+
+
+def _save_batch(Book, CartItem, batch):
+    """Inserta un lote de líneas (user_id, book_id, quantity) ignorando libros inexistentes."""
+    existing_ids = set(
+        Book.objects.filter(id__in={book_id for _, book_id, _ in batch}).values_list('id', flat=True)
+    )
+    CartItem.objects.bulk_create(
+        [
+            CartItem(user_id=user_id, book_id=book_id, quantity=quantity)
+            for user_id, book_id, quantity in batch
+            if book_id in existing_ids and quantity > 0
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def cart_items_to_old_cart(apps, schema_editor):
+    """Operación inversa: vuelve a serializar los carritos en Profile.old_cart."""
+    Profile = apps.get_model('store', 'Profile')
+    CartItem = apps.get_model('cart', 'CartItem')
+
+    carts = {}
+    for user_id, book_id, quantity in CartItem.objects.values_list('user_id', 'book_id', 'quantity').iterator(chunk_size=BATCH_SIZE):
+        carts.setdefault(user_id, {})[str(book_id)] = quantity
+
+    for user_id, saved_cart in carts.items():
+        Profile.objects.filter(user_id=user_id).update(old_cart=json.dumps(saved_cart, separators=(',', ':')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0001_initial'),
+        ('store', '0006_rename_product_to_book'),
+    ]
+
+    operations = [
+        migrations.RunPython(old_cart_to_cart_items, cart_items_to_old_cart),
+    ]
@@ -1,3 +1,36 @@
 from django.db import models
+from django.contrib.auth.models import User
+from store.models import Book
 
-# Create your models here.
+
+class CartItem(models.Model):
+    """
+    Línea del carrito persistente de un usuario autenticado.
+
+    Sustituye al antiguo campo Profile.old_cart (un diccionario serializado
+    en un CharField de 200 caracteres): cada libro del carrito es una fila,
+    por lo que no hay límite de tamaño y el carrito se puede consultar.
+
+    Atributos:
+        user (ForeignKey): Usuario propietario del carrito
+        book (ForeignKey): Libro añadido al carrito
+        quantity (PositiveIntegerField): Unidades del libro
+        updated_at (DateTimeField): Fecha de la última modificación de la línea
+
+    Nota:
+        La pareja (user, book) es única, lo que permite escribir el carrito
+        completo con un único bulk_create(update_conflicts=True).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cart_items')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='unique_cart_item_per_user'),
+        ]
+
+    def __str__(self):
+        """Retorna identificador de la línea del carrito."""
+        return f'Cart Item - {self.user_id}:{self.book_id}'
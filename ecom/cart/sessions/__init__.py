@@ -0,0 +1,59 @@
+import hashlib
+import time
+
+from django.conf import settings
+
+
+# Clave de la sesión con el momento (timestamp) de su última escritura
+SAVED_AT_KEY = '_saved_at'
+
+# Segundos tras los que una sesión sin cambios se reescribe igualmente, para
+# renovar su caducidad (expire_date) mientras el usuario siga activo
+SESSION_REFRESH_AGE = getattr(settings, 'SESSION_REFRESH_AGE', 24 * 60 * 60)
+
+
+class SkipUnchangedSaveMixin:
+    """
+    Mixin para backends de sesión que evita reescribir sesiones que no cambiaron.
+
+    Django guarda la fila completa de la sesión cada vez que session.modified
+    es True, aunque el contenido sea idéntico. Este mixin calcula una huella del
+    contenido al cargar la sesión y, al guardar, compara con la huella del
+    contenido actual: si coinciden no se escribe nada, salvo que la última
+    escritura tenga más de SESSION_REFRESH_AGE segundos: entonces se guarda
+    para renovar la caducidad y que las sesiones activas no caduquen.
+
+    Los datos se guardan con la codificación de Django (JSON compacto, firmado
+    y comprimido con zlib cuando reduce el tamaño).
+
+    Nota:
+        Con SESSION_SAVE_EVERY_REQUEST = True la comparación se desactiva,
+        porque en ese modo la escritura sirve para renovar la caducidad.
+    """
+
+    _loaded_fingerprint = None
+
+    def _fingerprint(self, session_dict):
+        """Retorna una huella del contenido serializado de la sesión."""
+        return hashlib.blake2b(self.serializer().dumps(session_dict), digest_size=16).digest()
+
+    def load(self):
+        data = super().load()
+        self._loaded_fingerprint = self._fingerprint(data)
+        return data
+
+    def save(self, must_create=False):
+        if (
+            not must_create
+            and not settings.SESSION_SAVE_EVERY_REQUEST
+            and self.session_key is not None
+            and self._loaded_fingerprint is not None
+            and self._fingerprint(self._get_session()) == self._loaded_fingerprint
+            and time.time() - self._get_session().get(SAVED_AT_KEY, 0) < SESSION_REFRESH_AGE
+        ):
+            # El contenido no cambió y la caducidad guardada es reciente: no hay nada que escribir
+            return
+
+        self._get_session()[SAVED_AT_KEY] = int(time.time())
+        super().save(must_create)
+        self._loaded_fingerprint = self._fingerprint(self._get_session())
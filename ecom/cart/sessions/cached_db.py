@@ -0,0 +1,14 @@
+from django.contrib.sessions.backends import cached_db
+
+from . import SkipUnchangedSaveMixin
+
+
+class SessionStore(SkipUnchangedSaveMixin, cached_db.SessionStore):
+    """
+    Backend de sesiones con lectura desde caché y respaldo en base de datos.
+
+    Lee primero de la caché y solo consulta la tabla de sesiones si la sesión
+    no está cacheada. Como el backend de db, no reescribe sesiones sin cambios.
+
+    Uso: SESSION_ENGINE = 'cart.sessions.cached_db'
+    """
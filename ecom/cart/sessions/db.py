@@ -0,0 +1,11 @@
+from django.contrib.sessions.backends import db
+
+from . import SkipUnchangedSaveMixin
+
+
+class SessionStore(SkipUnchangedSaveMixin, db.SessionStore):
+    """
+    Backend de sesiones en base de datos que no reescribe sesiones sin cambios.
+
+    Uso: SESSION_ENGINE = 'cart.sessions.db'
+    """
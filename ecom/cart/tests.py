@@ -1,3 +1,138 @@
+import json
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
 from django.test import TestCase
+from django.urls import reverse
+
+from store.models import Book, Category
+from .models import CartItem
+from .sessions import SAVED_AT_KEY, SESSION_REFRESH_AGE
+from .sessions.db import SessionStore
+
+
+class CartTestCase(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Teatro')
+        self.b1 = Book.objects.create(name='Hamlet', price=10, category=category)
+        self.b2 = Book.objects.create(name='Macbeth', price=8, category=category)
+        self.user = User.objects.create_user('ana', password='secreta-123')
+
+    def add(self, book, quantity=1):
+        return self.client.post(reverse('cart_add'), {'action': 'post', 'product_id': book.pk, 'product_qty': quantity})
+
+    def saved_cart(self):
+        return dict(CartItem.objects.filter(user=self.user).values_list('book_id', 'quantity'))
+
+
+class LoginMergeTests(CartTestCase):
+
+    def login(self):
+        self.client.post(reverse('login'), {'username': 'ana', 'password': 'secreta-123'})
+
+    def test_session_only_lines_are_saved_on_login(self):
+        CartItem.objects.create(user=self.user, book=self.b1, quantity=3)
+        self.add(self.b2, 2)
+        self.add(self.b1, 1)
+
+        self.login()
+
+        # La sesión tiene prioridad; b2 solo estaba en la sesión y debe guardarse
+        self.assertEqual(self.saved_cart(), {self.b1.pk: 1, self.b2.pk: 2})
+
+    def test_saved_lines_are_restored_on_login(self):
+        CartItem.objects.create(user=self.user, book=self.b1, quantity=3)
+        self.login()
+        self.assertEqual(self.client.session['session_key'], {str(self.b1.pk): 3})
+        self.assertEqual(self.saved_cart(), {self.b1.pk: 3})
+
+
+class CartBulkTests(CartTestCase):
+
+    def bulk(self, operations):
+        return self.client.post(reverse('cart_bulk'), json.dumps({'operations': operations}), content_type='application/json')
+
+    def test_operations_are_applied_in_order(self):
+        self.add(self.b2, 5)
+        response = self.bulk([
+            {'op': 'add', 'product_id': self.b1.pk, 'quantity': 2},
+            {'op': 'add', 'product_id': self.b1.pk, 'quantity': 9},
+            {'op': 'update', 'product_id': self.b2.pk, 'quantity': 1},
+        ])
+
+        data = response.json()
+        # add no modifica un producto que ya está en el carrito
+        self.assertEqual({item['product_id']: item['quantity'] for item in data['items']}, {self.b1.pk: 2, self.b2.pk: 1})
+        self.assertEqual((data['count'], data['quantity'], data['total']), (2, 3, '28.00'))
+        self.assertEqual(data['errors'], [])
+
+    def test_remove_and_update_to_zero_delete_lines(self):
+        self.add(self.b1)
+        self.add(self.b2)
+        data = self.bulk([
+            {'op': 'remove', 'product_id': self.b1.pk},
+            {'op': 'update', 'product_id': self.b2.pk, 'quantity': 0},
+        ]).json()
+        self.assertEqual((data['items'], data['count'], data['quantity']), ([], 0, 0))
+
+    def test_rejected_operations_do_not_stop_the_rest(self):
+        data = self.bulk([
+            {'op': 'buy', 'product_id': self.b1.pk},
+            {'op': 'add', 'product_id': 'x'},
+            {'op': 'add', 'product_id': self.b1.pk, 'quantity': 0},
+            {'op': 'add', 'product_id': 999999, 'quantity': 1},
+            {'op': 'add', 'product_id': self.b2.pk, 'quantity': 3},
+        ]).json()
+        self.assertEqual(data['errors'], [
+            {'index': 0, 'error': 'unknown_op'},
+            {'index': 1, 'error': 'invalid'},
+            {'index': 2, 'error': 'invalid_quantity'},
+            {'index': 3, 'error': 'not_found'},
+        ])
+        self.assertEqual([(item['product_id'], item['quantity']) for item in data['items']], [(self.b2.pk, 3)])
+
+    def test_invalid_payload_is_a_400(self):
+        for body in ('no es json', json.dumps({'ops': []}), json.dumps({'operations': {}})):
+            with self.subTest(body=body):
+                response = self.client.post(reverse('cart_bulk'), body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_changes_are_kept_in_the_session(self):
+        self.bulk([{'op': 'add', 'product_id': self.b1.pk, 'quantity': 2}])
+        self.assertEqual(self.client.session['session_key'], {str(self.b1.pk): 2})
+
+
+class SkipUnchangedSaveTests(TestCase):
+
+    def setUp(self):
+        store = SessionStore()
+        store['session_key'] = {'1': 2}
+        store.save(must_create=True)
+        self.key = store.session_key
+
+    def expire_date(self):
+        return Session.objects.get(session_key=self.key).expire_date
+
+    def resave(self):
+        store = SessionStore(self.key)
+        store['session_key'] = {'1': 2}
+        store.save()
+
+    def test_unchanged_session_is_not_rewritten(self):
+        Session.objects.filter(session_key=self.key).update(expire_date=self.expire_date() - timedelta(hours=1))
+        before = self.expire_date()
+        self.resave()
+        self.assertEqual(self.expire_date(), before)
 
-# Create your tests here.
+    def test_unchanged_session_is_refreshed_when_old(self):
+        saved_at = int(time.time()) - SESSION_REFRESH_AGE - 1
+        Session.objects.filter(session_key=self.key).update(
+            session_data=SessionStore().encode({'session_key': {'1': 2}, SAVED_AT_KEY: saved_at}),
+            expire_date=self.expire_date() - timedelta(days=2),
+        )
+        before = self.expire_date()
+        self.resave()
+        self.assertGreater(self.expire_date(), before)
@@ -7,4 +7,6 @@ urlpatterns = [
     path('add/', views.cart_add, name="cart_add"),
     path('delete/', views.cart_delete, name="cart_delete"),
     path('update/', views.cart_update, name="cart_update"),
+    path('bulk/', views.cart_bulk, name="cart_bulk"),
+    path('badge/', views.cart_badge, name="cart_badge"),
 ]
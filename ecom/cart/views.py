@@ -1,15 +1,18 @@
 from django.shortcuts import render, get_object_or_404
-from .cart import Cart
+from .cart import Cart, cart_for_request
 from store.models import Book
 from django.http import JsonResponse
 from django.contrib import messages
+from django.views.decorators.http import require_POST
+import json
 
 
 def cart_summary(request):
     """
     Vista que muestra el resumen completo del carrito de compras.
     
-    Obtiene los productos del carrito, sus cantidades y el total a pagar.
+    Obtiene las líneas valoradas del carrito (producto, cantidad, subtotal)
+    y el total a pagar con una sola consulta a la base de datos.
     
     Args:
         request (HttpRequest): Objeto de solicitud HTTP.
@@ -18,10 +21,26 @@ def cart_summary(request):
         HttpResponse: Página con el resumen del carrito incluyendo productos, cantidades y total.
     """
     cart = Cart(request)
-    cart_products = cart.get_prods()
-    quantities = cart.get_quants()
+    cart_lines = cart.get_lines()
     totals = cart.cart_total()
-    return render(request, "cart_summary.html", {'cart_products': cart_products, "quantities": quantities, "totals": totals})
+    return render(request, "cart_summary.html", {'cart_lines': cart_lines, "totals": totals})
+
+def cart_badge(request):
+    """
+    Vista JSON con el número de productos del carrito (contador del navbar).
+    
+    Las páginas del catálogo cacheadas para visitantes anónimos no incluyen el
+    contador; el navegador lo pide a esta vista, que solo lee la sesión.
+    
+    Args:
+        request (HttpRequest): Objeto de solicitud HTTP.
+    
+    Returns:
+        JsonResponse: {'count': número de productos distintos en el carrito}
+    """
+    response = JsonResponse({'count': len(cart_for_request(request))})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
 
 def cart_add(request):
     """
@@ -132,3 +151,58 @@ def cart_update(request):
         messages.success(request, "Tu carrito ha sido añadido")
 
         return response
+
+
+@require_POST
+def cart_bulk(request):
+    """
+    Vista AJAX para aplicar varias operaciones sobre el carrito en una sola petición.
+    
+    Recibe un cuerpo JSON con una lista de operaciones add/update/remove, las aplica
+    con una única consulta de productos y devuelve el estado completo del carrito,
+    de modo que el cliente no necesita recargar cart_summary. No añade mensajes
+    flash a la sesión.
+    
+    Args:
+        request (HttpRequest): Solicitud POST con cuerpo JSON {'operations': [...]}.
+    
+    Returns:
+        JsonResponse: Líneas del carrito, número de productos, unidades, total y
+        errores de las operaciones rechazadas. 400 si el cuerpo no es válido.
+    
+    Ejemplos:
+        POST {"operations": [{"op": "add", "product_id": 5, "quantity": 2},
+                             {"op": "remove", "product_id": 3}]}
+        Retorna {"items": [{"product_id": 5, "name": "...", "quantity": 2,
+                 "unit_price": "9.99", "total": "19.98"}], "count": 1,
+                 "quantity": 2, "total": "19.98", "errors": []}
+    """
+    try:
+        payload = json.loads(request.body)
+        operations = payload['operations']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'invalid_payload'}, status=400)
+
+    if not isinstance(operations, list):
+        return JsonResponse({'error': 'invalid_payload'}, status=400)
+
+    cart = Cart(request)
+    errors = cart.apply(operations)
+    lines = cart.get_lines()
+
+    return JsonResponse({
+        'items': [
+            {
+                'product_id': line.product.id,
+                'name': line.product.name,
+                'quantity': line.quantity,
+                'unit_price': line.unit_price,
+                'total': line.total,
+            }
+            for line in lines
+        ],
+        'count': len(cart),
+        'quantity': sum(line.quantity for line in lines),
+        'total': cart.cart_total(),
+        'errors': errors,
+    })
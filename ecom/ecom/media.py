@@ -0,0 +1,178 @@
+"""
+Servido de archivos de MEDIA_ROOT (portadas subidas y sus variantes).
+
+Sustituye a django.conf.urls.static.static(), que solo funciona con DEBUG y
+lee los archivos enteros sin cabeceras de caché. Este servido:
+
+    - Responde 304 a If-None-Match / If-Modified-Since.
+    - Admite peticiones Range de un solo rango (206 / 416).
+    - Envía Cache-Control inmutable para los nombres con hash de contenido
+      (store.images.content_name y sus variantes) y una caché corta con
+      revalidación para el resto.
+    - Con MEDIA_SENDFILE delega la transferencia en el proxy
+      (X-Accel-Redirect de nginx o X-Sendfile de Apache/lighttpd), de modo
+      que el worker de Django solo responde las cabeceras.
+"""
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from store.images import is_content_named
+
+
+# None (servir desde Django), 'x-accel-redirect' (nginx) o 'x-sendfile' (Apache, lighttpd)
+MEDIA_SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)
+
+# Prefijo interno de nginx (location ... { internal; alias MEDIA_ROOT; }) para X-Accel-Redirect
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Caché de los archivos sin hash en el nombre (pueden cambiar sin cambiar de URL)
+MEDIA_CACHE_MAX_AGE = getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Tamaño de los bloques al servir un rango desde Django
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """
+    Interpreta una cabecera Range de un solo rango.
+
+    Returns:
+        tuple | None | bool: (inicio, fin inclusivo), None si no hay que servir
+            un rango (cabecera ausente, inválida o con varios rangos: se
+            responde el archivo completo) o False si el rango no es satisfacible.
+
+    Ejemplo:
+        >>> _parse_range('bytes=0-99', 1000)
+        (0, 99)
+        >>> _parse_range('bytes=-100', 1000)
+        (900, 999)
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Sufijo: los últimos N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    """Generador que lee length bytes del archivo a partir de start."""
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Vista que sirve un archivo de MEDIA_ROOT.
+
+    Args:
+        request (HttpRequest): Solicitud GET o HEAD
+        path (str): Ruta del archivo relativa a MEDIA_ROOT
+
+    Returns:
+        HttpResponse: 200 con el archivo, 206 con un rango, 304 si el cliente
+            ya lo tiene, 416 si el rango no es válido o 404 si no existe.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404('Ruta no válida')
+
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('El archivo no existe')
+    if not os.path.isfile(full_path):
+        raise Http404('El archivo no existe')
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    if is_content_named(path):
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        cache_control = f'public, max-age={MEDIA_CACHE_MAX_AGE}'
+
+    def with_headers(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = formatdate(last_modified, usegmt=True)
+        response['Cache-Control'] = cache_control
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return with_headers(not_modified)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    # El proxy sirve el archivo (con sus propios Range y sendfile)
+    if MEDIA_SENDFILE:
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + path
+        else:
+            response['X-Sendfile'] = full_path
+        return with_headers(response)
+
+    size = stat.st_size
+    byte_range = _parse_range(request.headers.get('Range'), size)
+
+    # If-Range: solo se sirve el rango si el cliente tiene la misma versión
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and etag not in parse_etags(if_range):
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return with_headers(response)
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_read_range(full_path, start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+        return with_headers(response)
+
+    # Archivo completo: FileResponse usa wsgi.file_wrapper (sendfile) si el servidor lo ofrece
+    response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return with_headers(response)
@@ -45,10 +45,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Serves collected static files (precompressed, immutable) before sessions/auth
+    'ecom.staticfiles.PrecompressedStaticMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cart.middleware.CartPersistenceMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,7 +68,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'cart.context_processors.cart'
+                'cart.context_processors.cart',
+                'store.context_processors.categories',
             ],
         },
     },
@@ -81,10 +85,49 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Seconds to wait for the write lock. Stock transactions take it at
+            # BEGIN (see payment.stock.stock_transaction) so checkouts queue up.
+            'timeout': 20,
+        },
+        # File-based test database: the in-memory one cannot be shared by the
+        # concurrent connections of the stock tests (payment/tests.py).
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+
+# Cache
+# Must be shared by every worker process and by the management commands: the
+# invalidation versions of the page cache, the cart price snapshots, the
+# category menu and the suggestion index live here (see store/cache.py). A
+# per-process cache (LocMemCache, DummyCache) would leave the other workers
+# serving stale pages and 304s, so the system check store.E001 rejects it.
+# The database cache needs `python manage.py createcachetable`; in production
+# prefer Redis or Memcached, e.g.
+#     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#     'LOCATION': 'redis://127.0.0.1:6379',
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'ecom_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
 
 
+# Sessions
+# Skips rewriting the session row when its content did not change.
+# Use 'cart.sessions.cached_db' for cache-first reads with a DB fallback.
+
+SESSION_ENGINE = 'cart.sessions.db'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -121,10 +164,29 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 STATICFILES_DIRS = ['static/']
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic writes content-hashed, minified files plus .gz/.br siblings
+# (see ecom/staticfiles.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'ecom.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media files are served by ecom.media.serve_media. Behind nginx set this to
+# 'x-accel-redirect' (with an internal location at MEDIA_ACCEL_PREFIX aliased
+# to MEDIA_ROOT), or to 'x-sendfile' for Apache/lighttpd, so the proxy streams
+# the file instead of a Django worker.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
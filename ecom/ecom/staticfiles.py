@@ -0,0 +1,243 @@
+"""
+Archivos estáticos con hash en el nombre, minificados y precomprimidos.
+
+En collectstatic, CompressedManifestStaticFilesStorage:
+
+    1. Minifica el CSS y el JS copiados (rcssmin / rjsmin si están
+       instalados; sin rcssmin se usa un minificador de CSS conservador y sin
+       rjsmin el JS se deja como está).
+    2. Copia los archivos con el hash de su contenido ya minificado en el
+       nombre (styles.css -> styles.1a2b3c4d5e6f.css) y reescribe las url()
+       del CSS (ManifestStaticFilesStorage de Django).
+    3. Escribe junto a cada archivo comprimible una versión .gz y, si está
+       instalado el paquete brotli, una versión .br.
+
+PrecompressedStaticMiddleware sirve esos archivos desde STATIC_ROOT eligiendo
+la versión comprimida según Accept-Encoding, con Cache-Control inmutable para
+los nombres con hash: los visitantes recurrentes no vuelven a descargarlos.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+# Extensiones que merece la pena comprimir (las imágenes ya van comprimidas)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.map', '.ico')
+
+# Codificaciones precomprimidas, en orden de preferencia: (Content-Encoding, extensión)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Nombres con el hash de ManifestStaticFilesStorage (12 caracteres hexadecimales)
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Caché de los archivos sin hash (favicon enlazado por nombre fijo, etc.)
+STATIC_CACHE_MAX_AGE = getattr(settings, 'STATIC_CACHE_MAX_AGE', 60 * 60)
+
+CSS_STRING_RE = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')')
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_WHITESPACE_RE = re.compile(r'\s+')
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(content):
+    """
+    Minifica una hoja de estilos.
+
+    Usa rcssmin si está instalado. Si no, elimina comentarios y espacios
+    sobrantes fuera de las cadenas, sin tocar los ':' (necesarios en
+    selectores como 'a :hover').
+    """
+    if rcssmin is not None:
+        return rcssmin.cssmin(content)
+
+    parts = CSS_STRING_RE.split(content)
+    for index in range(0, len(parts), 2):
+        # Las posiciones pares quedan fuera de las cadenas
+        part = CSS_COMMENT_RE.sub('', parts[index])
+        part = CSS_WHITESPACE_RE.sub(' ', part)
+        parts[index] = CSS_PUNCTUATION_RE.sub(r'\1', part)
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def minify_js(content):
+    """Minifica JavaScript con rjsmin si está instalado; si no, lo deja igual."""
+    if rjsmin is not None:
+        return rjsmin.jsmin(content)
+    return content
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def minify_file(path, minify):
+    """Minifica un archivo de texto en su sitio (solo lo reescribe si cambia)."""
+    with open(path, encoding='utf-8') as file:
+        content = file.read()
+    minified = minify(content)
+    if minified != content:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(minified)
+
+
+def write_compressed(path):
+    """
+    Escribe las versiones .gz (y .br si hay brotli) de un archivo.
+
+    Solo se conservan si ocupan menos que el original.
+
+    Returns:
+        list[str]: Rutas escritas
+    """
+    with open(path, 'rb') as file:
+        content = file.read()
+
+    compressed = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['.br'] = brotli.compress(content, quality=11)
+
+    written = []
+    for extension, data in compressed.items():
+        if len(data) < len(content):
+            with open(path + extension, 'wb') as file:
+                file.write(data)
+            written.append(path + extension)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage que además minifica y precomprime los archivos.
+
+    Si un archivo no está en el manifiesto (entorno de desarrollo o tests sin
+    collectstatic), {% static %} usa su nombre sin hash en lugar de fallar.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run=dry_run, **options)
+            return
+
+        # Minificar antes de calcular los hashes, para que el nombre con hash
+        # corresponda al contenido que se sirve: los originales se leen de las
+        # copias ya minificadas de STATIC_ROOT en lugar de las carpetas de origen
+        for name in paths:
+            path = self.path(name)
+            minify = MINIFIERS.get(os.path.splitext(name)[1].lower())
+            # Con collectstatic --link la copia es un enlace al archivo de origen
+            if minify is not None and not os.path.islink(path):
+                minify_file(path, minify)
+        paths = {name: (self, name) for name in paths}
+
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+        for name in self.hashed_files.values():
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                write_compressed(self.path(name))
+
+
+def _accepted_encodings(request):
+    """Codificaciones aceptadas por el cliente (sin las marcadas con q=0)."""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Sirve los archivos de STATIC_ROOT sin pasar por el resto de la aplicación.
+
+    Para cada petición bajo STATIC_URL elige la mejor versión que acepte el
+    cliente (.br, .gz o la original), la envía con FileResponse (que usa
+    sendfile a través de wsgi.file_wrapper, sin copias en Python) y responde
+    304 a las revalidaciones. Los nombres con hash se cachean un año como
+    inmutables. Si el archivo no existe en STATIC_ROOT (desarrollo sin
+    collectstatic) la petición sigue su curso normal.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.static_url = settings.STATIC_URL
+        self.static_root = settings.STATIC_ROOT
+
+    def __call__(self, request):
+        if self.static_root and request.method in ('GET', 'HEAD') and request.path.startswith(self.static_url):
+            response = self.serve(request, request.path[len(self.static_url):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        """Respuesta para el archivo estático name, o None si no existe."""
+        try:
+            path = safe_join(self.static_root, name)
+        except (SuspiciousFileOperation, ValueError):
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        content_encoding = None
+
+        accepted = _accepted_encodings(request)
+        if name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            for encoding, extension in ENCODINGS:
+                if encoding in accepted and os.path.isfile(path + extension):
+                    path, content_encoding = path + extension, encoding
+                    break
+
+        stat = os.stat(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + content_encoding if content_encoding else ""}"'
+        last_modified = int(stat.st_mtime)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+            if content_encoding:
+                response['Content-Encoding'] = content_encoding
+
+        response['ETag'] = etag
+        response['Last-Modified'] = formatdate(last_modified, usegmt=True)
+        if HASHED_NAME_RE.search(name):
+            response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response['Cache-Control'] = f'public, max-age={STATIC_CACHE_MAX_AGE}'
+        if name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from . import settings
-from django.conf.urls.static import static
+from .media import serve_media
 
 
 urlpatterns = [
@@ -26,5 +26,6 @@ urlpatterns = [
     path('cart/', include('cart.urls')),
     path('payment/', include('payment.urls')),
 
-
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Archivos subidos (portadas); ver ecom/media.py para servirlos desde el proxy
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", serve_media, name='media'),
+]
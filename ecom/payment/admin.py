@@ -1,11 +1,12 @@
 
 from django.contrib import admin
-from .models import ShippingAddress, Order, OrderItem
+from .models import ShippingAddress, Order, OrderItem, StockReservation
 
 # Register the model on the admin section
 admin.site.register(ShippingAddress)
 admin.site.register(Order)
 admin.site.register(OrderItem)
+admin.site.register(StockReservation)
 
 
 # Create an OrderItem Inline
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from payment.stock import release_expired
+
+
+class Command(BaseCommand):
+    """
+    Devuelve al stock las unidades de las reservas de checkout caducadas.
+
+    El checkout ya las libera de forma perezosa; este comando (por ejemplo,
+    cada minuto desde cron) evita que los libros poco visitados queden
+    apartados hasta el siguiente checkout.
+
+    Uso:
+        python manage.py release_stock_reservations
+    """
+    help = 'Libera las reservas de stock caducadas'
+
+    def handle(self, *args, **options):
+        released = release_expired()
+        self.stdout.write(self.style.SUCCESS(f'{released} reservas liberadas'))
@@ -162,3 +162,25 @@ class OrderItem(models.Model):
         """Retorna identificador del ítem de pedido."""
         return f'Order Item - {str(self.id)}'
 
+
+class StockReservation(models.Model):
+    """
+    Unidades de un libro apartadas durante el checkout.
+
+    Se crean en billing_info descontando ya las unidades de Book.stock, de modo
+    que otro cliente no pueda comprarlas mientras se completa el pago. Si el
+    pedido no se confirma antes de expires_at, las unidades vuelven al stock
+    (ver payment.stock.release_expired).
+
+    Atributos:
+        book (ForeignKey): Libro reservado
+        quantity (PositiveIntegerField): Unidades reservadas
+        expires_at (DateTimeField): Momento en que caduca la reserva
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        """Retorna identificador de la reserva."""
+        return f'Stock Reservation - {str(self.id)}'
@@ -0,0 +1,252 @@
+"""
+Inventario: descuento atómico del stock y reservas temporales del checkout.
+
+Las unidades se descuentan con un único UPDATE condicional por pedido:
+
+    UPDATE store_book
+       SET stock = stock - CASE id WHEN 3 THEN 2 WHEN 8 THEN 1 END
+     WHERE id IN (3, 8)
+       AND (stock IS NULL OR stock >= CASE id WHEN 3 THEN 2 WHEN 8 THEN 1 END)
+
+Si el número de filas actualizadas no coincide con el de libros, falta stock
+de alguno y la transacción se deshace entera. No hay SELECT ... FOR UPDATE:
+cada compra solo bloquea las filas de sus libros durante esa sentencia, así
+que las compras de libros distintos no se esperan entre sí y las de un mismo
+libro muy vendido nunca lo dejan en negativo. Los libros con stock NULL (sin
+control de inventario) cumplen siempre la condición y siguen en NULL.
+
+En billing_info las unidades se apartan en StockReservation durante
+RESERVATION_TTL segundos; process_order las convierte en el pedido. Las
+reservas caducadas devuelven sus unidades al stock (release_expired), de
+forma perezosa en cada checkout y con manage.py release_stock_reservations.
+
+En SQLite, las transacciones de stock empiezan con BEGIN IMMEDIATE (ver
+stock_transaction): algunas leen las reservas antes de escribir, y una
+transacción normal que pasa de lectura a escritura mientras otra escribe
+falla con "database is locked" en lugar de esperar su turno.
+"""
+import datetime
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from store.models import Book
+from .models import StockReservation
+
+
+# Duración de las reservas del checkout, en segundos
+RESERVATION_TTL = getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60)
+
+# Clave de sesión con los ids de las reservas del checkout en curso
+RESERVATIONS_SESSION_KEY = 'stock_reservations'
+
+# Reservas caducadas que se liberan por transacción
+RELEASE_BATCH_SIZE = 500
+
+
+class OutOfStock(Exception):
+    """
+    No hay unidades suficientes de algún libro del pedido.
+
+    Atributos:
+        shortages (list[tuple]): (id, nombre, unidades disponibles) de cada libro sin stock suficiente
+    """
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(', '.join(f'{name} ({available} disponibles)' for _, name, available in shortages))
+
+
+@contextmanager
+def stock_transaction():
+    """
+    transaction.atomic() para los cambios de stock y reservas.
+
+    En SQLite, si no hay ya una transacción abierta, la empieza con BEGIN
+    IMMEDIATE: toma el bloqueo de escritura al principio y, si otro checkout
+    lo tiene, espera (OPTIONS['timeout']) en lugar de fallar. El resto de la
+    aplicación sigue usando transacciones normales (DEFERRED).
+
+    Ejemplo:
+        >>> with stock_transaction():
+        ...     commit_order(request, quantities)
+    """
+    connection = transaction.get_connection()
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+        return
+
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic():
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+def _per_book(quantities):
+    """Expresión CASE id WHEN ... THEN cantidad para un UPDATE de varios libros."""
+    return Case(
+        *[When(pk=book_id, then=Value(quantity)) for book_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def take_stock(quantities):
+    """
+    Descuenta del stock las unidades de un pedido, todas o ninguna.
+
+    Args:
+        quantities (dict): {book_id: unidades}
+
+    Raises:
+        OutOfStock: Si falta stock de algún libro (no se descuenta nada)
+
+    Ejemplo:
+        >>> take_stock({3: 2, 8: 1})
+    """
+    quantities = {book_id: quantity for book_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+
+    wanted = _per_book(quantities)
+    with stock_transaction():
+        updated = (
+            Book.objects.filter(pk__in=quantities)
+            .filter(Q(stock__isnull=True) | Q(stock__gte=wanted))
+            .update(stock=F('stock') - wanted)
+        )
+        if updated != len(quantities):
+            # Se consulta qué falta antes de deshacer: los UPDATE anteriores no cuentan
+            shortages = list(
+                Book.objects.filter(pk__in=quantities, stock__lt=wanted).values_list('id', 'name', 'stock')
+            )
+            raise OutOfStock(shortages)
+
+
+def return_stock(quantities):
+    """Devuelve al stock unidades reservadas o de un pedido anulado (un solo UPDATE)."""
+    quantities = {book_id: quantity for book_id, quantity in quantities.items() if quantity > 0}
+    if quantities:
+        Book.objects.filter(pk__in=quantities).update(stock=F('stock') + _per_book(quantities))
+
+
+def _claim(reservations):
+    """
+    Borra las reservas indicadas y retorna las unidades que apartaban.
+
+    Cada reserva se borra con su propio DELETE y solo cuenta si lo borra
+    esta transacción: si release_expired y process_order compiten por la
+    misma reserva, las unidades se devuelven o se usan una sola vez.
+
+    Args:
+        reservations (iterable): Tuplas (id, book_id, quantity)
+
+    Returns:
+        dict: {book_id: unidades}
+    """
+    claimed = {}
+    for reservation_id, book_id, quantity in reservations:
+        deleted, _ = StockReservation.objects.filter(pk=reservation_id).delete()
+        if deleted:
+            claimed[book_id] = claimed.get(book_id, 0) + quantity
+    return claimed
+
+
+def release_expired(now=None):
+    """
+    Devuelve al stock las unidades de las reservas caducadas.
+
+    Returns:
+        int: Reservas liberadas
+    """
+    now = now or timezone.now()
+    released = 0
+    while True:
+        expired = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .values_list('id', 'book_id', 'quantity')[:RELEASE_BATCH_SIZE]
+        )
+        if not expired:
+            return released
+        with stock_transaction():
+            return_stock(_claim(expired))
+        released += len(expired)
+
+
+def _session_reservations(request):
+    ids = request.session.get(RESERVATIONS_SESSION_KEY) or []
+    return StockReservation.objects.filter(pk__in=ids).values_list('id', 'book_id', 'quantity')
+
+
+def release(request):
+    """Devuelve al stock las reservas del checkout en curso de esta sesión."""
+    if request.session.get(RESERVATIONS_SESSION_KEY):
+        with stock_transaction():
+            return_stock(_claim(_session_reservations(request)))
+        del request.session[RESERVATIONS_SESSION_KEY]
+
+
+def reserve(request, quantities):
+    """
+    Aparta las unidades del carrito durante RESERVATION_TTL (paso billing_info).
+
+    Sustituye las reservas anteriores de la sesión (el cliente puede volver a
+    este paso) y libera de paso las reservas caducadas de otros clientes.
+    Solo se reservan los libros con control de inventario.
+
+    Args:
+        request (HttpRequest): Petición (los ids de las reservas se guardan en la sesión)
+        quantities (dict): {book_id: unidades}
+
+    Raises:
+        OutOfStock: Si falta stock de algún libro (no se reserva nada)
+    """
+    release_expired()
+    release(request)
+
+    tracked = set(Book.objects.filter(pk__in=quantities, stock__isnull=False).values_list('id', flat=True))
+    quantities = {book_id: quantity for book_id, quantity in quantities.items() if book_id in tracked}
+    if not quantities:
+        return
+
+    expires_at = timezone.now() + datetime.timedelta(seconds=RESERVATION_TTL)
+    with stock_transaction():
+        take_stock(quantities)
+        reservations = StockReservation.objects.bulk_create([
+            StockReservation(book_id=book_id, quantity=quantity, expires_at=expires_at)
+            for book_id, quantity in quantities.items()
+        ])
+    request.session[RESERVATIONS_SESSION_KEY] = [reservation.pk for reservation in reservations]
+
+
+def commit_order(request, quantities):
+    """
+    Descuenta el stock de un pedido usando las reservas de la sesión.
+
+    Debe llamarse dentro de la transacción que crea el pedido, abierta con
+    stock_transaction() porque lee las reservas antes de escribir: si falta
+    stock se lanza OutOfStock y la transacción entera (reservas incluidas) se
+    deshace. Las unidades ya reservadas no se vuelven a descontar; si el
+    carrito cambió desde billing_info se descuenta o devuelve la diferencia.
+
+    Args:
+        request (HttpRequest): Petición con las reservas en la sesión
+        quantities (dict): {book_id: unidades} del pedido
+
+    Raises:
+        OutOfStock: Si falta stock de algún libro
+    """
+    held = _claim(_session_reservations(request)) if request.session.get(RESERVATIONS_SESSION_KEY) else {}
+
+    take_stock({book_id: quantity - held.get(book_id, 0) for book_id, quantity in quantities.items()})
+    return_stock({book_id: units - quantities.get(book_id, 0) for book_id, units in held.items()})
+
+    request.session.pop(RESERVATIONS_SESSION_KEY, None)
@@ -1,3 +1,132 @@
-from django.test import TestCase
+import datetime
+import threading
 
-# Create your tests here.
+from django.db import close_old_connections, connection, transaction
+from django.test import RequestFactory, TransactionTestCase
+from django.contrib.sessions.backends.db import SessionStore
+from django.utils import timezone
+
+from payment import stock
+from payment.models import StockReservation
+from store.models import Book, Category
+
+
+def _request():
+    request = RequestFactory().post('/')
+    request.session = SessionStore()
+    return request
+
+
+class StockTests(TransactionTestCase):
+    """Descuento de stock con UPDATE condicionales y reservas del checkout."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Teatro')
+        self.hot = Book.objects.create(name='Hamlet', price=10, category=category, stock=25)
+        self.other = Book.objects.create(name='Macbeth', price=8, category=category, stock=2)
+        self.untracked = Book.objects.create(name='Otelo', price=9, category=category)
+
+    def test_hot_title_is_never_oversold(self):
+        """Muchas compras simultáneas del mismo libro: se venden exactamente las unidades que hay."""
+        buyers = 40
+        barrier = threading.Barrier(buyers)
+        sold = []
+        errors = []
+
+        def buy():
+            try:
+                barrier.wait()
+                stock.take_stock({self.hot.pk: 1, self.untracked.pk: 1})
+                sold.append(1)
+            except stock.OutOfStock:
+                pass
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        close_old_connections()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(sold), 25)
+        self.hot.refresh_from_db()
+        self.untracked.refresh_from_db()
+        self.assertEqual(self.hot.stock, 0)
+        self.assertIsNone(self.untracked.stock)
+
+    def test_checkouts_that_read_before_writing_wait_for_each_other(self):
+        """Transacciones que leen las reservas y después escriben: esperan su turno en lugar de fallar."""
+        buyers = 20
+        barrier = threading.Barrier(buyers)
+        errors = []
+
+        def checkout():
+            try:
+                barrier.wait()
+                with stock.stock_transaction():
+                    list(StockReservation.objects.all())
+                    stock.take_stock({self.hot.pk: 1})
+            except stock.OutOfStock:
+                pass
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        close_old_connections()
+
+        self.assertEqual(errors, [])
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.stock, 5)
+
+    def test_other_transactions_are_deferred(self):
+        with stock.stock_transaction():
+            pass
+        with transaction.atomic():
+            self.assertIsNone(connection.transaction_mode)
+
+    def test_order_is_all_or_nothing(self):
+        with self.assertRaises(stock.OutOfStock) as raised:
+            stock.take_stock({self.hot.pk: 1, self.other.pk: 3})
+        self.assertEqual(raised.exception.shortages, [(self.other.pk, 'Macbeth', 2)])
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.stock, 25)
+
+    def test_reservation_is_used_by_the_order(self):
+        request = _request()
+        stock.reserve(request, {self.hot.pk: 3, self.untracked.pk: 1})
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.stock, 22)
+        self.assertEqual(StockReservation.objects.count(), 1)
+
+        # El carrito creció una unidad desde billing_info: solo se descuenta la diferencia
+        stock.commit_order(request, {self.hot.pk: 4, self.untracked.pk: 1})
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.stock, 21)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_expired_reservations_return_their_stock(self):
+        request = _request()
+        stock.reserve(request, {self.other.pk: 2})
+        with self.assertRaises(stock.OutOfStock):
+            stock.reserve(_request(), {self.other.pk: 1})
+
+        later = timezone.now() + datetime.timedelta(seconds=stock.RESERVATION_TTL + 1)
+        self.assertEqual(stock.release_expired(later), 1)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.stock, 2)
+
+        # La reserva caducada ya no cuenta: el pedido vuelve a descontar el stock
+        stock.commit_order(request, {self.other.pk: 2})
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.stock, 0)
@@ -1,11 +1,13 @@
 
 from django.shortcuts import render, redirect
 from cart.cart import Cart
+from cart.models import CartItem
 from payment.forms import ShippingForm, PaymentForm
 from payment.models import ShippingAddress, Order, OrderItem
 from django.contrib.auth.models import User
 from django.contrib import messages
 from store.models import Book, Profile
+from payment import stock
 import datetime
 
 
@@ -157,8 +159,12 @@ def process_order(request):
     Notas:
         - Obtiene datos de envío desde request.session['my_shipping'].
         - Para usuarios autenticados, guarda el user en Order y OrderItem.
-        - Limpia el carrito tanto de la sesión como del campo old_cart del Profile.
-        - Calcula el precio usando sale_price si is_sale es True, sino usa price normal.
+        - Limpia el carrito tanto de la sesión como de la tabla CartItem.
+        - El precio de cada OrderItem es el precio efectivo (Book.effective_price).
+        - El importe cobrado se calcula en la base de datos con Cart.db_total().
+        - El stock se descuenta (usando las reservas de billing_info) en la misma
+          transacción que crea el pedido; si falta algún libro no se crea nada
+          y se vuelve al carrito.
     
     Ejemplos:
         Crea Order con full_name, email, shipping_address, amount_paid.
@@ -167,9 +173,8 @@ def process_order(request):
     if request.POST:
         # Get the cart
         cart = Cart(request)
-        cart_products = cart.get_prods()      # QuerySet
-        quantities = cart.get_quants()        # Diccionario
-        totals = cart.cart_total()
+        cart_lines = cart.get_lines()         # Precios actuales (sin instantánea)
+        totals = cart.db_total()              # SUM(effective_price * cantidad) en SQL
 
         # Get Billing Info from the last page
         payment_form = PaymentForm(request.POST or None)
@@ -192,95 +197,93 @@ def process_order(request):
         )
 
         amount_paid = totals
+        quantities = {line.product.id: line.quantity for line in cart_lines}
+
+        try:
+            with stock.stock_transaction():
+                stock.commit_order(request, quantities)
+                return _create_order(request, cart_lines, full_name, email, shipping_address, amount_paid)
+        except stock.OutOfStock as error:
+            messages.error(request, f"No quedan unidades suficientes: {error}")
+            return redirect('cart_summary')
+
+    else:
+        messages.success(request, "Access Denied")
+        return redirect('home')
 
-        # Usuario autenticado
-        if request.user.is_authenticated:
-            user = request.user
 
-            create_order = Order(
+def _create_order(request, cart_lines, full_name, email, shipping_address, amount_paid):
+    """Crea el pedido y sus líneas y vacía el carrito (dentro de la transacción de process_order)."""
+    # Usuario autenticado
+    if request.user.is_authenticated:
+        user = request.user
+
+        create_order = Order(
+            user=user,
+            full_name=full_name,
+            email=email,
+            shipping_address=shipping_address,
+            amount_paid=amount_paid
+        )
+        create_order.save()
+
+        # Get the order ID
+        order_id = create_order.pk
+
+        # Create order items
+        for line in cart_lines:
+            create_order_item = OrderItem(
+                order_id=order_id,
+                product_id=line.product.id,
                 user=user,
-                full_name=full_name,
-                email=email,
-                shipping_address=shipping_address,
-                amount_paid=amount_paid
+                quantity=line.quantity,
+                price=line.unit_price
             )
-            create_order.save()
-
-            # Get the order ID
-            order_id = create_order.pk
-
-            # Create order items
-            for product in cart_products:
-                product_id = product.id
-
-                # Price
-                price = product.sale_price if product.is_sale else product.price
-
-                # Quantity
-                for key, value in quantities.items():
-                    if int(key) == product.id:
-                        create_order_item = OrderItem(
-                            order_id=order_id,
-                            product_id=product_id,
-                            user=user,
-                            quantity=value,
-                            price=price
-                        )
-                        create_order_item.save()
-
-            # Delete our cart
-            for key in list(request.session.keys()):
-                if key == "session_key":
-                    del request.session[key]
-
-                
-            # Delete Cart from Database (old cart field)
-            current_user = Profile.objects.filter(user_id=request.user.id)
-            # Delete shopping cart in database (old cart field)
-            current_user.update(old_cart="")
-
-
-            messages.success(request, "Order Placed!")
-            return redirect('home')
+            create_order_item.save()
 
-        # Usuario NO autenticado
-        else:
-            create_order = Order(
-                full_name=full_name,
-                email=email,
-                shipping_address=shipping_address,
-                amount_paid=amount_paid
-            )
-            create_order.save()
-
-            order_id = create_order.pk
-
-            for product in cart_products:
-                product_id = product.id
-                price = product.sale_price if product.is_sale else product.price
-
-                for key, value in quantities.items():
-                    if int(key) == product.id:
-                        create_order_item = OrderItem(
-                            order_id=order_id,
-                            product_id=product_id,
-                            quantity=value,
-                            price=price
-                        )
-                        create_order_item.save()
-
-            # Delete our cart
-            for key in list(request.session.keys()):
-                if key == "session_key":
-                    del request.session[key]
-
-            messages.success(request, "Order Placed!")
-            return redirect('home')
+        # Delete our cart
+        for key in list(request.session.keys()):
+            if key == "session_key":
+                del request.session[key]
+
+            
+        # Delete Cart from Database (persistent cart items)
+        CartItem.objects.filter(user=request.user).delete()
+
+
+        messages.success(request, "Order Placed!")
+        return redirect('home')
 
+    # Usuario NO autenticado
     else:
-        messages.success(request, "Access Denied")
+        create_order = Order(
+            full_name=full_name,
+            email=email,
+            shipping_address=shipping_address,
+            amount_paid=amount_paid
+        )
+        create_order.save()
+
+        order_id = create_order.pk
+
+        for line in cart_lines:
+            create_order_item = OrderItem(
+                order_id=order_id,
+                product_id=line.product.id,
+                quantity=line.quantity,
+                price=line.unit_price
+            )
+            create_order_item.save()
+
+        # Delete our cart
+        for key in list(request.session.keys()):
+            if key == "session_key":
+                del request.session[key]
+
+        messages.success(request, "Order Placed!")
         return redirect('home')
 
+
 def billing_info(request):
     """
     Vista de información de facturación.
@@ -297,14 +300,22 @@ def billing_info(request):
     Notas:
         - Guarda los datos de envío en request.session['my_shipping'].
         - La sesión se usará posteriormente en process_order().
+        - Aparta las unidades del carrito durante stock.RESERVATION_TTL
+          segundos; si falta algún libro se vuelve al carrito.
     """
     if request.POST:
         # Get the cart
         cart = Cart(request)
-        cart_products = cart.get_prods()
-        quantities = cart.get_quants()
+        cart_lines = cart.get_lines(use_snapshot=True)
         totals = cart.cart_total()
 
+        # Reservar el stock mientras se completa el pago
+        try:
+            stock.reserve(request, {line.product.id: line.quantity for line in cart_lines})
+        except stock.OutOfStock as error:
+            messages.error(request, f"No quedan unidades suficientes: {error}")
+            return redirect('cart_summary')
+
 
         # Create a session with Shipping Info
         my_shipping = request.POST
@@ -315,8 +326,7 @@ def billing_info(request):
             # Get the Billing Form
             billing_form = PaymentForm()
             return render(request, "payment/billing_info.html", {
-                "cart_products": cart_products,
-                "quantities": quantities,
+                "cart_lines": cart_lines,
                 "totals": totals,
                 "shipping_info": request.POST,
                 "billing_form": billing_form
@@ -325,8 +335,7 @@ def billing_info(request):
             # Not logged in
             billing_form = PaymentForm()
             return render(request, "payment/billing_info.html", {
-                "cart_products": cart_products,
-                "quantities": quantities,
+                "cart_lines": cart_lines,
                 "totals": totals,
                 "shipping_info": request.POST,
                 "billing_form": billing_form
@@ -335,8 +344,7 @@ def billing_info(request):
         # Fallback (if needed)
         shipping_form = request.POST
         return render(request, "payment/billing_info.html", {
-            "cart_products": cart_products,
-            "quantities": quantities,
+            "cart_lines": cart_lines,
             "totals": totals,
             "shipping_form": shipping_form
         })
@@ -392,8 +400,7 @@ def checkout(request):
     """
     # Get the cart
     cart = Cart(request)
-    cart_products = cart.get_prods()
-    quantities = cart.get_quants()
+    cart_lines = cart.get_lines(use_snapshot=True)
     totals = cart.cart_total()
 
     if request.user.is_authenticated:
@@ -408,8 +415,7 @@ def checkout(request):
         # Shipping Form
         shipping_form = ShippingForm(request.POST or None, instance=shipping_user)
         return render(request, "payment/checkout.html", {
-            "cart_products": cart_products,
-            "quantities": quantities,
+            "cart_lines": cart_lines,
             "totals": totals,
             "shipping_form": shipping_form
         })
@@ -417,8 +423,7 @@ def checkout(request):
         # Checkout as guest
         shipping_form = ShippingForm(request.POST or None)
         return render(request, "payment/checkout.html", {
-            "cart_products": cart_products,
-            "quantities": quantities,
+            "cart_lines": cart_lines,
             "totals": totals,
             "shipping_form": shipping_form
         })
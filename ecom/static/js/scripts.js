@@ -4,4 +4,59 @@
 * Licensed under MIT (https://github.com/StartBootstrap/startbootstrap-shop-homepage/blob/master/LICENSE)
 */
 // This file is intentionally blank
-// Use this file to add JavaScript to your project
\ No newline at end of file
+// Use this file to add JavaScript to your project
+
+// Carga incremental de listados paginados por cursor (ver store/templates/load_more.html).
+// El enlace "Ver más" funciona sin JavaScript; con JavaScript se añaden las
+// tarjetas a la rejilla pidiendo el fragmento HTML, y al hacerse visible se
+// carga automáticamente (scroll infinito).
+(function () {
+    function loadMore(link) {
+        if (link.dataset.loading) {
+            return;
+        }
+        link.dataset.loading = '1';
+
+        fetch(link.dataset.fragmentUrl, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+            .then(function (response) {
+                return response.text().then(function (html) {
+                    document.querySelector(link.dataset.target).insertAdjacentHTML('beforeend', html);
+
+                    var nextFragment = response.headers.get('X-Next-Fragment');
+                    if (nextFragment) {
+                        link.dataset.fragmentUrl = nextFragment;
+                        link.href = response.headers.get('X-Next-Page');
+                        delete link.dataset.loading;
+                    } else {
+                        link.parentNode.removeChild(link);
+                    }
+                });
+            })
+            .catch(function () {
+                delete link.dataset.loading;
+            });
+    }
+
+    document.addEventListener('click', function (event) {
+        var link = event.target.closest('[data-load-more]');
+        if (link) {
+            event.preventDefault();
+            loadMore(link);
+        }
+    });
+
+    if ('IntersectionObserver' in window) {
+        var observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    loadMore(entry.target);
+                }
+            });
+        });
+        document.addEventListener('DOMContentLoaded', function () {
+            document.querySelectorAll('[data-load-more]').forEach(function (link) {
+                observer.observe(link);
+            });
+        });
+    }
+})();
@@ -0,0 +1,192 @@
+"""
+API JSON de solo lectura del catálogo (libros y categorías).
+
+    GET /api/books/                 Libros paginados por cursor
+    GET /api/books/<id>/            Un libro
+    GET /api/categories/            Categorías
+
+Parámetros de /api/books/:
+    fields      Campos a devolver, separados por comas (ver BOOK_FIELDS).
+                Solo se leen de la base de datos las columnas de esos campos.
+    sort        Ordenación (claves de store.pagination.ORDERINGS)
+    after       Cursor de la página siguiente (campo "next" de la respuesta)
+    limit       Resultados por página (máximo MAX_LIMIT)
+    category, sale, price, min_price, max_price
+                Filtros del catálogo (ver store.facets.CatalogFilters)
+
+Todas las respuestas llevan ETag (a partir de las versiones de caché del
+catálogo, sin consultar la base de datos) y responden 304 a If-None-Match.
+"""
+import hashlib
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import condition, require_safe
+
+from .cache import category_menu, scope_versions
+from .facets import CatalogFilters
+from .models import Book
+from .pagination import ORDERINGS, PAGE_SIZE, InvalidCursor, keyset_paginate
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Campos públicos de un libro -> columna de Book que los contiene
+BOOK_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'price': 'price',
+    'sale_price': 'sale_price',
+    'is_sale': 'is_sale',
+    'effective_price': 'effective_price',
+    'category': 'category_id',
+    'category_slug': 'category__slug',
+    'image': 'image',
+    'updated_at': 'updated_at',
+}
+
+# Campos devueltos si no se indica fields= (sin la descripción, que es lo más pesado)
+DEFAULT_BOOK_FIELDS = ('id', 'name', 'price', 'sale_price', 'is_sale', 'effective_price', 'category', 'image')
+
+MAX_LIMIT = 100
+
+
+def dumps(data):
+    """Serializa a JSON con orjson si está instalado (Decimal como cadena en ambos casos)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def json_response(data):
+    """Respuesta JSON que los clientes y proxies deben revalidar (con ETag) antes de reutilizar."""
+    response = HttpResponse(dumps(data), content_type='application/json')
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def _error(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def _parse_fields(request):
+    """
+    Campos pedidos en ?fields=.
+
+    Returns:
+        list[str] o None: Campos válidos, o None si alguno no existe
+    """
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(DEFAULT_BOOK_FIELDS)
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    if not fields or any(field not in BOOK_FIELDS for field in fields):
+        return None
+    return fields
+
+
+def _serialize_book(row, fields):
+    """Convierte una fila de .values() en el diccionario público con los campos pedidos."""
+    book = {field: row[BOOK_FIELDS[field]] for field in fields}
+    if 'image' in book:
+        book['image'] = default_storage.url(book['image']) if book['image'] else None
+    return book
+
+
+def _etag(scopes):
+    """Función ETag para condition(): URL completa + versiones de los ámbitos de caché."""
+    def etag(request, *args, **kwargs):
+        versions = scope_versions(scopes(**kwargs))
+        return hashlib.md5(f'{request.get_full_path()}|{versions}'.encode()).hexdigest()
+    return etag
+
+
+@require_safe
+@condition(etag_func=_etag(lambda: ['catalog', 'home']))
+def book_list(request):
+    """
+    Lista de libros paginada por cursor, con campos y filtros a elección.
+
+    Args:
+        request (HttpRequest): Solicitud GET con fields, sort, after, limit y filtros
+
+    Returns:
+        HttpResponse: {"results": [...], "next": URL de la página siguiente o null}
+
+    Ejemplo:
+        GET /api/books/?fields=id,name,effective_price&sort=price&limit=50
+    """
+    fields = _parse_fields(request)
+    if fields is None:
+        return _error(f'fields admite: {", ".join(BOOK_FIELDS)}')
+
+    sort = request.GET.get('sort', 'id')
+    if sort not in ORDERINGS:
+        return _error(f'sort admite: {", ".join(ORDERINGS)}')
+
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), MAX_LIMIT) if limit.isdigit() and int(limit) > 0 else PAGE_SIZE
+
+    # Columnas pedidas más las necesarias para el cursor
+    columns = {BOOK_FIELDS[field] for field in fields}
+    columns.update(('id', ORDERINGS[sort].lstrip('-')))
+
+    books = CatalogFilters(request.GET).apply(Book.objects.values(*columns))
+    try:
+        page = keyset_paginate(books, sort, request.GET.get('after'), page_size=limit)
+    except InvalidCursor:
+        return _error('after no es un cursor válido para esta ordenación')
+
+    next_url = None
+    if page.has_next:
+        params = request.GET.copy()
+        params['after'] = page.next_cursor
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+    return json_response({
+        'results': [_serialize_book(row, fields) for row in page.items],
+        'next': next_url,
+    })
+
+
+@require_safe
+@condition(etag_func=_etag(lambda book_id: ['catalog', f'product:{book_id}']))
+def book_detail(request, book_id):
+    """
+    Un libro, con los campos de ?fields= (por defecto también la descripción).
+
+    Ejemplo:
+        GET /api/books/5/?fields=id,name,description
+    """
+    fields = _parse_fields(request) if request.GET.get('fields') else [*DEFAULT_BOOK_FIELDS, 'description']
+    if fields is None:
+        return _error(f'fields admite: {", ".join(BOOK_FIELDS)}')
+
+    row = Book.objects.filter(id=book_id).values(*{BOOK_FIELDS[field] for field in fields}).first()
+    if row is None:
+        return JsonResponse({'error': 'El libro no existe'}, status=404)
+    return json_response(_serialize_book(row, fields))
+
+
+@require_safe
+@condition(etag_func=_etag(lambda: ['catalog']))
+def category_list(request):
+    """
+    Categorías del catálogo (del menú cacheado, sin consultar la base de datos).
+
+    Ejemplo:
+        GET /api/categories/
+        {"results": [{"id": 3, "name": "Poesía", "slug": "poesia"}, ...]}
+    """
+    return json_response({
+        'results': [
+            {'id': category.id, 'name': category.name, 'slug': category.slug}
+            for category in category_menu()
+        ],
+    })
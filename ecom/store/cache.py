@@ -0,0 +1,269 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+
+# Duración de las páginas cacheadas (las invalidaciones no dependen de ella)
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Clave de caché con la versión del menú de categorías
+CATEGORY_MENU_VERSION_KEY = 'store:category_menu_version'
+
+# Clave de caché con la versión del índice de autocompletado (ver store.suggest)
+SUGGESTIONS_VERSION_KEY = 'store:suggestions_version'
+
+
+def _scope_key(scope):
+    return f'page_scope:{scope}'
+
+
+def scope_versions(scopes):
+    """
+    Retorna la versión actual de cada ámbito de caché de páginas.
+
+    Un ámbito agrupa las páginas que dependen de los mismos datos ('catalog',
+    'home', 'product:5', 'category:2'...). La versión forma parte de la clave
+    de la página, así que cambiarla invalida todas las páginas del ámbito.
+
+    Returns:
+        list[int]: Versiones, en el mismo orden que scopes
+    """
+    keys = [_scope_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def bump_page_scopes(*scopes):
+    """
+    Invalida las páginas cacheadas de los ámbitos indicados.
+
+    Ejemplo:
+        >>> bump_page_scopes('home', 'product:5', 'category:2')
+    """
+    version = time.time_ns()
+    cache.set_many({_scope_key(scope): version for scope in scopes}, None)
+
+
+# Copia del menú de categorías del proceso actual: (versión, lista, {slug: Category}, {id: Category})
+_category_menu = (None, [], {}, {})
+_category_menu_lock = threading.Lock()
+
+
+def _load_category_menu():
+    """
+    Retorna la copia del menú del proceso, recargándola si su versión ha cambiado.
+
+    Cada proceso guarda su propia copia y solo comprueba en la caché si la
+    versión del menú ha cambiado, así que usar el menú no consulta la base
+    de datos. Los signals de Category cambian la versión (ver
+    invalidate_category_menu) y cada proceso recarga la lista en su
+    siguiente uso.
+    """
+    global _category_menu
+    from .models import Category
+
+    version = cache.get(CATEGORY_MENU_VERSION_KEY)
+    if version is None:
+        cache.add(CATEGORY_MENU_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATEGORY_MENU_VERSION_KEY)
+
+    menu = _category_menu
+    if menu[0] != version:
+        with _category_menu_lock:
+            categories = list(Category.objects.only('id', 'name', 'slug').order_by('name'))
+            menu = _category_menu = (
+                version,
+                categories,
+                {category.slug: category for category in categories},
+                {category.id: category for category in categories},
+            )
+    return menu
+
+
+def category_menu():
+    """
+    Lista de categorías (ordenadas por nombre) para el menú, el pie y las URLs.
+
+    Returns:
+        list[Category]: Categorías con id, name y slug
+    """
+    return _load_category_menu()[1]
+
+
+def category_by_slug(slug):
+    """
+    Categoría con ese slug, o None.
+
+    Se busca en el menú del proceso; si no está, se consulta la base de datos
+    por si el menú se ha quedado atrás (categoría recién creada o versión
+    expulsada de la caché) y, si existe, se invalida el menú de todos los
+    procesos para que lo recarguen.
+    """
+    category = _load_category_menu()[2].get(slug)
+    if category is None:
+        from .models import Category
+
+        category = Category.objects.only('id', 'name', 'slug').filter(slug=slug).first()
+        if category is not None:
+            invalidate_category_menu()
+    return category
+
+
+def category_by_id(category_id):
+    """Categoría con ese id, o None (sin consultar la base de datos)."""
+    return _load_category_menu()[3].get(category_id)
+
+
+def invalidate_category_menu():
+    """Invalida el menú de categorías de todos los procesos."""
+    cache.set(CATEGORY_MENU_VERSION_KEY, time.time_ns(), None)
+
+
+def suggestions_version():
+    """
+    Versión actual del índice de autocompletado.
+
+    Cada proceso lee los cambios nuevos del registro de su índice en memoria
+    cuando esta versión cambia (ver SuggestionIndex.refresh).
+    """
+    version = cache.get(SUGGESTIONS_VERSION_KEY)
+    if version is None:
+        cache.add(SUGGESTIONS_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(SUGGESTIONS_VERSION_KEY)
+    return version
+
+
+def invalidate_suggestions():
+    """Invalida el índice de autocompletado de todos los procesos."""
+    cache.set(SUGGESTIONS_VERSION_KEY, time.time_ns(), None)
+
+
+def category_scope(slug):
+    """Ámbito de caché de la página de una categoría a partir del slug de la URL."""
+    category = category_by_slug(slug)
+    return f'category:{category.id if category else None}'
+
+
+def _has_pending_messages(request):
+    """True si hay mensajes flash pendientes de mostrar (la página no sería genérica)."""
+    return len(messages.get_messages(request)) > 0
+
+
+def cache_anonymous_page(scopes, csrf_cookie=False):
+    """
+    Decorador que cachea la página completa para visitantes anónimos.
+
+    La clave es la URL completa más las versiones de los ámbitos de la página,
+    por lo que sigue siendo válida hasta que los signals de Book o Category
+    invalidan alguno de ellos (ver bump_page_scopes). No se cachea ni se sirve
+    desde caché para usuarios autenticados, peticiones que no son GET,
+    respuestas distintas de 200 ni cuando hay mensajes flash pendientes.
+    Se guardan el cuerpo y las cabeceras de la respuesta (Content-Type,
+    Cache-Control, Vary, X-Next-Fragment...), que se restauran en cada acierto.
+
+    El contador del carrito del navbar es lo único que cambia entre visitantes
+    anónimos: al renderizar una página cacheable se deja un hueco
+    (request.cart_badge_deferred) que rellena el navegador con /cart/badge/.
+
+    Args:
+        scopes (callable): Función (request, **kwargs) -> lista de ámbitos
+        csrf_cookie (bool): Asegurar la cookie CSRF (para páginas con
+            peticiones AJAX POST, que leen el token de la cookie)
+
+    Ejemplo:
+        >>> @cache_anonymous_page(lambda request, product_id: ['catalog', f'product:{product_id}'])
+        ... def product(request, product_id):
+        ...     ...
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or request.user.is_authenticated or _has_pending_messages(request):
+                return view(request, *args, **kwargs)
+
+            if csrf_cookie:
+                get_token(request)
+
+            page_scopes = scopes(request, **kwargs)
+            versions = scope_versions(page_scopes)
+            digest = hashlib.md5(f'{request.get_full_path()}|{versions}'.encode()).hexdigest()
+            key = f'page_response:{digest}'
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, headers = cached
+                return HttpResponse(content, headers=headers)
+
+            # Dejar el hueco del contador del carrito en lugar de renderizarlo
+            request.cart_badge_deferred = True
+            response = view(request, *args, **kwargs)
+
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (response.content, dict(response.headers)), PAGE_CACHE_TIMEOUT)
+
+            return response
+        return wrapper
+    return decorator
+
+
+def _viewer_signature(request):
+    """
+    Parte de la página que depende del visitante.
+
+    Para visitantes anónimos la página es la misma para todos (el contador del
+    carrito se rellena aparte); para usuarios autenticados depende del usuario
+    y del contenido de su carrito, que se muestran en el navbar.
+    """
+    if not request.user.is_authenticated:
+        return 'anonymous'
+    cart = request.session.get('session_key', {})
+    return f'{request.user.pk}:{sorted(cart.items())}'
+
+
+def conditional_page(scopes, last_modified=None):
+    """
+    Decorador que responde 304 Not Modified a las revalidaciones de una página.
+
+    El ETag se calcula a partir de las versiones de los ámbitos de la página
+    (las mismas que usa cache_anonymous_page, una lectura de caché y ninguna
+    consulta) y de la firma del visitante. Last-Modified, si se indica, solo
+    se envía a visitantes anónimos: a los autenticados les cambia el navbar
+    sin que cambie el catálogo. No se valida nada cuando hay mensajes flash
+    pendientes, que harían distinta la página.
+
+    Args:
+        scopes (callable): Función (request, **kwargs) -> lista de ámbitos
+        last_modified (callable): Función opcional (request, **kwargs) ->
+            datetime de la última modificación de los datos de la página
+
+    Ejemplo:
+        >>> @conditional_page(lambda request: ['catalog', 'home'])
+        ... def home(request):
+        ...     ...
+    """
+    def etag(request, *args, **kwargs):
+        if _has_pending_messages(request):
+            return None
+        versions = scope_versions(scopes(request, **kwargs))
+        return hashlib.md5(f'{request.get_full_path()}|{versions}|{_viewer_signature(request)}'.encode()).hexdigest()
+
+    def modified(request, *args, **kwargs):
+        if last_modified is None or request.user.is_authenticated or _has_pending_messages(request):
+            return None
+        return last_modified(request, **kwargs)
+
+    return condition(etag_func=etag, last_modified_func=modified)
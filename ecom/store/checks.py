@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+# Backends cuyo contenido no comparten los procesos del servidor
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Comprueba que la caché por defecto es compartida entre procesos.
+
+    Las versiones que invalidan las páginas cacheadas, los ETag, las
+    instantáneas de precios del carrito, el menú de categorías y el índice de
+    autocompletado se guardan en la caché (ver store.cache): con una caché
+    por proceso, los cambios hechos en un worker o en un comando de gestión
+    no llegan al resto.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend in PER_PROCESS_CACHE_BACKENDS:
+        return [Error(
+            f'CACHES["default"] usa {backend}, que no se comparte entre procesos.',
+            hint='Configura una caché compartida (DatabaseCache, Redis o Memcached); ver CACHES en settings.py.',
+            id='store.E001',
+        )]
+    return []
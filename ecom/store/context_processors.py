@@ -0,0 +1,12 @@
+from .cache import category_menu
+
+
+def categories(request):
+    """
+    Context processor que hace disponible el menú de categorías en todas las plantillas.
+
+    Se pasa la función (no la lista): las plantillas la llaman solo si usan
+    category_menu, y la lista sale de la copia cacheada del proceso, sin
+    consultar la base de datos (ver store.cache.category_menu).
+    """
+    return {'category_menu': category_menu}
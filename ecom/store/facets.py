@@ -0,0 +1,150 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+
+
+# Tramos de precio (sobre effective_price): (clave en la URL, etiqueta, mínimo, máximo exclusivo)
+PRICE_BUCKETS = (
+    ('0-10', 'Menos de $10', Decimal('0'), Decimal('10')),
+    ('10-20', '$10 - $20', Decimal('10'), Decimal('20')),
+    ('20-50', '$20 - $50', Decimal('20'), Decimal('50')),
+    ('50-', 'Más de $50', Decimal('50'), None),
+)
+PRICE_BUCKET_KEYS = [key for key, _, _, _ in PRICE_BUCKETS]
+
+
+def _parse_decimal(value):
+    """Convierte un parámetro de la URL en Decimal (None si falta o no es válido)."""
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def _bucket_q(key):
+    """Condición Q del tramo de precio key."""
+    _, _, low, high = PRICE_BUCKETS[PRICE_BUCKET_KEYS.index(key)]
+    condition = Q(effective_price__gte=low)
+    if high is not None:
+        condition &= Q(effective_price__lt=high)
+    return condition
+
+
+class CatalogFilters():
+    """
+    Filtros del catálogo leídos de la URL.
+
+    Parámetros:
+        category: id de la categoría
+        sale: '1' para ver solo libros en oferta
+        price: clave de un tramo de PRICE_BUCKETS (ej. '10-20')
+        min_price / max_price: rango de precio libre (effective_price)
+
+    Ejemplo:
+        >>> filters = CatalogFilters(request.GET)
+        >>> books = filters.apply(Book.objects.cards())
+    """
+
+    def __init__(self, params, category_id=None):
+        """
+        Args:
+            params (QueryDict): Parámetros GET de la petición
+            category_id (int): Categoría fija (página de categoría); si se
+                indica, se ignora el parámetro category
+        """
+        if category_id is None:
+            category = params.get('category', '')
+            category_id = int(category) if category.isdigit() else None
+        self.category_id = category_id
+        self.on_sale = params.get('sale') == '1'
+        price = params.get('price')
+        self.price_bucket = price if price in PRICE_BUCKET_KEYS else None
+        self.min_price = _parse_decimal(params.get('min_price'))
+        self.max_price = _parse_decimal(params.get('max_price'))
+
+    def base_q(self):
+        """Filtro de precio libre (no es una faceta: se aplica también a los recuentos)."""
+        condition = Q()
+        if self.min_price is not None:
+            condition &= Q(effective_price__gte=self.min_price)
+        if self.max_price is not None:
+            condition &= Q(effective_price__lte=self.max_price)
+        return condition
+
+    def apply(self, queryset):
+        """Aplica todos los filtros a un queryset de Book."""
+        queryset = queryset.filter(self.base_q())
+        if self.category_id is not None:
+            queryset = queryset.filter(category_id=self.category_id)
+        if self.on_sale:
+            queryset = queryset.filter(is_sale=True)
+        if self.price_bucket is not None:
+            queryset = queryset.filter(_bucket_q(self.price_bucket))
+        return queryset
+
+
+def facet_counts(queryset, filters):
+    """
+    Calcula los recuentos de todas las facetas con una única consulta agrupada.
+
+    La consulta agrupa los libros por (categoría, oferta, tramo de precio);
+    el resto se suma en Python sobre esas pocas filas. Como es habitual en
+    la navegación por facetas, el recuento de cada faceta aplica los filtros
+    de las demás pero no el suyo propio (así se ve cuántos libros hay en
+    cada categoría con la oferta y el tramo de precio elegidos).
+
+    Args:
+        queryset (QuerySet): Libros de partida (todo el catálogo o una categoría)
+        filters (CatalogFilters): Filtros activos
+
+    Returns:
+        dict: {
+            'categories': [{'id', 'name', 'count'}, ...],
+            'sale': número de libros en oferta,
+            'prices': [{'key', 'label', 'count'}, ...],
+        }
+    """
+    bucket = Case(
+        *[When(_bucket_q(key), then=Value(index)) for index, key in enumerate(PRICE_BUCKET_KEYS)],
+        default=Value(-1),
+        output_field=IntegerField(),
+    )
+    rows = (
+        queryset.filter(filters.base_q())
+        .annotate(price_bucket=bucket)
+        .values('category_id', 'category__name', 'is_sale', 'price_bucket')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    selected_bucket = PRICE_BUCKET_KEYS.index(filters.price_bucket) if filters.price_bucket else None
+
+    categories = {}
+    sale = 0
+    prices = [0] * len(PRICE_BUCKETS)
+    for row in rows:
+        in_category = filters.category_id is None or row['category_id'] == filters.category_id
+        in_sale = not filters.on_sale or row['is_sale']
+        in_bucket = selected_bucket is None or row['price_bucket'] == selected_bucket
+
+        if in_sale and in_bucket:
+            category = categories.setdefault(
+                row['category_id'], {'id': row['category_id'], 'name': row['category__name'], 'count': 0}
+            )
+            category['count'] += row['count']
+        if in_category and in_bucket and row['is_sale']:
+            sale += row['count']
+        if in_category and in_sale and row['price_bucket'] >= 0:
+            prices[row['price_bucket']] += row['count']
+
+    return {
+        'categories': sorted(categories.values(), key=lambda category: category['name']),
+        'sale': sale,
+        'prices': [
+            {'key': key, 'label': label, 'count': count}
+            for (key, label, _, _), count in zip(PRICE_BUCKETS, prices)
+        ],
+    }
@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Variantes de cada portada: nombre -> (ancho máximo en px, atributo sizes)
+VARIANTS = {
+    'thumb': (160, '160px'),
+    'card': (480, '(min-width: 992px) 25vw, (min-width: 576px) 50vw, 100vw'),
+    'detail': (960, '(min-width: 768px) 50vw, 100vw'),
+}
+
+# Formatos generados: extensión -> (formato de Pillow, opciones de guardado).
+# WebP para los navegadores que lo aceptan y JPEG como alternativa.
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Directorio (dentro de la carpeta de la imagen original) donde se guardan las variantes
+DERIVATIVES_DIR = 'derivatives'
+
+# Caracteres del nombre original que se conservan en content_name()
+CONTENT_NAME_STEM_LENGTH = 50
+
+# Caracteres del hash sha256 que se añaden al nombre en content_name()
+CONTENT_HASH_LENGTH = 12
+
+# Nombres de content_name() y de sus variantes (ver is_content_named)
+CONTENT_NAME_RE = re.compile(
+    rf'-[0-9a-f]{{{CONTENT_HASH_LENGTH}}}\.[^./]+'
+    rf'(?:-(?:{"|".join(VARIANTS)})\.(?:{"|".join(FORMATS)}))?$'
+)
+
+# Procesos del pool que genera las variantes
+IMAGE_WORKERS = getattr(settings, 'IMAGE_WORKERS', 2)
+
+
+def derivative_name(image_name, variant, extension):
+    """
+    Ruta (relativa a MEDIA_ROOT) de una variante de una imagen.
+
+    El nombre conserva la extensión del original, para que Hamlet.png y
+    Hamlet.jpg de la misma carpeta no compartan variantes.
+
+    Ejemplo:
+        >>> derivative_name('uploads/products/Hamlet.png', 'card', 'webp')
+        'uploads/products/derivatives/Hamlet.png-card.webp'
+    """
+    path = PurePosixPath(image_name)
+    return str(path.parent / DERIVATIVES_DIR / f'{path.name}-{variant}.{extension}')
+
+
+def derivative_names(image_name):
+    """Rutas de todas las variantes de una imagen."""
+    return [
+        derivative_name(image_name, variant, extension)
+        for variant in VARIANTS
+        for extension in FORMATS
+    ]
+
+
+def has_derivatives(image_name, media_root=None):
+    """True si ya existen todas las variantes de la imagen."""
+    media_root = media_root or settings.MEDIA_ROOT
+    return all(os.path.exists(os.path.join(media_root, name)) for name in derivative_names(image_name))
+
+
+def render_derivatives(media_root, image_name):
+    """
+    Genera las variantes (miniatura, tarjeta y detalle; WebP y JPEG) de una imagen.
+
+    Se ejecuta en los procesos del pool, por lo que solo usa Pillow y el
+    sistema de archivos (nada de Django). Las imágenes nunca se amplían y cada
+    archivo se escribe con un nombre temporal y se renombra al final, así que
+    una página nunca enlaza una variante a medio escribir.
+
+    Args:
+        media_root (str): Directorio MEDIA_ROOT
+        image_name (str): Ruta de la imagen original relativa a MEDIA_ROOT
+
+    Returns:
+        str: image_name (para identificar el trabajo al terminar)
+    """
+    from PIL import Image
+
+    with Image.open(os.path.join(media_root, image_name)) as original:
+        original.load()
+
+        # JPEG no admite transparencia: se compone sobre fondo blanco
+        if original.mode in ('RGBA', 'LA', 'P'):
+            rgba = original.convert('RGBA')
+            flattened = Image.new('RGB', rgba.size, (255, 255, 255))
+            flattened.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            flattened = original.convert('RGB')
+
+        for variant, (width, _) in VARIANTS.items():
+            resized = flattened.copy()
+            resized.thumbnail((width, width * 4), Image.LANCZOS)
+
+            for extension, (image_format, options) in FORMATS.items():
+                target = os.path.join(media_root, derivative_name(image_name, variant, extension))
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                temporary = f'{target}.{os.getpid()}.tmp'
+                resized.save(temporary, image_format, **options)
+                os.replace(temporary, target)
+
+    return image_name
+
+
+def content_name(upload_dir, source):
+    """
+    Nombre en MEDIA_ROOT para copiar un archivo, derivado de su contenido.
+
+    Dos archivos distintos nunca reciben el mismo nombre (aunque se llamen
+    igual), así que copiar una portada no reemplaza la de otro libro; y el
+    mismo archivo recibe siempre el mismo, así que reimportarlo no lo duplica.
+
+    Ejemplo:
+        >>> content_name('uploads/products/', '/datos/portadas/Hamlet.png')
+        'uploads/products/Hamlet-503625e1c4a9.png'
+    """
+    digest = hashlib.sha256()
+    with open(source, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    path = PurePosixPath(os.path.basename(source))
+    return f'{upload_dir}{path.stem[:CONTENT_NAME_STEM_LENGTH]}-{digest.hexdigest()[:CONTENT_HASH_LENGTH]}{path.suffix.lower()}'
+
+
+def is_content_named(name):
+    """
+    Retorna True si el nombre viene de content_name() o es una variante de uno.
+
+    Su contenido no cambia nunca sin cambiar de nombre, así que se pueden
+    servir con caché inmutable (ver ecom.media).
+
+    Ejemplo:
+        >>> is_content_named('uploads/products/derivatives/Hamlet-3622e82ea1ae.png-card.webp')
+        True
+        >>> is_content_named('uploads/products/Hamlet.png')
+        False
+    """
+    return CONTENT_NAME_RE.search(name) is not None
+
+
+def copy_image(media_root, source, image_name):
+    """
+    Copia una portada externa a MEDIA_ROOT con un nombre de content_name().
+
+    Si el destino ya existe tiene el mismo contenido y no se toca. La copia se
+    escribe con un nombre temporal y se renombra al final.
+    """
+    target = os.path.join(media_root, image_name)
+    if os.path.exists(target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = f'{target}.{os.getpid()}.tmp'
+    shutil.copyfile(source, temporary)
+    os.replace(temporary, target)
+
+
+def store_image(media_root, upload_dir, source):
+    """
+    Copia una portada externa a MEDIA_ROOT con su nombre de content_name().
+
+    Lo ejecuta el pool del importador, así que la lectura para el hash y la
+    copia no ocupan el proceso principal.
+
+    Returns:
+        str: Nombre de la portada en MEDIA_ROOT
+    """
+    image_name = content_name(upload_dir, source)
+    copy_image(media_root, source, image_name)
+    return image_name
+
+
+def ensure_derivatives(media_root, image_name):
+    """
+    Genera las variantes de una imagen si le falta alguna (manage.py import_catalog).
+
+    Como render_derivatives, se ejecuta en los procesos del pool.
+
+    Returns:
+        str: image_name
+    """
+    if not has_derivatives(image_name, media_root):
+        render_derivatives(media_root, image_name)
+    return image_name
+
+
+def create_pool(workers=IMAGE_WORKERS):
+    """
+    Crea un pool de procesos para generar variantes.
+
+    Usa 'spawn' en lugar de fork: el proceso del servidor tiene hilos y
+    conexiones abiertas que no deben copiarse a los procesos hijos.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Pool del proceso actual, creado la primera vez que se sube una imagen."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = create_pool()
+        return _pool
+
+
+def schedule_derivatives(image_name):
+    """
+    Encola la generación de las variantes de una imagen fuera de la petición.
+
+    Al terminar se invalidan las tarjetas y páginas cacheadas de los libros
+    con esa portada, para que pasen a usar las variantes.
+    """
+    future = _get_pool().submit(render_derivatives, str(settings.MEDIA_ROOT), image_name)
+    future.add_done_callback(_derivatives_done)
+
+
+def _derivatives_done(future):
+    """Callback (en un hilo del proceso del servidor) al terminar un trabajo del pool."""
+    from django.db import close_old_connections
+
+    error = future.exception()
+    if error is not None:
+        logger.warning('No se pudieron generar las variantes de imagen: %s', error)
+        return
+
+    try:
+        invalidate_books_with_images([future.result()])
+    finally:
+        close_old_connections()
+
+
+def invalidate_books_with_images(image_names):
+    """
+    Invalida la caché de los libros cuyas portadas tienen variantes nuevas.
+
+    Incrementa Book.version (invalida las tarjetas) e invalida las páginas de
+    esos libros y de sus categorías.
+    """
+    from django.db.models import F
+    from .cache import bump_page_scopes
+    from .models import Book
+
+    books = Book.objects.filter(image__in=image_names)
+    rows = list(books.values_list('id', 'category_id'))
+    if not rows:
+        return
+
+    books.update(version=F('version') + 1)
+
+    scopes = {'home'}
+    for book_id, category_id in rows:
+        scopes.add(f'product:{book_id}')
+        scopes.add(f'category:{category_id}')
+    bump_page_scopes(*scopes)
@@ -0,0 +1,471 @@
+"""
+Importación masiva del catálogo desde CSV o JSONL (manage.py import_catalog).
+
+Cada fila describe un libro. Columnas reconocidas (las demás se ignoran):
+
+    id              Libro existente a actualizar (opcional)
+    name            Título; junto con la categoría identifica el libro si no hay id
+    category        Nombre de la categoría (se crea si no existe), o bien
+    category_slug   su slug, o bien
+    category_id     su id
+    price, sale_price, is_sale, description, stock
+    image           Portada: ruta del archivo a copiar (relativa a la carpeta
+                    de imágenes) o ruta ya existente en MEDIA_ROOT (como la
+                    que escribe manage.py export_data)
+
+Las columnas vacías no modifican el libro. Las filas se procesan por lotes:
+en cada lote se leen los libros existentes con dos consultas, se crean los
+nuevos con bulk_create() y se actualizan los modificados con bulk_update(),
+todo en una transacción. Las portadas se copian a MEDIA_ROOT con un nombre
+derivado de su contenido antes de guardar el lote (un libro nunca apunta a un
+archivo sin copiar ni sustituye la portada de otro). El hash y la copia, y
+después las variantes de cada lote confirmado, se hacen en un pool de
+procesos (ver store.images).
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import as_completed
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils._os import safe_join
+
+from . import images, search
+from .cache import bump_page_scopes
+from .models import Book, Category
+
+
+# Filas por lote (y por transacción)
+IMPORT_BATCH_SIZE = getattr(settings, 'IMPORT_BATCH_SIZE', 500)
+
+FORMATS = ('csv', 'jsonl')
+
+# Carpeta de MEDIA_ROOT donde se copian las portadas importadas
+IMAGE_UPLOAD_DIR = Book._meta.get_field('image').upload_to
+
+# Columnas de Book que se leen para comparar y actualizar los libros existentes
+LOAD_FIELDS = ('id', 'name', 'category_id', 'description', 'image', 'price', 'sale_price', 'is_sale', 'stock')
+
+MAX_PRICE = Decimal('10000')
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'si', 'sí', 'x'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+# Libros por consulta al invalidar la caché de las portadas procesadas
+INVALIDATE_CHUNK_SIZE = 500
+
+
+def read_rows(path, import_format):
+    """
+    Lee un archivo CSV (con cabecera) o JSONL fila a fila.
+
+    Yields:
+        tuple: (número de línea, dict con la fila). Una línea JSONL mal
+            formada se entrega como una excepción ValueError en lugar del dict.
+    """
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        if import_format == 'csv':
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                row = ValueError(f'JSON no válido: {error}')
+            yield number, row
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_price(value, field):
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f'{field} no es un número: {value!r}')
+    if not number.is_finite() or not 0 <= number < MAX_PRICE:
+        raise ValueError(f'{field} fuera de rango: {value}')
+    return number.quantize(Decimal('0.01'))
+
+
+def _parse_bool(value, field):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'{field} no es un booleano: {value!r}')
+
+
+def parse_row(row):
+    """
+    Valida una fila y la convierte en valores de Book.
+
+    Returns:
+        tuple: (id del libro o None, referencia a la categoría o None, dict de valores).
+            La referencia es ('id' | 'slug' | 'name', valor).
+
+    Raises:
+        ValueError: Si la fila no es válida
+
+    Ejemplo:
+        >>> parse_row({'name': 'Hamlet', 'category': 'Teatro', 'price': '12.5'})
+        (None, ('name', 'Teatro'), {'name': 'Hamlet', 'price': Decimal('12.50')})
+    """
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError('la fila no es un objeto')
+
+    book_id = None
+    if not _is_empty(row.get('id')):
+        try:
+            book_id = int(row['id'])
+        except (TypeError, ValueError):
+            raise ValueError(f'id no válido: {row["id"]!r}')
+
+    category = None
+    if not _is_empty(row.get('category_id')):
+        try:
+            category = ('id', int(row['category_id']))
+        except (TypeError, ValueError):
+            raise ValueError(f'category_id no válido: {row["category_id"]!r}')
+    elif not _is_empty(row.get('category_slug')):
+        category = ('slug', str(row['category_slug']).strip())
+    elif not _is_empty(row.get('category')):
+        name = str(row['category']).strip()
+        if len(name) > Category._meta.get_field('name').max_length:
+            raise ValueError(f'nombre de categoría demasiado largo: {name!r}')
+        category = ('name', name)
+
+    values = {}
+    if not _is_empty(row.get('name')):
+        values['name'] = str(row['name']).strip()
+        if len(values['name']) > Book._meta.get_field('name').max_length:
+            raise ValueError(f'nombre demasiado largo: {values["name"]!r}')
+    for field in ('price', 'sale_price'):
+        if not _is_empty(row.get(field)):
+            values[field] = _parse_price(row[field], field)
+    if not _is_empty(row.get('is_sale')):
+        values['is_sale'] = _parse_bool(row['is_sale'], 'is_sale')
+    if not _is_empty(row.get('stock')):
+        try:
+            values['stock'] = int(row['stock'])
+        except (TypeError, ValueError):
+            raise ValueError(f'stock no es un entero: {row["stock"]!r}')
+        if values['stock'] < 0:
+            raise ValueError(f'stock negativo: {row["stock"]}')
+    if not _is_empty(row.get('description')):
+        values['description'] = str(row['description'])
+    if not _is_empty(row.get('image')):
+        values['image'] = str(row['image']).strip()
+
+    return book_id, category, values
+
+
+class ImportReport():
+    """Contadores y tiempos de una importación."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.categories = 0
+        self.images = 0
+        self.errors = []
+        self.image_errors = []
+        self.db_seconds = 0.0
+        self.image_seconds = 0.0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        """Filas por segundo."""
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class CatalogImporter():
+    """
+    Importa lotes de filas en Book y Category.
+
+    Los bulk_create()/bulk_update() no disparan los signals de Book. Para los
+    libros modificados, BookQuerySet.bulk_update() reindexa la búsqueda, anota
+    los títulos del autocompletado e invalida las instantáneas de precios y
+    las páginas (ver store.models.after_bulk_change); el importador incrementa
+    además version y fija updated_at cuando solo cambian la portada o el
+    stock. Los libros nuevos se indexan en la misma transacción y, al terminar
+    (finish()), se invalidan las páginas de todo el catálogo.
+
+    Ejemplo:
+        >>> importer = CatalogImporter(images_dir='/datos/portadas', pool=images.create_pool(4))
+        >>> for batch in batches:
+        ...     importer.import_batch(batch)
+        >>> report = importer.finish()
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, images_dir='.', pool=None):
+        """
+        Args:
+            batch_size (int): Filas por consulta de bulk_create()
+            images_dir (str): Carpeta de las rutas relativas de la columna image
+            pool (Executor): Pool de procesos para copiar las portadas y generar
+                sus variantes; sin pool no se copian ni procesan (modo de prueba)
+        """
+        self.batch_size = batch_size
+        self.images_dir = images_dir
+        self.pool = pool
+        self.media_root = str(settings.MEDIA_ROOT)
+        self.report = ImportReport()
+        self._categories = None
+        self._image_names = {}
+        self._image_futures = []
+        self._scheduled_images = set()
+
+    # Categorías
+
+    def _load_categories(self):
+        self._categories = {'id': set(), 'slug': {}, 'name': {}}
+        for category_id, name, slug in Category.objects.values_list('id', 'name', 'slug'):
+            self._categories['id'].add(category_id)
+            self._categories['slug'][slug] = category_id
+            self._categories['name'].setdefault(name.lower(), category_id)
+
+    def _category_id(self, reference):
+        """Id de la categoría de una fila; crea la categoría si se indica por nombre y no existe."""
+        if self._categories is None:
+            self._load_categories()
+        kind, value = reference
+
+        if kind == 'id':
+            if value not in self._categories['id']:
+                raise ValueError(f'no existe la categoría id={value}')
+            return value
+        if kind == 'slug':
+            if value not in self._categories['slug']:
+                raise ValueError(f'no existe la categoría {value!r}')
+            return self._categories['slug'][value]
+
+        category_id = self._categories['name'].get(value.lower())
+        if category_id is None:
+            # save() genera el slug y sus signals invalidan el menú de categorías
+            category = Category.objects.create(name=value)
+            category_id = category.pk
+            self._categories['id'].add(category_id)
+            self._categories['slug'][category.slug] = category_id
+            self._categories['name'][value.lower()] = category_id
+            self.report.categories += 1
+        return category_id
+
+    # Portadas
+
+    def _resolve_image(self, value):
+        """
+        Nombre en MEDIA_ROOT y archivo de origen de la portada de una fila.
+
+        Returns:
+            tuple: (image_name, ruta del archivo a copiar o None si ya está en MEDIA_ROOT)
+        """
+        source = self._image_source(value)
+        if os.path.isfile(source):
+            # Cada archivo de origen se lee una sola vez por importación
+            image_name = self._image_names.get(source)
+            if image_name is None:
+                image_name = self._image_names[source] = images.content_name(IMAGE_UPLOAD_DIR, source)
+            if isinstance(image_name, Exception):
+                raise ValueError(f'no se pudo copiar la portada {value!r}: {image_name}')
+            return image_name, source
+
+        try:
+            if os.path.isfile(safe_join(self.media_root, value)):
+                return value, None
+        except (SuspiciousFileOperation, ValueError):
+            pass
+        raise ValueError(f'no existe la portada {value!r}')
+
+    def _image_source(self, value):
+        return os.path.abspath(value if os.path.isabs(value) else os.path.join(self.images_dir, value))
+
+    def _store_images(self, parsed):
+        """
+        Calcula el nombre y copia a MEDIA_ROOT las portadas externas nuevas de un lote.
+
+        El trabajo se reparte en el pool y se espera a que termine antes de
+        abrir la transacción del lote. Los errores se guardan en lugar del
+        nombre y hacen fallar las filas que usan esa portada.
+        """
+        sources = set()
+        for _, _, _, values in parsed:
+            if values.get('image'):
+                source = self._image_source(values['image'])
+                if source not in self._image_names and os.path.isfile(source):
+                    sources.add(source)
+
+        futures = {
+            self.pool.submit(images.store_image, self.media_root, IMAGE_UPLOAD_DIR, source): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            try:
+                self._image_names[futures[future]] = future.result()
+            except Exception as error:
+                self._image_names[futures[future]] = error
+
+    def _schedule_images(self, pending):
+        """Encola en el pool las variantes de las portadas de un lote ya confirmado (una vez por portada)."""
+        self._scheduled_images.update(pending)
+        for image_name in pending:
+            self._image_futures.append(self.pool.submit(images.ensure_derivatives, self.media_root, image_name))
+
+    # Lotes
+
+    def import_batch(self, rows):
+        """
+        Importa un lote de filas en una transacción.
+
+        Las filas no válidas se anotan en report.errors y no impiden importar el resto.
+
+        Args:
+            rows (list): Tuplas (número de línea, fila) de read_rows()
+        """
+        started = time.monotonic()
+        parsed = []
+        for number, row in rows:
+            try:
+                parsed.append((number, *parse_row(row)))
+            except ValueError as error:
+                self.report.errors.append((number, str(error)))
+        self.report.rows += len(rows)
+
+        if self.pool is not None:
+            self._store_images(parsed)
+
+        with transaction.atomic():
+            self._write(parsed)
+        self.report.db_seconds += time.monotonic() - started
+
+    def _write(self, parsed):
+        """Crea y actualiza los libros de un lote (dentro de la transacción del lote)."""
+        ids = {book_id for _, book_id, _, _ in parsed if book_id is not None}
+        names = {values['name'] for _, book_id, _, values in parsed if book_id is None and 'name' in values}
+
+        # Libros existentes del lote: dos consultas, solo con las columnas que se comparan
+        by_id = Book.objects.only(*LOAD_FIELDS).in_bulk(ids) if ids else {}
+        by_key = {}
+        if names:
+            for book in Book.objects.only(*LOAD_FIELDS).filter(name__in=names).order_by('id'):
+                by_key.setdefault((book.name, book.category_id), book)
+
+        creates = {}
+        updates = {}
+        update_fields = set()
+        pending_images = {}
+
+        for number, book_id, category, values in parsed:
+            try:
+                category_id = self._category_id(category) if category is not None else None
+                source = None
+                if 'image' in values:
+                    values['image'], source = self._resolve_image(values['image'])
+
+                if book_id is not None:
+                    book = by_id.get(book_id)
+                    if book is None:
+                        raise ValueError(f'no existe el libro id={book_id}')
+                else:
+                    if 'name' not in values:
+                        raise ValueError('falta el nombre (name) o el id')
+                    if category_id is None:
+                        raise ValueError('falta la categoría (category, category_slug o category_id)')
+                    key = (values['name'], category_id)
+                    book = by_key.get(key)
+                    if book is None:
+                        book = by_key[key] = Book(category_id=category_id)
+                        creates[id(book)] = book
+
+            except ValueError as error:
+                self.report.errors.append((number, str(error)))
+                continue
+
+            if category_id is not None:
+                values['category_id'] = category_id
+            image_name = values.get('image')
+            if image_name and image_name not in self._scheduled_images:
+                if source is not None or image_name != book.image.name:
+                    pending_images[image_name] = source
+
+            changed = [
+                field for field, value in values.items()
+                if (book.image.name if field == 'image' else getattr(book, field)) != value
+            ]
+            for field in changed:
+                setattr(book, field, values[field])
+
+            if id(book) in creates:
+                continue
+            if changed:
+                updates[book.pk] = book
+                update_fields.update(changed)
+            elif book.pk not in updates:
+                self.report.unchanged += 1
+
+        # version también cambia con la portada o el stock, que BookQuerySet no vigila
+        now = timezone.now()
+        for book in updates.values():
+            book.version = F('version') + 1
+            book.updated_at = now
+
+        created = Book.objects.bulk_create(creates.values(), batch_size=self.batch_size)
+        if updates:
+            Book.objects.bulk_update(updates.values(), [*update_fields, 'version', 'updated_at'])
+
+        if search.fts_enabled():
+            search.index_books(created)
+
+        self.report.created += len(created)
+        self.report.updated += len(updates)
+
+        if pending_images and self.pool is not None:
+            transaction.on_commit(lambda: self._schedule_images(pending_images))
+
+    def finish(self):
+        """
+        Espera a que terminen las portadas e invalida las cachés del catálogo.
+
+        Returns:
+            ImportReport: Resultado de la importación
+        """
+        started = time.monotonic()
+        done = []
+        for future in as_completed(self._image_futures):
+            try:
+                done.append(future.result())
+            except Exception as error:
+                self.report.image_errors.append(str(error))
+        self.report.images = len(done)
+        self.report.image_seconds = time.monotonic() - started
+
+        # Las tarjetas cacheadas antes de tener variantes deben volver a generarse
+        for start in range(0, len(done), INVALIDATE_CHUNK_SIZE):
+            images.invalidate_books_with_images(done[start:start + INVALIDATE_CHUNK_SIZE])
+
+        if self.report.created or self.report.updated:
+            bump_page_scopes('catalog')
+        return self.report
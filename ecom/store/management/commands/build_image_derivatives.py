@@ -0,0 +1,50 @@
+import os
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.images import IMAGE_WORKERS, create_pool, has_derivatives, invalidate_books_with_images, render_derivatives
+from store.models import Book
+
+
+class Command(BaseCommand):
+    """
+    Genera en paralelo las variantes (miniatura, tarjeta, detalle) de las portadas existentes.
+
+    Uso:
+        python manage.py build_image_derivatives
+        python manage.py build_image_derivatives --workers 8 --force
+    """
+    help = 'Genera las variantes redimensionadas (WebP y JPEG) de las portadas de los libros'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=IMAGE_WORKERS, help='Procesos en paralelo')
+        parser.add_argument('--force', action='store_true', help='Regenerar también las variantes que ya existen')
+
+    def handle(self, *args, **options):
+        media_root = str(settings.MEDIA_ROOT)
+        image_names = set(Book.objects.exclude(image='').values_list('image', flat=True).distinct())
+
+        pending = []
+        for image_name in sorted(image_names):
+            if not os.path.exists(os.path.join(media_root, image_name)):
+                self.stderr.write(f'No existe {image_name}')
+            elif options['force'] or not has_derivatives(image_name, media_root):
+                pending.append(image_name)
+
+        done = []
+        with create_pool(options['workers']) as pool:
+            futures = [pool.submit(render_derivatives, media_root, image_name) for image_name in pending]
+            for future in as_completed(futures):
+                try:
+                    done.append(future.result())
+                except Exception as error:
+                    self.stderr.write(f'Error: {error}')
+
+        if done:
+            invalidate_books_with_images(done)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(done)} portadas procesadas, {len(image_names) - len(pending)} ya tenían variantes o no existen'
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.recommendations import ORDERS_PER_CHUNK, build_recommendations, reset_recommendations
+
+
+class Command(BaseCommand):
+    """
+    Actualiza las recomendaciones "Los clientes también compraron" con los pedidos nuevos.
+
+    Es incremental: solo procesa los pedidos posteriores a la última
+    ejecución, así que puede programarse a menudo (por ejemplo, cada hora
+    desde cron). Con --reset se recalcula todo desde el primer pedido.
+
+    Uso:
+        python manage.py build_recommendations
+        python manage.py build_recommendations --reset --chunk-orders 20000
+    """
+    help = 'Calcula de forma incremental las recomendaciones de compra conjunta a partir de los pedidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-orders', type=int, default=ORDERS_PER_CHUNK, help='Pedidos por bloque y transacción')
+        parser.add_argument('--reset', action='store_true', help='Borrar lo calculado y empezar desde el primer pedido')
+
+    def handle(self, *args, **options):
+        if options['chunk_orders'] < 1:
+            raise CommandError('--chunk-orders debe ser mayor que 0')
+        if options['reset']:
+            reset_recommendations()
+
+        def progress(report):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'{report["orders"]} pedidos (hasta el {report["last_order_id"]}), {report["seconds"]:.1f} s')
+
+        report = build_recommendations(options['chunk_orders'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["orders"]} pedidos procesados (último: {report["last_order_id"]}), {report["pairs"]} pares '
+            f'actualizados, {report["books"]} libros recalculados en {report["seconds"]:.2f} s'
+        ))
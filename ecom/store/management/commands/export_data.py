@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.exports import DATASETS, FORMATS, export_lines, parse_since
+
+
+class Command(BaseCommand):
+    """
+    Exporta libros, categorías, pedidos o líneas de pedido a CSV o JSONL en streaming.
+
+    Uso:
+        python manage.py export_data books --format csv --output libros.csv
+        python manage.py export_data order_items --format jsonl --since 2026-10-01 > items.jsonl
+    """
+    help = 'Exporta en streaming libros, categorías, pedidos o líneas de pedido a CSV o JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS), help='Datos a exportar')
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Formato de salida')
+        parser.add_argument('--since', help='Solo filas creadas o modificadas desde esta fecha (ISO 8601)')
+        parser.add_argument('--output', help='Archivo de salida (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_since(options['since'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                lines = self.export(output.write, since, options)
+            self.stdout.write(self.style.SUCCESS(f'{lines} líneas escritas en {options["output"]}'))
+        else:
+            self.export(lambda line: self.stdout.write(line, ending=''), since, options)
+
+    def export(self, write, since, options):
+        """Escribe la exportación línea a línea con write(); retorna el número de líneas."""
+        lines = 0
+        for line in export_lines(options['dataset'], options['format'], since):
+            write(line)
+            lines += 1
+        return lines
@@ -0,0 +1,134 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store.images import IMAGE_WORKERS, create_pool
+from store.imports import FORMATS, IMPORT_BATCH_SIZE, CatalogImporter, read_rows
+
+
+# Errores de filas que se muestran (el resto solo se cuentan)
+MAX_ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    """
+    Importa (crea o actualiza) libros y categorías desde un archivo CSV o JSONL.
+
+    Tras cada lote confirmado se guarda en un archivo de control cuántas filas
+    se han procesado; si la importación se interrumpe, --resume continúa
+    desde ahí. Con --dry-run se valida todo y se informa de lo que se haría
+    sin escribir nada.
+
+    Uso:
+        python manage.py import_catalog libros.csv --images /datos/portadas
+        python manage.py import_catalog libros.jsonl --batch-size 2000 --workers 8
+        python manage.py import_catalog libros.csv --resume
+        python manage.py import_catalog libros.csv --dry-run
+    """
+    help = 'Importa libros y categorías desde CSV o JSONL por lotes, con las portadas en paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo CSV (con cabecera) o JSONL')
+        parser.add_argument('--format', choices=FORMATS, help='Formato del archivo (por defecto, según la extensión)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Filas por lote y transacción')
+        parser.add_argument('--images', help='Carpeta de las portadas (por defecto, la del archivo)')
+        parser.add_argument('--workers', type=int, default=IMAGE_WORKERS, help='Procesos para las portadas')
+        parser.add_argument('--dry-run', action='store_true', help='Validar e informar sin escribir nada')
+        parser.add_argument('--resume', action='store_true', help='Continuar una importación interrumpida')
+        parser.add_argument('--checkpoint', help='Archivo de control (por defecto, PATH.checkpoint)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.isfile(path):
+            raise CommandError(f'No existe {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que 0')
+
+        import_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if import_format not in FORMATS:
+            raise CommandError(f'Formato desconocido; indica --format ({", ".join(FORMATS)})')
+
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        skip = self.read_checkpoint(checkpoint) if options['resume'] else 0
+        images_dir = options['images'] or os.path.dirname(os.path.abspath(path))
+
+        if options['dry_run']:
+            importer = CatalogImporter(options['batch_size'], images_dir)
+            # Todo en una transacción que se deshace: las consultas son las mismas que en la importación real
+            with transaction.atomic():
+                self.run(importer, path, import_format, skip, None, options)
+                transaction.set_rollback(True)
+            report = importer.report
+        else:
+            with create_pool(options['workers']) as pool:
+                importer = CatalogImporter(options['batch_size'], images_dir, pool)
+                self.run(importer, path, import_format, skip, checkpoint, options)
+                report = importer.finish()
+            if os.path.exists(checkpoint):
+                os.remove(checkpoint)
+
+        self.print_report(report, skip, options['dry_run'])
+
+    def read_checkpoint(self, checkpoint):
+        """Filas ya importadas según el archivo de control (0 si no existe)."""
+        if not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint, encoding='utf-8') as file:
+            content = file.read().strip()
+        if not content.isdigit():
+            raise CommandError(f'Archivo de control no válido: {checkpoint}')
+        return int(content)
+
+    def write_checkpoint(self, checkpoint, rows):
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(str(rows))
+        os.replace(temporary, checkpoint)
+
+    def run(self, importer, path, import_format, skip, checkpoint, options):
+        """Lee el archivo e importa sus filas por lotes, guardando el avance tras cada uno."""
+        batch_size = options['batch_size']
+        processed = 0
+        batch = []
+
+        def flush():
+            importer.import_batch(batch)
+            if checkpoint:
+                self.write_checkpoint(checkpoint, processed)
+            if options['verbosity'] >= 2:
+                report = importer.report
+                self.stdout.write(f'{skip + report.rows} filas ({report.rate:.0f} filas/s)')
+            batch.clear()
+
+        for number, row in read_rows(path, import_format):
+            processed += 1
+            if processed <= skip:
+                continue
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+    def print_report(self, report, skip, dry_run):
+        for number, message in sorted(report.errors)[:MAX_ERRORS_SHOWN]:
+            self.stderr.write(f'Línea {number}: {message}')
+        if len(report.errors) > MAX_ERRORS_SHOWN:
+            self.stderr.write(f'... y {len(report.errors) - MAX_ERRORS_SHOWN} errores más')
+        for message in report.image_errors[:MAX_ERRORS_SHOWN]:
+            self.stderr.write(f'Portada: {message}')
+
+        prefix = 'Simulación (no se ha guardado nada): ' if dry_run else ''
+        skipped = f' ({skip} ya importadas antes)' if skip else ''
+        self.stdout.write(
+            f'{prefix}{report.rows} filas leídas{skipped}: {report.created} libros creados, '
+            f'{report.updated} actualizados, {report.unchanged} sin cambios, {len(report.errors)} con errores; '
+            f'{report.categories} categorías creadas'
+        )
+        if not dry_run:
+            self.stdout.write(f'{report.images} portadas procesadas, {len(report.image_errors)} con errores')
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.elapsed:.2f} s ({report.rate:.0f} filas/s; base de datos {report.db_seconds:.2f} s, '
+            f'espera de portadas {report.image_seconds:.2f} s)'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from store.models import Book
+from store.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Reconstruye el índice de búsqueda FTS5 de libros.
+
+    Uso:
+        python manage.py rebuild_search_index
+    """
+    help = 'Reconstruye el índice de búsqueda de texto completo (FTS5) de los libros'
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            raise CommandError('El índice de búsqueda FTS5 solo está disponible con SQLite.')
+
+        with transaction.atomic():
+            total = rebuild_index(Book.objects.all())
+
+        self.stdout.write(self.style.SUCCESS(f'{total} libros indexados'))
@@ -0,0 +1,19 @@
+# Generated manually
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_rename_product_to_book'),
+        # Los carritos se copian a cart.CartItem antes de borrar la columna
+        ('cart', '0002_migrate_old_cart'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='profile',
+            name='old_cart',
+        ),
+    ]
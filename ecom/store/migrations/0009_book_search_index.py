@@ -0,0 +1,52 @@
+# Generated manually
+
+from django.db import migrations
+
+
+# Copia de las definiciones de store.search en el momento de esta migración
+FTS_TABLE = 'store_book_fts'
+
+CREATE_FTS_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+)
+
+BATCH_SIZE = 1000
+
+
+def create_search_index(apps, schema_editor):
+    """Crea y llena el índice FTS5 de libros (solo en SQLite)."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    Book = apps.get_model('store', 'Book')
+    rows = Book.objects.values_list('id', 'name', 'description').iterator(chunk_size=BATCH_SIZE)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_FTS_TABLE)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        batch = []
+        for book_id, name, description in rows:
+            batch.append((book_id, name, description or ''))
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", batch)
+                batch = []
+        if batch:
+            cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_book_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
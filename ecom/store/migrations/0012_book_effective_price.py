@@ -0,0 +1,42 @@
+# Generated manually
+
+from django.db import migrations, models
+from django.db.models import Case, F, When
+
+
+def fill_effective_price(apps, schema_editor):
+    """Calcula effective_price de los libros existentes con un único UPDATE."""
+    Book = apps.get_model('store', 'Book')
+    Book.objects.update(effective_price=Case(When(is_sale=True, then=F('sale_price')), default=F('price')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_book_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='effective_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=6),
+        ),
+        migrations.RunPython(fill_effective_price, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_price_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='book_category_price_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['effective_price', 'id'], name='book_effective_price_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', 'effective_price', 'id'], name='book_cat_eff_price_id_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated manually
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def unique_slug(queryset, name):
+    """Copia de store.models.unique_slug en el momento de esta migración."""
+    base = slugify(name)[:55] or 'categoria'
+    slug = base
+    suffix = 2
+    while queryset.filter(slug=slug).exists():
+        slug = f'{base}-{suffix}'
+        suffix += 1
+    return slug
+
+
+def fill_slugs(apps, schema_editor):
+    """Genera el slug de las categorías existentes a partir de su nombre."""
+    Category = apps.get_model('store', 'Category')
+    for category in Category.objects.order_by('id'):
+        category.slug = unique_slug(Category.objects.exclude(pk=category.pk), category.name)
+        category.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_book_facet_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, db_index=False, default='', max_length=60),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=60, unique=True),
+        ),
+    ]
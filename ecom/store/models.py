@@ -1,6 +1,20 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, When
+from django.db.models.lookups import Exact
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+import os
+import time
+
+from . import images, search
+from .suggest import BOOK, CATEGORY, REBUILD, MAX_PENDING_CHANGES
+from .cache import bump_page_scopes, invalidate_category_menu, invalidate_suggestions
 
 
 
@@ -9,7 +23,7 @@ class Profile(models.Model):
     Perfil extendido del usuario para almacenar información adicional.
     
     Se crea automáticamente cuando un usuario se registra mediante un signal.
-    Almacena datos de contacto, dirección y el carrito persistente (old_cart).
+    Almacena datos de contacto y dirección. El carrito persistente vive en cart.CartItem.
     
     Atributos:
         user (OneToOneField): Relación uno-a-uno con el modelo User de Django
@@ -21,7 +35,6 @@ class Profile(models.Model):
         state (CharField): Provincia o estado
         zipcode (CharField): Código postal
         country (CharField): País de residencia
-        old_cart (CharField): Carrito serializado en JSON para persistencia entre sesiones
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     date_modified = models.DateTimeField(auto_now=True)
@@ -32,7 +45,6 @@ class Profile(models.Model):
     state = models.CharField(max_length=200, blank=True)
     zipcode = models.CharField(max_length=200, blank=True)
     country = models.CharField(max_length=200, blank=True)
-    old_cart = models.CharField(max_length=200, blank=True, null=True)
 
     def __str__(self):
         """Retorna el nombre de usuario como representación del perfil."""
@@ -57,6 +69,23 @@ def create_profile(sender, instance, created, **kwargs):
 post_save.connect(create_profile, sender=User)
 
 
+def unique_slug(queryset, name):
+    """
+    Genera un slug a partir de name que no exista en queryset.
+
+    Ejemplo:
+        >>> unique_slug(Category.objects.all(), 'Ciencia-ficción')
+        'ciencia-ficcion'      # o 'ciencia-ficcion-2' si ya existe
+    """
+    base = slugify(name)[:55] or 'categoria'
+    slug = base
+    suffix = 2
+    while queryset.filter(slug=slug).exists():
+        slug = f'{base}-{suffix}'
+        suffix += 1
+    return slug
+
+
 class Category(models.Model):
     """
     Categoría para clasificar libros (Ficción, Filosofía, Historia, etc.).
@@ -66,16 +95,154 @@ class Category(models.Model):
     
     Atributos:
         name (CharField): Nombre de la categoría (máximo 50 caracteres)
+        slug (SlugField): Identificador único para la URL (se genera del nombre)
+        updated_at (DateTimeField): Fecha de la última modificación
     """
     name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=60, unique=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         """Retorna el nombre de la categoría."""
         return self.name
+
+    def get_absolute_url(self):
+        """URL de la página de la categoría."""
+        return reverse('category', args=[self.slug])
+
+    def save(self, *args, **kwargs):
+        """Guarda la categoría generando un slug único a partir del nombre si no tiene."""
+        if not self.slug:
+            self.slug = unique_slug(type(self)._default_manager.exclude(pk=self.pk), self.name)
+        super().save(*args, **kwargs)
     
     class Meta:
         verbose_name_plural = 'categories'
 
+# Columnas de cada "forma" de Book: solo las que usa la plantilla correspondiente
+CARD_FIELDS = ('id', 'name', 'image', 'price', 'is_sale', 'sale_price', 'effective_price', 'version')
+DETAIL_FIELDS = ('id', 'name', 'description', 'image', 'price', 'is_sale', 'sale_price', 'effective_price', 'category__name', 'category__slug')
+CART_LINE_FIELDS = ('id', 'name', 'description', 'image', 'price', 'is_sale', 'sale_price', 'effective_price')
+
+# Campos de los que depende effective_price
+EFFECTIVE_PRICE_SOURCES = ('price', 'sale_price', 'is_sale')
+
+# Campos de Book que se copian en la instantánea de precios del carrito
+PRICE_FIELDS = ('name', 'price', 'sale_price', 'is_sale')
+
+# Campos que guarda el índice de búsqueda FTS5
+SEARCH_FIELDS = ('name', 'description')
+
+# Libros a partir de los cuales una operación masiva invalida las páginas de
+# todo el catálogo en lugar de las de cada libro
+BULK_PAGE_SCOPES_LIMIT = 500
+
+# Libros por consulta al releer los libros de una operación masiva
+BULK_CHUNK_SIZE = 500
+
+
+def effective_price_expression(price=F('price'), sale_price=F('sale_price'), is_sale=F('is_sale')):
+    """
+    Expresión SQL del precio efectivo: sale_price si is_sale, si no price.
+
+    Los argumentos permiten calcularlo con los valores nuevos de un UPDATE
+    (en SQL, las expresiones del SET ven los valores anteriores de la fila).
+
+    Ejemplo:
+        >>> Book.objects.filter(category=poesia).update(is_sale=True)
+        # UPDATE ... SET is_sale = true, effective_price = sale_price
+    """
+    if isinstance(is_sale, bool):
+        return sale_price if is_sale else price
+    return Case(
+        When(Exact(is_sale, True), then=sale_price), default=price,
+        output_field=models.DecimalField(decimal_places=2, max_digits=6),
+    )
+
+
+class BookQuerySet(models.QuerySet):
+    """
+    QuerySet de Book con proyecciones para cada uso.
+
+    La descripción (TextField sin límite) es la mayor parte de cada fila, así
+    que los listados no deben cargarla: cada proyección carga solo las
+    columnas que su plantilla muestra.
+
+    Ejemplo:
+        >>> Book.objects.cards().filter(category=category)
+        >>> Book.objects.detail().get(id=5)
+    """
+
+    def cards(self):
+        """Tarjetas de los listados (product_card.html, search_card.html): sin descripción."""
+        return self.only(*CARD_FIELDS)
+
+    def detail(self):
+        """Ficha del libro (product.html): con descripción y el nombre de la categoría en la misma consulta."""
+        return self.select_related('category').only(*DETAIL_FIELDS)
+
+    def cart_lines(self):
+        """Líneas del carrito (cart_summary.html, checkout, pedidos)."""
+        return self.only(*CART_LINE_FIELDS)
+
+    # Las operaciones masivas no llaman a save() ni disparan signals: update() y
+    # bulk_update() hacen lo mismo que ellos (ver after_bulk_change) y, como
+    # bulk_create(), mantienen effective_price
+
+    def update(self, **kwargs):
+        if any(field in kwargs for field in EFFECTIVE_PRICE_SOURCES) and 'effective_price' not in kwargs:
+            kwargs['effective_price'] = effective_price_expression(
+                **{field: kwargs[field] for field in EFFECTIVE_PRICE_SOURCES if field in kwargs}
+            )
+        fields = set(kwargs)
+        if not fields & {*PRICE_FIELDS, *SEARCH_FIELDS}:
+            return super().update(**kwargs)
+        if fields & set(PRICE_FIELDS):
+            kwargs.setdefault('version', F('version') + 1)
+            kwargs.setdefault('updated_at', timezone.now())
+
+        with transaction.atomic(using=self.db):
+            books = list(self.values_list('id', 'category_id'))
+            rows = super().update(**kwargs)
+            after_bulk_change(books, fields)
+        return rows
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        fields = list(fields)
+        if any(field in fields for field in EFFECTIVE_PRICE_SOURCES):
+            for obj in objs:
+                obj.effective_price = obj.get_effective_price()
+            if 'effective_price' not in fields:
+                fields.append('effective_price')
+        changed = set(fields)
+        if not changed & {*PRICE_FIELDS, *SEARCH_FIELDS}:
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+        if changed & set(PRICE_FIELDS) and 'version' not in changed:
+            now = timezone.now()
+            for obj in objs:
+                obj.version = F('version') + 1
+                obj.updated_at = now
+            fields += ['version', 'updated_at']
+
+        with transaction.atomic(using=self.db):
+            rows = super().bulk_update(objs, fields, batch_size=batch_size)
+            after_bulk_change([(obj.pk, obj.category_id) for obj in objs], changed, objs)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.effective_price = obj.get_effective_price()
+        update_fields = kwargs.get('update_fields')
+        if update_fields and any(field in update_fields for field in EFFECTIVE_PRICE_SOURCES):
+            kwargs['update_fields'] = [*update_fields, 'effective_price']
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            record_suggestion_changes([(BOOK, obj.pk, obj.name) for obj in created if obj.pk is not None])
+        return created
+
+
 class Book(models.Model):
     """
     Modelo principal de producto: Libro disponible para la venta.
@@ -91,6 +258,15 @@ class Book(models.Model):
         image (ImageField): Imagen de portada del libro
         is_sale (BooleanField): Indica si el libro está en oferta
         sale_price (DecimalField): Precio con descuento cuando is_sale=True
+        effective_price (DecimalField): Precio que paga el cliente (sale_price
+            si is_sale, si no price); columna indexada que se mantiene al
+            guardar y en update()/bulk_update()/bulk_create()
+        version (PositiveIntegerField): Se incrementa en cada guardado; forma
+            parte de la clave de caché de la tarjeta del libro (ver catalog_tags)
+        updated_at (DateTimeField): Fecha de la última modificación (Last-Modified)
+        stock (PositiveIntegerField): Unidades disponibles; None si no se
+            controla el inventario del libro (venta ilimitada). Se descuenta
+            con UPDATE condicionales (ver payment.stock)
     
     Ejemplo:
         >>> book = Book.objects.create(
@@ -111,6 +287,364 @@ class Book(models.Model):
     is_sale = models.BooleanField(default=False)
     sale_price = models.DecimalField(default=0, decimal_places=2, max_digits=6)
 
+    # Precio efectivo desnormalizado para ordenar, filtrar y sumar en SQL
+    effective_price = models.DecimalField(default=0, decimal_places=2, max_digits=6, editable=False)
+
+    # Versión para la caché de fragmentos de las tarjetas
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Inventario (None = sin control de stock)
+    stock = models.PositiveIntegerField(null=True, blank=True)
+
+    objects = BookQuerySet.as_manager()
+
     def __str__(self):
         """Retorna el nombre del libro."""
         return self.name
+
+    def get_effective_price(self):
+        """Precio que paga el cliente: sale_price si el libro está en oferta, si no price."""
+        return self.sale_price if self.is_sale else self.price
+
+    def save(self, *args, **kwargs):
+        """
+        Guarda el libro recalculando effective_price.
+
+        Con update_fields se guardan también las columnas que se calculan al
+        guardar, para que no se queden desfasadas: effective_price, version
+        (la incrementa detect_price_change e invalida la tarjeta cacheada) y
+        updated_at (Last-Modified de las páginas).
+        """
+        self.effective_price = self.get_effective_price()
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            fields = {*update_fields, 'version', 'updated_at'}
+            if fields & set(EFFECTIVE_PRICE_SOURCES):
+                fields.add('effective_price')
+            kwargs['update_fields'] = fields
+        super().save(*args, **kwargs)
+
+    class Meta:
+        # Índices para la paginación por cursor de los listados (ver store.pagination)
+        indexes = [
+            models.Index(fields=['name', 'id'], name='book_name_id_idx'),
+            models.Index(fields=['effective_price', 'id'], name='book_effective_price_id_idx'),
+            models.Index(fields=['category', 'name', 'id'], name='book_category_name_id_idx'),
+            models.Index(fields=['category', 'effective_price', 'id'], name='book_cat_eff_price_id_idx'),
+            # Filtros por oferta y precio, con y sin categoría (ver store.facets)
+            models.Index(fields=['category', 'is_sale', 'effective_price', 'id'], name='book_cat_sale_price_idx'),
+            models.Index(fields=['is_sale', 'effective_price', 'id'], name='book_sale_price_idx'),
+        ]
+
+
+class BookCoPurchase(models.Model):
+    """
+    Número de pedidos en los que se compraron juntos dos libros.
+
+    Es la matriz dispersa de co-ocurrencias de OrderItem, guardada en las dos
+    direcciones (book -> other y other -> book). Se actualiza de forma
+    incremental con manage.py build_recommendations (ver store.recommendations).
+
+    Atributos:
+        book (ForeignKey): Libro
+        other (ForeignKey): Libro comprado junto con book
+        count (PositiveIntegerField): Pedidos que contienen ambos
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', db_index=False)
+    other = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'other'], name='book_copurchase_pair_uniq'),
+        ]
+
+
+class BookRecommendation(models.Model):
+    """
+    Recomendación "Los clientes también compraron" precalculada.
+
+    Para cada libro se guardan sus TOP_K libros con más compras conjuntas
+    (ver store.recommendations); la ficha los lee con una sola consulta por
+    el índice (book, rank).
+
+    Atributos:
+        book (ForeignKey): Libro en cuya ficha se muestra la recomendación
+        recommended (ForeignKey): Libro recomendado
+        rank (PositiveSmallIntegerField): Posición (0 = el más comprado junto con book)
+        score (PositiveIntegerField): Pedidos en los que se compraron juntos
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations', db_index=False)
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommended_in')
+    rank = models.PositiveSmallIntegerField()
+    score = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='book_recommendation_rank_uniq'),
+        ]
+
+
+class RecommendationState(models.Model):
+    """
+    Avance del cálculo incremental de recomendaciones (una sola fila, pk=1).
+
+    Atributos:
+        last_order_id (PositiveBigIntegerField): Último pedido ya contabilizado en BookCoPurchase
+        updated_at (DateTimeField): Fecha del último cálculo
+    """
+    last_order_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class SuggestionChange(models.Model):
+    """
+    Registro de cambios del índice de autocompletado, compartido por todos los procesos.
+
+    Cada proceso guarda el id del último cambio aplicado a su copia en memoria
+    y solo lee los posteriores (ver store.suggest.SuggestionIndex). SQLite
+    admite una sola transacción de escritura a la vez, así que los ids se
+    confirman en orden. Las filas antiguas se borran al reconstruir el índice.
+
+    Atributos:
+        kind (PositiveSmallIntegerField): BOOK, CATEGORY o REBUILD (reconstruir entero)
+        object_id (PositiveBigIntegerField): Id del libro o de la categoría
+        label (CharField): Nuevo título, o None si se borró
+        created_at (DateTimeField): Fecha del cambio
+    """
+    kind = models.PositiveSmallIntegerField()
+    object_id = models.PositiveBigIntegerField()
+    label = models.CharField(max_length=100, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+def record_suggestion_changes(changes):
+    """
+    Anota cambios de títulos en el registro del autocompletado.
+
+    Se escriben en la misma transacción que el cambio y, al confirmarse,
+    se cambia la versión para que los procesos lean el registro. Si son más de
+    MAX_PENDING_CHANGES se anota solo una reconstrucción completa.
+
+    Args:
+        changes (list[tuple]): Tuplas (kind, id, label o None si se borró)
+
+    Ejemplo:
+        >>> record_suggestion_changes([(BOOK, book.id, book.name)])
+    """
+    if not changes:
+        return
+    if len(changes) > MAX_PENDING_CHANGES:
+        changes = [(REBUILD, 0, None)]
+    SuggestionChange.objects.bulk_create(
+        SuggestionChange(kind=kind, object_id=object_id, label=label)
+        for kind, object_id, label in changes
+    )
+    transaction.on_commit(invalidate_suggestions)
+
+
+def after_bulk_change(books, fields, objs=None):
+    """
+    Hace tras un update()/bulk_update() de Book lo que harían los signals de save().
+
+    Se llama dentro de la transacción de la operación: reindexa los libros en
+    el índice de búsqueda y anota los títulos nuevos para el autocompletado;
+    al confirmarse, invalida las instantáneas de precios del carrito y las
+    páginas cacheadas de los libros (las de todo el catálogo si son más de
+    BULK_PAGE_SCOPES_LIMIT o cambian de categoría). version y updated_at los
+    fija la propia operación.
+
+    Args:
+        books (list[tuple]): (id, category_id) de los libros modificados
+        fields (set): Campos modificados
+        objs (list[Book]): Los libros modificados, si están en memoria (bulk_update())
+    """
+    ids = [book_id for book_id, _ in books]
+    if not ids:
+        return
+
+    if fields & set(SEARCH_FIELDS):
+        reindex = search.fts_enabled()
+        record_names = 'name' in fields and len(ids) <= MAX_PENDING_CHANGES
+        # Los libros en memoria sirven si tienen cargados los campos indexados
+        loaded = objs is not None and not any(obj.get_deferred_fields() & set(SEARCH_FIELDS) for obj in objs)
+        changes = []
+        for start in range(0, len(ids), BULK_CHUNK_SIZE):
+            if loaded:
+                chunk = objs[start:start + BULK_CHUNK_SIZE]
+            else:
+                chunk = list(Book.objects.only('id', *SEARCH_FIELDS).filter(id__in=ids[start:start + BULK_CHUNK_SIZE]))
+            if reindex:
+                search.index_books(chunk)
+            if record_names:
+                changes += [(BOOK, book.pk, book.name) for book in chunk]
+        if 'name' in fields:
+            record_suggestion_changes(changes if record_names else [(REBUILD, 0, None)])
+
+    if not fields & set(PRICE_FIELDS):
+        return
+
+    if len(ids) > BULK_PAGE_SCOPES_LIMIT or fields & {'category', 'category_id'}:
+        scopes = {'catalog'}
+    else:
+        scopes = {'home'}
+        for book_id, category_id in books:
+            scopes.update((f'product:{book_id}', f'category:{category_id}'))
+        recommending = BookRecommendation.objects.filter(recommended_id__in=ids).values_list('book_id', flat=True)
+        scopes.update(f'product:{book_id}' for book_id in recommending)
+
+    def invalidate():
+        bump_price_version()
+        bump_page_scopes(*scopes)
+    transaction.on_commit(invalidate)
+
+# Clave de caché con la versión de precios del catálogo
+PRICE_VERSION_CACHE_KEY = 'store:price_version'
+
+
+def get_price_version():
+    """
+    Retorna la versión actual de precios del catálogo.
+
+    El carrito guarda en la sesión una instantánea de precios sellada con esta
+    versión; mientras coincida, los totales se calculan sin consultar Book.
+    Si la versión no está en caché (arranque, expulsión) se crea una nueva,
+    lo que simplemente obliga a revalidar las instantáneas.
+
+    Returns:
+        int: Versión de precios (marca de tiempo en nanosegundos)
+    """
+    version = cache.get(PRICE_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(PRICE_VERSION_CACHE_KEY, time.time_ns(), None)
+        version = cache.get(PRICE_VERSION_CACHE_KEY)
+    return version
+
+
+def bump_price_version():
+    """Invalida todas las instantáneas de precios de los carritos."""
+    cache.set(PRICE_VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+@receiver(pre_save, sender=Book)
+def detect_price_change(sender, instance, **kwargs):
+    """
+    Signal que detecta si un libro existente cambia de nombre, precio u oferta.
+
+    También recuerda la categoría anterior para invalidar su página cacheada,
+    si cambia la portada (para generar sus variantes) e incrementa la versión
+    del libro, lo que invalida su tarjeta cacheada.
+
+    Nota:
+        QuerySet.update() y bulk_update() no disparan signals; BookQuerySet
+        hace lo equivalente por su cuenta (ver after_bulk_change).
+    """
+    instance._price_changed = False
+    instance._old_category_id = None
+    instance._image_changed = True
+    instance._name_changed = True
+    if instance.pk:
+        old = sender._default_manager.filter(pk=instance.pk).values(*PRICE_FIELDS, 'category_id', 'version', 'image').first()
+        if old is not None:
+            instance._price_changed = any(old[field] != getattr(instance, field) for field in PRICE_FIELDS)
+            instance._old_category_id = old['category_id']
+            instance._image_changed = old['image'] != instance.image.name
+            instance._name_changed = old['name'] != instance.name
+            instance.version = old['version'] + 1
+
+
+@receiver(post_save, sender=Book)
+def bump_price_version_on_save(sender, instance, created, **kwargs):
+    """Signal que invalida las instantáneas de precios cuando cambia un precio."""
+    if getattr(instance, '_price_changed', False):
+        transaction.on_commit(bump_price_version)
+
+
+@receiver(post_delete, sender=Book)
+def bump_price_version_on_delete(sender, instance, **kwargs):
+    """Signal que invalida las instantáneas de precios al borrar un libro."""
+    transaction.on_commit(bump_price_version)
+
+
+@receiver(post_save, sender=Book)
+def generate_image_derivatives(sender, instance, **kwargs):
+    """Signal que encola la generación de las variantes de una portada nueva o cambiada."""
+    if not getattr(instance, '_image_changed', False) or not instance.image:
+        return
+    image_name = instance.image.name
+    if os.path.exists(os.path.join(settings.MEDIA_ROOT, image_name)):
+        transaction.on_commit(lambda: images.schedule_derivatives(image_name))
+
+
+@receiver(post_save, sender=Book)
+def update_search_index(sender, instance, **kwargs):
+    """Signal que mantiene actualizado el índice de búsqueda FTS5 al guardar un libro."""
+    if search.fts_enabled():
+        search.index_book(instance)
+
+
+@receiver(post_delete, sender=Book)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Signal que elimina un libro borrado del índice de búsqueda FTS5."""
+    if search.fts_enabled():
+        search.unindex_book(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Category)
+def update_suggestions(sender, instance, created, **kwargs):
+    """Signal que anota en el registro del autocompletado un libro o una categoría nuevos o renombrados."""
+    if created or getattr(instance, '_name_changed', True):
+        record_suggestion_changes([(CATEGORY if sender is Category else BOOK, instance.pk, instance.name)])
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Category)
+def remove_suggestion(sender, instance, **kwargs):
+    """Signal que anota en el registro del autocompletado un libro o una categoría borrados."""
+    record_suggestion_changes([(CATEGORY if sender is Category else BOOK, instance.pk, None)])
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_pages(sender, instance, **kwargs):
+    """
+    Signal que invalida las páginas cacheadas que muestran un libro.
+
+    Solo se invalidan la ficha del libro, el listado de inicio y las páginas de
+    su categoría (la actual y la anterior si ha cambiado).
+    """
+    scopes = {'home', f'product:{instance.pk}', f'category:{instance.category_id}'}
+    old_category_id = getattr(instance, '_old_category_id', None)
+    if old_category_id is not None:
+        scopes.add(f'category:{old_category_id}')
+    transaction.on_commit(lambda: bump_page_scopes(*scopes))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_pages(sender, instance, **kwargs):
+    """Signal que invalida el menú de categorías y todas las páginas cacheadas al cambiar una categoría."""
+    def invalidate():
+        invalidate_category_menu()
+        bump_page_scopes('catalog')
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Book)
+@receiver(pre_delete, sender=Book)
+def invalidate_recommending_pages(sender, instance, **kwargs):
+    """
+    Signal que invalida las fichas que recomiendan un libro guardado o borrado.
+
+    Esas fichas muestran la tarjeta del libro (precio, portada) en
+    "Los clientes también compraron"; sus recomendaciones cacheadas dependen
+    de los mismos ámbitos (ver store.recommendations.recommendations_for).
+    """
+    scopes = [
+        f'product:{book_id}'
+        for book_id in BookRecommendation.objects.filter(recommended_id=instance.pk).values_list('book_id', flat=True)
+    ]
+    if scopes:
+        transaction.on_commit(lambda: bump_page_scopes(*scopes))
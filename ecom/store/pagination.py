@@ -0,0 +1,151 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+# Libros por página en los listados del catálogo
+PAGE_SIZE = 24
+
+# Ordenaciones permitidas: nombre en la URL -> campo de Book ('-' = descendente).
+# El id se añade siempre como desempate (en el mismo sentido) para que el orden sea total.
+# 'price' ordena por el precio que paga el cliente (con la oferta aplicada).
+ORDERINGS = {
+    'id': 'id',
+    'newest': '-id',
+    'name': 'name',
+    'price': 'effective_price',
+}
+
+DEFAULT_ORDERING = 'id'
+
+
+class InvalidCursor(ValueError):
+    """El cursor ?after= no es válido (manipulado, truncado o de otra ordenación)."""
+
+
+class KeysetPage():
+    """
+    Página de resultados obtenida con paginación por cursor (keyset).
+
+    En lugar de OFFSET, cada página filtra "después de la última fila vista"
+    sobre un orden indexado, así que el coste es el mismo en la página 1 y en
+    la 10.000.
+
+    Atributos:
+        items (list): Objetos de la página
+        ordering (str): Nombre de la ordenación usada (clave de ORDERINGS)
+        next_cursor (str o None): Cursor para pedir la página siguiente (?after=)
+        has_next (bool): True si hay más resultados
+    """
+
+    def __init__(self, items, ordering, next_cursor):
+        self.items = items
+        self.ordering = ordering
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(value, pk):
+    """Codifica la posición (valor de ordenación, id) como cursor opaco para la URL."""
+    if isinstance(value, Decimal):
+        value = str(value)
+    raw = json.dumps([value, pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field=None):
+    """
+    Decodifica un cursor generado por encode_cursor.
+
+    Args:
+        cursor (str): Cursor de la URL (?after=)
+        field (Field): Campo de ordenación; si se indica, el valor se valida y
+            convierte con field.clean() (Decimal para los precios, etc.)
+
+    Returns:
+        tuple o None: (valor, id), o None si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        if field is not None:
+            value = field.clean(value, None)
+        if value is None:
+            return None
+        return value, int(pk)
+    except (ValidationError, ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(queryset, ordering=None, after=None, page_size=PAGE_SIZE):
+    """
+    Devuelve una página de un queryset de Book ordenado por (campo, id).
+
+    Args:
+        queryset (QuerySet): Libros a paginar (ya filtrados)
+        ordering (str): Clave de ORDERINGS; si no es válida se usa DEFAULT_ORDERING
+        after (str): Cursor de la última fila de la página anterior (?after=)
+        page_size (int): Número de resultados por página
+
+    Returns:
+        KeysetPage: Página con los libros (o diccionarios si el queryset usa
+            .values(), que debe incluir id y el campo de ordenación) y el
+            cursor de la siguiente
+
+    Raises:
+        InvalidCursor: Si after no es un cursor válido para la ordenación
+
+    Ejemplo:
+        >>> page = keyset_paginate(Book.objects.all(), 'price', request.GET.get('after'))
+        >>> page.next_cursor
+        'WyIxOS45OSIsNDJd'
+    """
+    if ordering not in ORDERINGS:
+        ordering = DEFAULT_ORDERING
+    field = ORDERINGS[ordering]
+    descending = field.startswith('-')
+    field = field.lstrip('-')
+    after_lookup = 'lt' if descending else 'gt'
+
+    # Filtrar a partir de la última fila vista
+    position = None
+    if after:
+        position = decode_cursor(after, queryset.model._meta.get_field(field))
+        if position is None:
+            raise InvalidCursor(after)
+    if position is not None:
+        value, pk = position
+        if field == 'id':
+            queryset = queryset.filter(**{f'id__{after_lookup}': pk})
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{after_lookup}': value}) | Q(**{field: value, f'id__{after_lookup}': pk})
+            )
+
+    order_by = ('id',) if field == 'id' else (field, 'id')
+    if descending:
+        order_by = tuple(f'-{name}' for name in order_by)
+
+    # Pedir una fila de más para saber si hay página siguiente
+    items = list(queryset.order_by(*order_by)[:page_size + 1])
+
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        if isinstance(last, dict):
+            # Querysets .values() (API JSON)
+            next_cursor = encode_cursor(last[field], last['id'])
+        else:
+            next_cursor = encode_cursor(getattr(last, field), last.id)
+
+    return KeysetPage(items, ordering, next_cursor)
@@ -0,0 +1,245 @@
+"""
+Recomendaciones "Los clientes también compraron" a partir de OrderItem.
+
+El cálculo (manage.py build_recommendations) es incremental: recorre solo los
+pedidos posteriores a RecommendationState.last_order_id, en orden y por
+bloques, y para cada bloque:
+
+    1. Cuenta en memoria los pares de libros comprados juntos (un Counter
+       disperso, sin la matriz completa).
+    2. Suma esos recuentos a BookCoPurchase (la matriz de co-ocurrencias).
+    3. Recalcula el top-K de los libros afectados. Como los recuentos solo
+       crecen, el nuevo top-K sale del anterior (BookRecommendation) más los
+       pares que han cambiado, sin releer todos los vecinos de cada libro.
+    4. Guarda el último pedido procesado, en la misma transacción.
+
+La memoria depende del tamaño del bloque (ORDERS_PER_CHUNK, MAX_PENDING_PAIRS)
+y no del número total de líneas de pedido. Si el proceso se interrumpe, la
+siguiente ejecución continúa desde el último bloque confirmado.
+
+La ficha del libro lee sus recomendaciones con recommendations_for(): una
+consulta por el índice (book, rank) de BookRecommendation, cacheada.
+"""
+import datetime
+import heapq
+import itertools
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import PAGE_CACHE_TIMEOUT, bump_page_scopes, scope_versions
+from .models import Book, BookCoPurchase, BookRecommendation, RecommendationState
+
+
+# Libros recomendados por ficha
+TOP_K = getattr(settings, 'RECOMMENDATIONS_PER_BOOK', 4)
+
+# Pedidos por bloque (y por transacción)
+ORDERS_PER_CHUNK = 5000
+
+# Pares pendientes que fuerzan a cerrar el bloque antes (pedidos con muchos libros)
+MAX_PENDING_PAIRS = 200000
+
+# Los pedidos con más libros distintos (compras institucionales, etc.) no cuentan:
+# aportan muchos pares y poca información
+MAX_ORDER_BOOKS = 50
+
+# Solo se procesan los pedidos con esta antigüedad, para no saltarse uno con
+# id menor cuya transacción aún no se había confirmado
+SETTLE_SECONDS = 60
+
+# Libros por consulta al leer y escribir los recuentos de un bloque
+QUERY_CHUNK_SIZE = 500
+
+# Filas leídas de OrderItem en cada ida a la base de datos
+ITERATOR_CHUNK_SIZE = 5000
+
+
+def _scopes(book_id):
+    return ['catalog', f'product:{book_id}']
+
+
+def recommendations_for(book_id):
+    """
+    Libros recomendados en la ficha de un libro (proyección de tarjetas).
+
+    Se cachean con la versión de los ámbitos de la ficha, así que se
+    invalidan junto con ella: al recalcular las recomendaciones, al cambiar
+    un libro recomendado (ver signals en models.py) o todo el catálogo.
+
+    Returns:
+        list[Book]: Hasta TOP_K libros, el más comprado junto con book_id primero
+
+    Ejemplo:
+        >>> recommendations_for(5)
+        [<Book: Macbeth>, <Book: Otelo>]
+    """
+    versions = '-'.join(str(version) for version in scope_versions(_scopes(book_id)))
+    key = f'recommendations:{book_id}:{versions}'
+    books = cache.get(key)
+    if books is None:
+        books = list(
+            Book.objects.cards()
+            .filter(recommended_in__book_id=book_id)
+            .order_by('recommended_in__rank')
+        )
+        cache.set(key, books, PAGE_CACHE_TIMEOUT)
+    return books
+
+
+def _chunks(items, size=QUERY_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _settled_order_id():
+    """Id del último pedido con al menos SETTLE_SECONDS de antigüedad (0 si no hay)."""
+    from payment.models import Order
+
+    cutoff = timezone.now() - datetime.timedelta(seconds=SETTLE_SECONDS)
+    return Order.objects.filter(date_ordered__lte=cutoff).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _order_baskets(after_order_id, until_order_id):
+    """
+    Recorre las líneas de pedido en orden de pedido, agrupadas.
+
+    Yields:
+        tuple: (order_id, set de ids de libros del pedido)
+    """
+    from payment.models import OrderItem
+
+    rows = (
+        OrderItem.objects.filter(order_id__gt=after_order_id, order_id__lte=until_order_id, product_id__isnull=False)
+        .order_by('order_id')
+        .values_list('order_id', 'product_id')
+        .iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    )
+    for order_id, items in itertools.groupby(rows, key=lambda row: row[0]):
+        yield order_id, {product_id for _, product_id in items}
+
+
+def _apply_pairs(pairs, last_order_id):
+    """
+    Suma un bloque de pares a BookCoPurchase y recalcula el top-K de los libros afectados.
+
+    Args:
+        pairs (Counter): {(book_id, other_id): pedidos nuevos en que se compraron juntos}
+        last_order_id (int): Último pedido del bloque
+
+    Returns:
+        list[int]: Libros cuyas recomendaciones se han recalculado
+    """
+    partners = {}
+    for book_id, other_id in pairs:
+        partners.setdefault(book_id, set()).add(other_id)
+    book_ids = sorted(partners)
+
+    with transaction.atomic():
+        for chunk in _chunks(book_ids):
+            # Recuentos actuales de los pares del bloque (una consulta por grupo de libros)
+            other_ids = set().union(*(partners[book_id] for book_id in chunk))
+            totals = {
+                (book_id, other_id): count
+                for book_id, other_id, count in BookCoPurchase.objects.filter(
+                    book_id__in=chunk, other_id__in=other_ids
+                ).values_list('book_id', 'other_id', 'count')
+                if (book_id, other_id) in pairs
+            }
+            for pair in [(book_id, other_id) for book_id in chunk for other_id in partners[book_id]]:
+                totals[pair] = totals.get(pair, 0) + pairs[pair]
+
+            BookCoPurchase.objects.bulk_create(
+                [BookCoPurchase(book_id=book_id, other_id=other_id, count=count) for (book_id, other_id), count in totals.items()],
+                update_conflicts=True,
+                unique_fields=['book', 'other'],
+                update_fields=['count'],
+                batch_size=QUERY_CHUNK_SIZE,
+            )
+
+            # Candidatos: el top-K anterior más los pares que han crecido
+            candidates = {book_id: {} for book_id in chunk}
+            for book_id, other_id, score in BookRecommendation.objects.filter(book_id__in=chunk).values_list(
+                'book_id', 'recommended_id', 'score'
+            ):
+                candidates[book_id][other_id] = score
+            for (book_id, other_id), count in totals.items():
+                candidates[book_id][other_id] = count
+
+            recommendations = []
+            for book_id in chunk:
+                top = heapq.nsmallest(TOP_K, candidates[book_id].items(), key=lambda item: (-item[1], item[0]))
+                recommendations.extend(
+                    BookRecommendation(book_id=book_id, recommended_id=other_id, rank=rank, score=score)
+                    for rank, (other_id, score) in enumerate(top)
+                )
+            BookRecommendation.objects.filter(book_id__in=chunk).delete()
+            BookRecommendation.objects.bulk_create(recommendations, batch_size=QUERY_CHUNK_SIZE)
+
+        RecommendationState.objects.update_or_create(pk=1, defaults={'last_order_id': last_order_id})
+        transaction.on_commit(lambda: bump_page_scopes(*[f'product:{book_id}' for book_id in book_ids]))
+
+    return book_ids
+
+
+def build_recommendations(orders_per_chunk=ORDERS_PER_CHUNK, progress=None):
+    """
+    Incorpora a las recomendaciones los pedidos nuevos desde el último cálculo.
+
+    Args:
+        orders_per_chunk (int): Pedidos por bloque y transacción
+        progress (callable): Función opcional que recibe el informe tras cada bloque
+
+    Returns:
+        dict: {'orders', 'pairs', 'books', 'last_order_id', 'seconds'}
+    """
+    started = time.monotonic()
+    state = RecommendationState.objects.filter(pk=1).first()
+    last_order_id = state.last_order_id if state else 0
+    until_order_id = _settled_order_id()
+    report = {'orders': 0, 'pairs': 0, 'books': 0, 'last_order_id': last_order_id}
+
+    def flush(pairs, order_id):
+        books = _apply_pairs(pairs, order_id) if pairs else []
+        if not pairs:
+            RecommendationState.objects.update_or_create(pk=1, defaults={'last_order_id': order_id})
+        report['pairs'] += len(pairs)
+        report['books'] += len(books)
+        report['last_order_id'] = order_id
+        report['seconds'] = time.monotonic() - started
+        if progress is not None:
+            progress(report)
+
+    pairs = Counter()
+    orders = 0
+    order_id = last_order_id
+    for order_id, book_ids in _order_baskets(last_order_id, until_order_id):
+        orders += 1
+        report['orders'] += 1
+        if 1 < len(book_ids) <= MAX_ORDER_BOOKS:
+            for book_id, other_id in itertools.permutations(book_ids, 2):
+                pairs[book_id, other_id] += 1
+        if orders >= orders_per_chunk or len(pairs) >= MAX_PENDING_PAIRS:
+            flush(pairs, order_id)
+            pairs = Counter()
+            orders = 0
+
+    if order_id != report['last_order_id']:
+        flush(pairs, order_id)
+
+    report['seconds'] = time.monotonic() - started
+    return report
+
+
+def reset_recommendations():
+    """Borra los recuentos y las recomendaciones para recalcularlos desde el primer pedido."""
+    with transaction.atomic():
+        BookRecommendation.objects.all().delete()
+        BookCoPurchase.objects.all().delete()
+        RecommendationState.objects.all().delete()
+        transaction.on_commit(lambda: bump_page_scopes('catalog'))
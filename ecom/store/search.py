@@ -0,0 +1,137 @@
+import re
+
+from django.db import connection
+
+
+# Tabla virtual FTS5 con el índice de búsqueda de libros (rowid = Book.id)
+FTS_TABLE = 'store_book_fts'
+
+# unicode61 con remove_diacritics 2 pliega mayúsculas y acentos: "poesia" encuentra "Poesía"
+CREATE_FTS_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(name, description, tokenize='unicode61 remove_diacritics 2')"
+)
+
+# Peso de cada columna en el ranking BM25 (el título pesa más que la sinopsis)
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Máximo de resultados devueltos por una búsqueda
+SEARCH_LIMIT = 100
+
+# Filas por lote al reconstruir el índice
+REBUILD_BATCH_SIZE = 1000
+
+
+def fts_enabled():
+    """Retorna True si la base de datos soporta el índice FTS5 (SQLite)."""
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Convierte el texto introducido por el usuario en una expresión MATCH de FTS5.
+
+    Cada palabra se entrecomilla (para que caracteres como '-' o '*' no se
+    interpreten como operadores) y se busca como prefijo; todas las palabras
+    deben aparecer.
+
+    Returns:
+        str o None: Expresión MATCH, o None si el texto no contiene palabras
+
+    Ejemplo:
+        >>> build_match_query('Poesía  completa')
+        '"Poesía"* "completa"*'
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_book_ids(text, limit=SEARCH_LIMIT):
+    """
+    Busca libros en el índice FTS5 ordenados por relevancia (BM25).
+
+    Args:
+        text (str): Texto de búsqueda
+        limit (int): Número máximo de resultados
+
+    Returns:
+        list[int]: IDs de los libros encontrados, del más al menos relevante
+    """
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s",
+            [match, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def index_book(book):
+    """Añade o reemplaza un libro en el índice de búsqueda."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)",
+            [book.pk, book.name, book.description or ''],
+        )
+
+
+def index_books(books):
+    """
+    Añade o reemplaza varios libros en el índice de búsqueda con dos sentencias.
+
+    Lo usan las operaciones masivas, que no disparan los signals de Book:
+    BookQuerySet.update()/bulk_update() y el importador (libros nuevos).
+    """
+    rows = [(book.pk, book.name, book.description or '') for book in books]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", rows)
+
+
+def unindex_book(book_id):
+    """Elimina un libro del índice de búsqueda."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book_id])
+
+
+def rebuild_index(books):
+    """
+    Reconstruye el índice de búsqueda desde cero.
+
+    Args:
+        books (QuerySet): Libros a indexar (normalmente Book.objects.all())
+
+    Returns:
+        int: Número de libros indexados
+    """
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_FTS_TABLE)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+        rows = books.values_list('id', 'name', 'description').iterator(chunk_size=REBUILD_BATCH_SIZE)
+        batch = []
+        for book_id, name, description in rows:
+            batch.append((book_id, name, description or ''))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)", batch)
+            total += len(batch)
+
+        # Compactar los segmentos del índice tras la carga masiva
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+    return total
@@ -0,0 +1,407 @@
+import logging
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+
+from .cache import suggestions_version
+
+
+logger = logging.getLogger(__name__)
+
+
+# Tipos de entrada del índice
+BOOK = 0
+CATEGORY = 1
+KIND_NAMES = {BOOK: 'book', CATEGORY: 'category'}
+
+# Tipo de cambio del registro que obliga a reconstruir el índice entero
+REBUILD = 2
+
+# Sugerencias devueltas por defecto
+SUGGEST_LIMIT = 10
+
+# Candidatos máximos evaluados en la búsqueda aproximada por trigramas
+MAX_FUZZY_CANDIDATES = 500
+
+# Similitud mínima (coeficiente de Dice sobre trigramas) para una sugerencia aproximada
+MIN_SIMILARITY = 0.3
+
+# Separador de los textos dentro de las cadenas compactas
+SEPARATOR = '\x00'
+
+# Cambios pendientes (sobre la copia) a partir de los cuales se reconstruye el índice
+MAX_PENDING_CHANGES = 1000
+
+# Antigüedad (en segundos) a partir de la cual se borran los cambios del registro
+# (SuggestionChange). Un proceso que lleva más de la mitad sin sincronizarse
+# reconstruye su copia en lugar de leer los cambios, que podrían faltar.
+CHANGE_LOG_RETENTION = 7 * 24 * 60 * 60
+
+
+def normalize(text):
+    """
+    Normaliza un texto para compararlo: minúsculas, sin acentos y sin espacios repetidos.
+
+    Ejemplo:
+        >>> normalize('  Poesía   Completa ')
+        'poesia completa'
+    """
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    without_accents = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(without_accents.split())
+
+
+def trigrams(normalized):
+    """Retorna el conjunto de trigramas de un texto normalizado (con bordes en blanco)."""
+    padded = f' {normalized} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(first, second):
+    """Coeficiente de Dice entre dos conjuntos de trigramas (0 = nada en común, 1 = iguales)."""
+    return 2 * len(first & second) / (len(first) + len(second))
+
+
+class SuggestionEntries():
+    """
+    Copia inmutable de las entradas del índice, en estructuras compactas.
+
+    Para que ocupe poco en memoria con catálogos grandes, los textos se guardan
+    concatenados en una sola cadena y el resto de datos en arrays compactos de
+    enteros en lugar de objetos Python por entrada:
+
+        text / text_offsets        Títulos normalizados y su posición
+        labels / label_offsets     Títulos originales (para mostrar)
+        kinds, ids                 Tipo (BOOK/CATEGORY) e id de cada entrada
+        order                      Entradas ordenadas por título normalizado
+        postings                   Trigrama -> array de entradas que lo contienen
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries (iterable): Tuplas (kind, id, label)
+        """
+        kinds = array('B')
+        ids = array('Q')
+        text_parts = []
+        label_parts = []
+        text_offsets = array('I')
+        label_offsets = array('I')
+        postings = {}
+
+        text_position = 0
+        label_position = 0
+        for index, (kind, object_id, label) in enumerate(entries):
+            normalized = normalize(label)
+
+            kinds.append(kind)
+            ids.append(object_id)
+            text_offsets.append(text_position)
+            label_offsets.append(label_position)
+            text_parts.append(normalized)
+            label_parts.append(label)
+            text_position += len(normalized) + 1
+            label_position += len(label) + 1
+
+            for trigram in trigrams(normalized):
+                posting = postings.get(trigram)
+                if posting is None:
+                    posting = postings[trigram] = array('I')
+                posting.append(index)
+
+        self.kinds = kinds
+        self.ids = ids
+        self.text = SEPARATOR.join(text_parts)
+        self.labels = SEPARATOR.join(label_parts)
+        self.text_offsets = text_offsets
+        self.label_offsets = label_offsets
+        self.postings = postings
+        self.order = array('I', sorted(range(len(kinds)), key=lambda index: text_parts[index]))
+
+    def normalized(self, index):
+        """Título normalizado de la entrada index."""
+        start = self.text_offsets[index]
+        end = self.text.find(SEPARATOR, start)
+        return self.text[start:] if end == -1 else self.text[start:end]
+
+    def label(self, index):
+        """Título original de la entrada index."""
+        start = self.label_offsets[index]
+        end = self.labels.find(SEPARATOR, start)
+        return self.labels[start:] if end == -1 else self.labels[start:end]
+
+    def key(self, index):
+        return self.kinds[index], self.ids[index]
+
+
+class SuggestionIndex():
+    """
+    Índice en memoria de títulos de libros y nombres de categorías para el autocompletado.
+
+    Admite búsqueda por prefijo (búsqueda binaria sobre los títulos ordenados)
+    y búsqueda aproximada por trigramas, que tolera erratas y coincidencias en
+    mitad del título. Cada worker mantiene su propia copia (SuggestionEntries).
+
+    Los cambios de libros y categorías se anotan en un registro compartido
+    (SuggestionChange: signals en models.py, QuerySet.update()/bulk_update() y
+    manage.py import_catalog) y cambian una versión en la caché. En cada
+    búsqueda, si la versión ha cambiado, el proceso lee solo los cambios
+    nuevos del registro y los guarda en _pending, que se combina con la copia
+    al buscar. Cuando se acumulan MAX_PENDING_CHANGES, la copia se reconstruye
+    en un hilo aparte y se sustituye de una vez; mientras tanto se sigue
+    respondiendo con la anterior.
+    """
+
+    def __init__(self, source):
+        """
+        Args:
+            source: Origen de los datos (ver DatabaseSource), con los métodos
+                version(), last_change(), changes(after, limit), entries() y
+                prune(older_than)
+        """
+        self._source = source
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        # (copia, {(kind, id): label o None si se borró}): se sustituye entera,
+        # nunca se modifica, para que las búsquedas vean siempre un par coherente
+        self._state = None
+        self._version = None
+        self._last_change = 0
+        self._synced_at = 0.0
+
+    def build(self):
+        """
+        Construye la copia completa desde el origen y la pone en uso.
+
+        La versión y el último cambio se leen antes que las entradas: los
+        cambios hechos durante la carga se vuelven a leer del registro después.
+        """
+        version = self._source.version()
+        last_change = self._source.last_change()
+        entries = SuggestionEntries(self._source.entries())
+        with self._lock:
+            self._state = (entries, {})
+            self._version = version
+            self._last_change = last_change
+            self._synced_at = time.monotonic()
+
+    def _rebuild_in_background(self):
+        """Reconstruye la copia en un hilo, sin bloquear las búsquedas."""
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.build()
+                self._source.prune(CHANGE_LOG_RETENTION)
+            except Exception:
+                logger.exception('No se pudo reconstruir el índice de autocompletado')
+            finally:
+                self._rebuilding = False
+                self._source.close()
+
+        threading.Thread(target=run, name='suggestion-index', daemon=True).start()
+
+    def refresh(self):
+        """
+        Pone la copia al día con los cambios del registro, si la versión ha cambiado.
+
+        La primera vez construye la copia completa. Las demás solo lee los
+        cambios nuevos (una consulta por el índice del registro); si son
+        demasiados, o el proceso lleva demasiado sin sincronizarse, encarga
+        una reconstrucción en segundo plano.
+        """
+        if self._state is None:
+            with self._lock:
+                built = self._state is not None
+            if not built:
+                self.build()
+            return
+
+        version = self._source.version()
+        if version == self._version or self._rebuilding:
+            return
+        # Si otro hilo ya está leyendo los cambios, se responde con la copia actual
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if version == self._version:
+                return
+            if time.monotonic() - self._synced_at > CHANGE_LOG_RETENTION / 2:
+                changes = None
+            else:
+                changes = self._source.changes(self._last_change, MAX_PENDING_CHANGES)
+
+            if (changes is None or len(changes) >= MAX_PENDING_CHANGES
+                    or any(change[1] == REBUILD for change in changes)):
+                rebuild = True
+            else:
+                entries, pending = self._state
+                pending = dict(pending)
+                for sequence, kind, object_id, label in changes:
+                    pending[(kind, object_id)] = label
+                    self._last_change = sequence
+                self._state = (entries, pending)
+                self._version = version
+                self._synced_at = time.monotonic()
+                rebuild = len(pending) >= MAX_PENDING_CHANGES
+        finally:
+            self._lock.release()
+
+        if rebuild:
+            self._rebuild_in_background()
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """
+        Retorna sugerencias para el texto escrito por el usuario.
+
+        Primero las entradas cuyo título empieza por el texto (las más cortas
+        primero) y después, si faltan, las más parecidas por trigramas.
+
+        Args:
+            query (str): Texto escrito hasta el momento
+            limit (int): Número máximo de sugerencias
+
+        Returns:
+            list[tuple]: Sugerencias (kind, id, label)
+
+        Ejemplo:
+            >>> suggestion_index.suggest('poes')
+            [(1, 3, 'Poesía'), (0, 12, 'Poesía completa')]
+        """
+        normalized = normalize(query)
+        if not normalized:
+            return []
+
+        self.refresh()
+        entries, pending = self._state
+
+        results = []
+        seen = set()
+
+        def add(kind, object_id, label):
+            key = (kind, object_id)
+            if key not in seen:
+                seen.add(key)
+                results.append((kind, object_id, label))
+
+        # Cambios pendientes (pocos): se comparan directamente
+        pending_matches = []
+        for (kind, object_id), label in pending.items():
+            if label is None:
+                continue
+            candidate = normalize(label)
+            if candidate.startswith(normalized):
+                pending_matches.append((len(candidate), kind, object_id, label))
+
+        # Coincidencias por prefijo: búsqueda binaria sobre los títulos ordenados
+        prefix_matches = []
+        order = entries.order
+        position = bisect_left(order, normalized, key=entries.normalized)
+        while position < len(order) and len(prefix_matches) < limit * 4:
+            index = order[position]
+            candidate = entries.normalized(index)
+            if not candidate.startswith(normalized):
+                break
+            key = entries.key(index)
+            if key not in pending:
+                prefix_matches.append((len(candidate), key[0], key[1], entries.label(index)))
+            position += 1
+
+        for _, kind, object_id, label in sorted(pending_matches + prefix_matches):
+            add(kind, object_id, label)
+            if len(results) >= limit:
+                return results
+
+        # Coincidencias aproximadas por trigramas
+        for kind, object_id, label in self._fuzzy(entries, pending, normalized):
+            add(kind, object_id, label)
+            if len(results) >= limit:
+                break
+
+        return results
+
+    def _fuzzy(self, entries, pending, normalized):
+        """Entradas parecidas al texto por trigramas, de mayor a menor similitud."""
+        query_trigrams = trigrams(normalized)
+
+        # Recorrer primero los trigramas menos frecuentes para acotar los candidatos
+        postings = sorted(
+            (entries.postings[trigram] for trigram in query_trigrams if trigram in entries.postings),
+            key=len,
+        )
+        candidates = set()
+        for posting in postings:
+            candidates.update(posting[:MAX_FUZZY_CANDIDATES - len(candidates)])
+            if len(candidates) >= MAX_FUZZY_CANDIDATES:
+                break
+
+        scored = []
+        for index in candidates:
+            key = entries.key(index)
+            if key in pending:
+                continue
+            score = similarity(query_trigrams, trigrams(entries.normalized(index)))
+            if score >= MIN_SIMILARITY:
+                scored.append((-score, key[0], key[1], entries.label(index)))
+
+        for (kind, object_id), label in pending.items():
+            if label is None:
+                continue
+            score = similarity(query_trigrams, trigrams(normalize(label)))
+            if score >= MIN_SIMILARITY:
+                scored.append((-score, kind, object_id, label))
+
+        scored.sort()
+        return [(kind, object_id, label) for _, kind, object_id, label in scored]
+
+
+class DatabaseSource():
+    """Entradas del índice desde Book y Category, y cambios desde el registro SuggestionChange."""
+
+    def version(self):
+        return suggestions_version()
+
+    def last_change(self):
+        from .models import SuggestionChange
+        return SuggestionChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def changes(self, after, limit):
+        """Cambios posteriores a after, en orden: tuplas (id, kind, object_id, label o None)."""
+        from .models import SuggestionChange
+        return list(
+            SuggestionChange.objects.filter(id__gt=after).order_by('id')
+            .values_list('id', 'kind', 'object_id', 'label')[:limit]
+        )
+
+    def entries(self):
+        """Todas las entradas: títulos de libros y nombres de categorías."""
+        from .models import Book, Category
+
+        for category_id, name in Category.objects.values_list('id', 'name').iterator():
+            yield CATEGORY, category_id, name
+        for book_id, name in Book.objects.values_list('id', 'name').iterator(chunk_size=5000):
+            yield BOOK, book_id, name
+
+    def prune(self, older_than):
+        """Borra los cambios del registro con más de older_than segundos."""
+        import datetime
+        from django.utils import timezone
+        from .models import SuggestionChange
+
+        cutoff = timezone.now() - datetime.timedelta(seconds=older_than)
+        SuggestionChange.objects.filter(created_at__lt=cutoff).delete()
+
+    def close(self):
+        """Cierra la conexión a la base de datos del hilo actual (hilo de reconstrucción)."""
+        from django.db import connection
+        connection.close()
+
+
+# Índice del proceso actual (uno por worker)
+suggestion_index = SuggestionIndex(DatabaseSource())
@@ -0,0 +1,105 @@
+from django import template
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.template.loader import get_template
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+
+from store.images import VARIANTS, derivative_name, has_derivatives
+
+
+register = template.Library()
+
+# Duración de las tarjetas cacheadas (la versión del libro ya invalida las antiguas)
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def card_cache_key(template_name, book):
+    """Clave de caché de la tarjeta de un libro: plantilla, id y versión del libro."""
+    return f'card:{template_name}:{book.pk}:{book.version}'
+
+
+@register.simple_tag
+def product_cards(products, template_name):
+    """
+    Renderiza las tarjetas de una lista de libros usando la caché de fragmentos.
+
+    Cada tarjeta se cachea con la clave (plantilla, id, versión del libro);
+    Book.version se incrementa en cada guardado, así que una tarjeta cambia
+    de clave en cuanto cambia el libro y no hace falta borrarla. Todas las
+    tarjetas de la página se leen con un único get_many y solo se renderizan
+    (y se guardan con un único set_many) las que faltan.
+
+    Args:
+        products (iterable): Libros a mostrar (deben incluir version)
+        template_name (str): Plantilla de una tarjeta; recibe 'product'
+
+    Returns:
+        str: HTML de todas las tarjetas, en el orden de products
+
+    Ejemplo:
+        {% load catalog_tags %}
+        {% product_cards products 'product_card.html' %}
+    """
+    products = list(products)
+    keys = [card_cache_key(template_name, product) for product in products]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    card_template = None
+    for key, product in zip(keys, products):
+        if key not in cached and key not in missing:
+            if card_template is None:
+                card_template = get_template(template_name)
+            missing[key] = card_template.render({'product': product})
+
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cached.update(missing)
+
+    return mark_safe(''.join(cached[key] for key in keys))
+
+
+@register.simple_tag
+def book_image(book, variant='card', loading='lazy', **attrs):
+    """
+    Etiqueta <picture> con las variantes redimensionadas de la portada de un libro.
+
+    Emite un <source> WebP y un <img> JPEG de respaldo, ambos con srcset de
+    todas las variantes y el sizes de la variante pedida, para que el
+    navegador descargue solo el tamaño que necesita. Mientras las variantes no
+    existan (ver store.images) se usa la imagen original.
+
+    Args:
+        book (Book): Libro cuya portada se muestra
+        variant (str): Variante de referencia ('thumb', 'card' o 'detail')
+        loading (str): 'lazy' (por defecto) o 'eager' para imágenes visibles al cargar
+        **attrs: Atributos adicionales del <img> (class, style...)
+
+    Ejemplo:
+        {% book_image product 'card' class="card-img-top" %}
+    """
+    image_name = book.image.name
+    extra = format_html_join('', ' {}="{}"', sorted(attrs.items()))
+
+    if not image_name or not has_derivatives(image_name):
+        return format_html(
+            '<img src="{}" alt="{}" loading="{}" decoding="async"{}>',
+            book.image.url if image_name else '', book.name, loading, extra,
+        )
+
+    _, sizes = VARIANTS[variant]
+
+    def srcset(extension):
+        return ', '.join(
+            f'{default_storage.url(derivative_name(image_name, name, extension))} {width}w'
+            for name, (width, _) in VARIANTS.items()
+        )
+
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" loading="{}" decoding="async"{}></picture>',
+        srcset('webp'), sizes,
+        default_storage.url(derivative_name(image_name, variant, 'jpg')), srcset('jpg'), sizes,
+        book.name, loading, extra,
+    )
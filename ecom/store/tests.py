@@ -1,3 +1,584 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from payment.models import Order, OrderItem
+
+from .cache import category_menu, scope_versions
+from .checks import shared_cache_check
+from .images import content_name, derivative_names
+from .models import Book, BookRecommendation, Category, get_price_version
+from .pagination import PAGE_SIZE, InvalidCursor, encode_cursor, keyset_paginate
+from .recommendations import TOP_K, build_recommendations, recommendations_for, reset_recommendations
+from .search import search_book_ids
+from .suggest import BOOK, DatabaseSource, SuggestionIndex
+
+
+class CatalogTestCase(TestCase):
+    """Catálogo con una página y media de libros, con la caché vacía en cada test."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Teatro')
+        Book.objects.bulk_create([
+            Book(name=f'Libro {number}', price=number + 1, effective_price=number + 1, category=category)
+            for number in range(PAGE_SIZE + PAGE_SIZE // 2)
+        ])
+
+
+class PageCacheTests(CatalogTestCase):
+
+    def test_cached_fragment_keeps_next_page_headers(self):
+        """El scroll infinito sigue funcionando cuando el fragmento se sirve desde la caché."""
+        first = self.client.get(reverse('product_list'))
+        second = self.client.get(reverse('product_list'))
+
+        self.assertIn('X-Next-Fragment', first)
+        self.assertEqual(second['X-Next-Fragment'], first['X-Next-Fragment'])
+        self.assertEqual(second['X-Next-Page'], first['X-Next-Page'])
+        self.assertEqual(second.content, first.content)
+
+    def test_new_visitors_do_not_get_a_session(self):
+        for _ in range(2):
+            response = self.client.get(reverse('home'))
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+
+class KeysetCursorTests(CatalogTestCase):
+
+    def test_tampered_cursor_is_rejected(self):
+        for cursor in (encode_cursor('abc', 1), encode_cursor('1e999', 1), encode_cursor(None, 1), 'no-es-un-cursor'):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                keyset_paginate(Book.objects.all(), 'price', cursor)
+
+    def test_tampered_cursor_shows_the_first_page(self):
+        response = self.client.get(reverse('home'), {'sort': 'price', 'after': encode_cursor('abc', 1)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['products']), PAGE_SIZE)
+
+    def test_valid_cursor_continues_after_the_last_book(self):
+        first = keyset_paginate(Book.objects.all(), 'price')
+        second = keyset_paginate(Book.objects.all(), 'price', first.next_cursor)
+        self.assertEqual(second.items[0].effective_price, first.items[-1].effective_price + 1)
+        self.assertFalse(second.has_next)
+
+
+class BookApiTests(CatalogTestCase):
+
+    def test_tampered_cursor_is_a_json_400(self):
+        response = self.client.get(reverse('api_book_list'), {'sort': 'price', 'after': encode_cursor('abc', 1)})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+
+class BookSaveTests(TestCase):
+
+    def setUp(self):
+        self.book = Book.objects.create(name='Hamlet', price=10, category=Category.objects.create(name='Teatro'))
+
+    def test_update_fields_keeps_effective_price(self):
+        self.book.is_sale = True
+        self.book.sale_price = 7
+        self.book.save(update_fields=['is_sale', 'sale_price'])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.effective_price, 7)
+
+    def test_update_fields_bumps_version_and_updated_at(self):
+        updated_at = self.book.updated_at
+        self.book.price = 12
+        self.book.save(update_fields=['price'])
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.version, 2)
+        self.assertGreater(self.book.updated_at, updated_at)
+
+
+class BookBulkUpdateTests(TestCase):
+    """update()/bulk_update() hacen lo mismo que los signals de save()."""
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(name='Hamlet', price=10, category=Category.objects.create(name='Teatro'))
+        self.scopes = ['home', f'product:{self.book.pk}', f'category:{self.book.category_id}']
+
+    def assertInvalidated(self, change):
+        price_version = get_price_version()
+        scopes = scope_versions(self.scopes)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.version, 2)
+        self.assertNotEqual(get_price_version(), price_version)
+        for before, after in zip(scopes, scope_versions(self.scopes)):
+            self.assertNotEqual(after, before)
+
+    def test_update(self):
+        self.assertInvalidated(lambda: Book.objects.filter(pk=self.book.pk).update(name='Macbeth', price=12))
+        self.assertEqual(self.book.effective_price, 12)
+        self.assertEqual(search_book_ids('macbeth'), [self.book.pk])
+        self.assertEqual(search_book_ids('hamlet'), [])
+
+    def test_bulk_update(self):
+        self.book.name = 'Macbeth'
+        self.book.is_sale = True
+        self.book.sale_price = 7
+        self.assertInvalidated(lambda: Book.objects.bulk_update([self.book], ['name', 'is_sale', 'sale_price']))
+        self.assertEqual(self.book.effective_price, 7)
+        self.assertEqual(search_book_ids('macbeth'), [self.book.pk])
+
+    def test_untracked_fields_are_a_plain_update(self):
+        Book.objects.filter(pk=self.book.pk).update(stock=3)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.version, 1)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Poesía')
+        self.in_title = Book.objects.create(name='Poesía completa', price=10, category=category)
+        self.in_description = Book.objects.create(
+            name='Antología', description='Selección de poesía del siglo de oro', price=10, category=category,
+        )
+        Book.objects.create(name='Hamlet', description='Tragedia', price=10, category=category)
+
+    def test_accents_and_case_are_folded(self):
+        for query in ('poesia', 'POESÍA', 'Poesia'):
+            with self.subTest(query=query):
+                self.assertEqual(set(search_book_ids(query)), {self.in_title.pk, self.in_description.pk})
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(search_book_ids('poesia'), [self.in_title.pk, self.in_description.pk])
+
+    def test_words_are_prefixes_and_all_must_match(self):
+        self.assertEqual(search_book_ids('poes compl'), [self.in_title.pk])
+        self.assertEqual(search_book_ids('poesia tragedia'), [])
+
+    def test_operators_are_not_interpreted(self):
+        self.assertEqual(search_book_ids('"hamlet" OR -*'), [])
+        self.assertEqual(search_book_ids('*?'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.in_title.name = 'Versos'
+        self.in_title.save()
+        self.assertEqual(search_book_ids('versos'), [self.in_title.pk])
+        self.in_description.delete()
+        self.assertEqual(search_book_ids('poesia'), [])
+
+    def test_search_page_keeps_the_ranking(self):
+        response = self.client.get(reverse('search'), {'q': 'poesia'})
+        self.assertEqual([book.pk for book in response.context['products']], [self.in_title.pk, self.in_description.pk])
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name='Teatro')
+        self.old = Book.objects.create(name='Hamlet', price=10, category=category)
+        self.new = Book.objects.create(name='Macbeth', price=8, category=category)
+        Book.objects.filter(pk=self.old.pk).update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        staff = User.objects.create(username='admin', is_staff=True)
+        self.client.force_login(staff)
+
+    def export(self, name, **params):
+        return self.client.get(reverse('export', args=name.split('.')), params)
+
+    def test_csv_is_streamed_with_a_header(self):
+        response = self.export('books.csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="books.csv"')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['name'] for row in rows], ['Hamlet', 'Macbeth'])
+        self.assertEqual(rows[1]['effective_price'], '8.00')
+
+    def test_since_exports_only_recent_changes(self):
+        for since in ('2021-01-01', '2021-01-01T00:00:00+00:00'):
+            with self.subTest(since=since):
+                response = self.export('books.jsonl', since=since)
+                lines = b''.join(response.streaming_content).decode().splitlines()
+                self.assertEqual([json.loads(line)['id'] for line in lines], [self.new.pk])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.export('books.csv', since='ayer').status_code, 400)
+        self.assertEqual(self.export('users.csv').status_code, 404)
+        self.assertEqual(self.export('books.xml').status_code, 404)
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertRedirects(self.export('books.csv'), reverse('home'), fetch_redirect_response=False)
+
+    def test_command_writes_to_stdout(self):
+        output = io.StringIO()
+        call_command('export_data', 'books', '--format', 'jsonl', '--since', '2021-01-01', stdout=output)
+        self.assertEqual([json.loads(line)['name'] for line in output.getvalue().splitlines()], ['Macbeth'])
+
+
+class ImportCommandTests(TestCase):
+
+    rows = [
+        'name,price,sale_price,is_sale,category',
+        'Hamlet,10,,,Teatro',
+        'Macbeth,8,6,1,Teatro',
+        'Sin precio,abc,,,Teatro',
+        'Odisea,12,,,Épica',
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = Path(self.directory, 'libros.csv')
+        self.path.write_text('\n'.join(self.rows) + '\n')
+        self.checkpoint = Path(f'{self.path}.checkpoint')
+
+    def run_import(self, *args):
+        output = io.StringIO()
+        call_command('import_catalog', str(self.path), '--workers', '1', *args, stdout=output, stderr=io.StringIO())
+        return output.getvalue()
+
+    def books(self):
+        return dict(Book.objects.values_list('name', 'effective_price'))
+
+    def test_import(self):
+        output = self.run_import()
+        self.assertIn('3 libros creados', output)
+        self.assertIn('1 con errores', output)
+        self.assertEqual(self.books(), {'Hamlet': 10, 'Macbeth': 6, 'Odisea': 12})
+        self.assertEqual(set(Category.objects.values_list('name', flat=True)), {'Teatro', 'Épica'})
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_dry_run_rolls_everything_back(self):
+        output = self.run_import('--dry-run')
+        self.assertIn('Simulación', output)
+        self.assertIn('3 libros creados', output)
+        self.assertEqual(self.books(), {})
+        self.assertFalse(Category.objects.exists())
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_resume_skips_the_rows_already_imported(self):
+        self.run_import('--batch-size', '2')
+        Book.objects.filter(name='Odisea').delete()
+        self.checkpoint.write_text('3')
+
+        output = self.run_import('--resume')
+
+        self.assertIn('(3 ya importadas antes)', output)
+        self.assertIn('1 libros creados', output)
+        self.assertEqual(set(self.books()), {'Hamlet', 'Macbeth', 'Odisea'})
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_reimport_updates_only_changed_books(self):
+        self.run_import()
+        self.path.write_text('name,price,category\nHamlet,11,Teatro\nMacbeth,8,Teatro\n')
+        output = self.run_import()
+        self.assertIn('0 libros creados, 1 actualizados, 1 sin cambios', output)
+        self.assertEqual(Book.objects.get(name='Hamlet').effective_price, 11)
+
+    def test_invalid_checkpoint_is_rejected(self):
+        self.checkpoint.write_text('ayer')
+        with self.assertRaises(CommandError):
+            self.run_import('--resume')
+
+
+class RecommendationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Teatro')
+        self.books = Book.objects.bulk_create([
+            Book(name=f'Libro {number}', price=10, category=category) for number in range(TOP_K + 3)
+        ])
+
+    def order(self, *books, settled=True):
+        order = Order.objects.create(full_name='Ana', email='ana@example.com', shipping_address='Calle 1', amount_paid=10)
+        if settled:
+            Order.objects.filter(pk=order.pk).update(date_ordered=timezone.now() - datetime.timedelta(hours=1))
+        OrderItem.objects.bulk_create([OrderItem(order=order, product=book, price=10) for book in books])
+
+    def top(self, book):
+        return list(BookRecommendation.objects.filter(book=book).order_by('rank').values_list('recommended_id', 'score'))
+
+    def test_top_k_by_co_purchases_then_id(self):
+        main, *others = self.books
+        for book, times in zip(others, (1, 3, 2, 1, 2, 1)):
+            for _ in range(times):
+                self.order(main, book)
+
+        build_recommendations()
+
+        expected = sorted(((book.pk, times) for book, times in zip(others, (1, 3, 2, 1, 2, 1))), key=lambda item: (-item[1], item[0]))
+        self.assertEqual(self.top(main), expected[:TOP_K])
+        self.assertEqual(self.top(others[1]), [(main.pk, 3)])
+
+    def test_incremental_build_matches_a_full_rebuild(self):
+        main, *others = self.books
+        for book in others[:TOP_K]:
+            self.order(main, book)
+            self.order(main, book)
+        build_recommendations()
+
+        # Un libro que no estaba en el top-K lo supera con los pedidos nuevos
+        for _ in range(3):
+            self.order(main, others[-1], others[0])
+        build_recommendations()
+        incremental = {book.pk: self.top(book) for book in self.books}
+
+        reset_recommendations()
+        build_recommendations()
+        self.assertEqual({book.pk: self.top(book) for book in self.books}, incremental)
+        self.assertEqual(incremental[main.pk][:2], [(others[0].pk, 5), (others[-1].pk, 3)])
+
+    def test_recent_orders_wait_until_they_settle(self):
+        main, other = self.books[:2]
+        self.order(main, other, settled=False)
+        self.assertEqual(build_recommendations()['orders'], 0)
+        self.assertEqual(self.top(main), [])
+
+    def test_product_page_shows_the_recommendations(self):
+        main, other = self.books[:2]
+        self.assertEqual(recommendations_for(main.pk), [])
+        self.order(main, other)
+        with self.captureOnCommitCallbacks(execute=True):
+            build_recommendations()
+        self.assertEqual([book.pk for book in recommendations_for(main.pk)], [other.pk])
+
+
+class CategoryMenuTests(TestCase):
+
+    def test_category_missing_from_a_stale_menu_is_found(self):
+        cache.clear()
+        category_menu()
+        # bulk_create() no dispara los signals que invalidan el menú
+        Category.objects.bulk_create([Category(name='Poesía', slug='poesia')])
+
+        response = self.client.get(reverse('category', args=['poesia']))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['category'].name, 'Poesía')
+        self.assertIn('poesia', [category.slug for category in category_menu()])
+
+
+class SuggestionIndexTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(name='Hamlet', price=10, category=Category.objects.create(name='Teatro'))
+        # Copia de otro proceso del servidor
+        self.index = SuggestionIndex(DatabaseSource())
+
+    def labels(self, query):
+        return [label for _, _, label in self.index.suggest(query)]
+
+    def test_other_processes_see_saved_titles(self):
+        self.assertEqual(self.labels('haml'), ['Hamlet'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.name = 'Macbeth'
+            self.book.save()
+        self.assertEqual(self.labels('macb'), ['Macbeth'])
+
+    def test_other_processes_see_bulk_updates(self):
+        self.assertEqual(self.labels('haml'), ['Hamlet'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(pk=self.book.pk).update(name='Otelo')
+        self.assertEqual(self.labels('otel'), ['Otelo'])
+        self.assertEqual(self.labels('haml'), [])
+
+    def test_changes_are_applied_without_a_rebuild(self):
+        self.index.suggest('haml')
+        entries, _ = self.index._state
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.delete()
+            Book.objects.create(name='Otelo', price=9, category=Category.objects.get())
+        self.assertEqual(self.labels('otel'), ['Otelo'])
+        self.assertEqual(self.labels('haml'), [])
+        # La copia sigue siendo la misma; los cambios están en la capa de pendientes
+        self.assertIs(self.index._state[0], entries)
+
+    def test_rebuild_swaps_the_whole_index(self):
+        self.index.suggest('haml')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.name = 'Macbeth'
+            self.book.save()
+        self.index.build()
+        entries, pending = self.index._state
+        self.assertEqual(pending, {})
+        self.assertEqual([entries.key(index) for index in range(len(entries.ids))][-1], (BOOK, self.book.pk))
+        self.assertEqual(self.labels('macb'), ['Macbeth'])
+
+
+class DerivativeNameTests(SimpleTestCase):
+
+    def test_originals_with_the_same_stem_do_not_share_variants(self):
+        png = set(derivative_names('uploads/products/Hamlet.png'))
+        jpg = set(derivative_names('uploads/products/Hamlet.jpg'))
+        self.assertFalse(png & jpg)
+
+
+class MediaTestCase(SimpleTestCase):
+    """MEDIA_ROOT temporal con una portada copiada con content_name()."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.content = bytes(range(256)) * 4
+        source = Path(self.media_root) / 'Hamlet.png'
+        source.write_bytes(self.content)
+        self.name = content_name('uploads/products/', str(source))
+        self.write(self.name)
+
+    def write(self, name):
+        path = Path(self.media_root) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(self.content)
+
+    def get(self, name, **headers):
+        return self.client.get(reverse('media', args=[name]), headers=headers)
+
+
+class MediaCacheControlTests(MediaTestCase):
+
+    def test_content_named_files_and_their_variants_are_immutable(self):
+        for name in [self.name, *derivative_names(self.name)]:
+            self.write(name)
+            with self.subTest(name=name):
+                self.assertIn('immutable', self.get(name)['Cache-Control'])
+
+    def test_other_files_are_revalidated(self):
+        self.write('uploads/products/Hamlet.png')
+        self.assertNotIn('immutable', self.get('uploads/products/Hamlet.png')['Cache-Control'])
+
+
+class MediaRangeTests(MediaTestCase):
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_file(self):
+        response = self.get(self.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), self.content)
+
+    def test_ranges(self):
+        size = len(self.content)
+        for header, start, end in (('bytes=0-99', 0, 99), ('bytes=1000-', 1000, size - 1),
+                                   ('bytes=-24', size - 24, size - 1), ('bytes=10-99999', 10, size - 1)):
+            with self.subTest(header=header):
+                response = self.get(self.name, Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(self.body(response), self.content[start:end + 1])
+
+    def test_unsatisfiable_range_is_a_416(self):
+        for header in (f'bytes={len(self.content)}-', 'bytes=-0', 'bytes=50-10'):
+            with self.subTest(header=header):
+                response = self.get(self.name, Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_invalid_or_multiple_ranges_serve_the_whole_file(self):
+        for header in ('bytes=0-1,5-9', 'items=0-9', 'bytes=-'):
+            with self.subTest(header=header):
+                self.assertEqual(self.get(self.name, Range=header).status_code, 200)
+
+    def test_if_range(self):
+        etag = self.get(self.name)['ETag']
+        self.assertEqual(self.get(self.name, Range='bytes=0-9', If_Range=etag).status_code, 206)
+        self.assertEqual(self.get(self.name, Range='bytes=0-9', If_Range='"otra-version"').status_code, 200)
+
+    def test_conditional_get_is_a_304(self):
+        first = self.get(self.name)
+        for headers in ({'If-None-Match': first['ETag']}, {'If-Modified-Since': first['Last-Modified']}):
+            with self.subTest(headers=headers):
+                response = self.get(self.name, **headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], first['ETag'])
+
+    def test_missing_files_and_paths_outside_media_root_are_a_404(self):
+        self.assertEqual(self.get('uploads/products/no-existe.png').status_code, 404)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+
+
+class StaticFilesTests(SimpleTestCase):
+    """collectstatic con el almacenamiento del proyecto y PrecompressedStaticMiddleware."""
+
+    css = '/* Estilos */\nbody  {\n    color: #333;\n    margin: 0;\n}\n' * 20
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        source = tempfile.mkdtemp()
+        cls.static_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, source)
+        cls.addClassCleanup(shutil.rmtree, cls.static_root)
+        Path(source, 'styles.css').write_text(cls.css)
+
+        settings_override = override_settings(STATICFILES_DIRS=[source], STATIC_ROOT=cls.static_root)
+        settings_override.enable()
+        cls.addClassCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.name = staticfiles_storage.stored_name('styles.css')
+
+    def get(self, name, **headers):
+        return self.client.get(settings.STATIC_URL + name, headers=headers)
+
+    def test_hash_is_computed_from_the_minified_file(self):
+        content = Path(self.static_root, self.name).read_bytes()
+        self.assertLess(len(content), len(self.css))
+        self.assertNotIn(b'/*', content)
+        self.assertIn(hashlib.md5(content).hexdigest()[:12], self.name)
+
+    def test_gzip_copy_matches_the_hashed_file(self):
+        path = Path(self.static_root, self.name)
+        self.assertEqual(gzip.decompress(Path(f'{path}.gz').read_bytes()), path.read_bytes())
+
+    def test_compressed_version_is_served_when_accepted(self):
+        response = self.get(self.name, Accept_Encoding='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), Path(self.static_root, self.name).read_bytes())
+
+    def test_original_is_served_otherwise(self):
+        for headers in ({}, {'Accept_Encoding': 'gzip;q=0'}):
+            with self.subTest(headers=headers):
+                response = self.get(self.name, **headers)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_revalidation_is_a_304_per_encoding(self):
+        plain = self.get(self.name)
+        compressed = self.get(self.name, Accept_Encoding='gzip')
+        self.assertNotEqual(plain['ETag'], compressed['ETag'])
+        self.assertEqual(self.get(self.name, Accept_Encoding='gzip', If_None_Match=compressed['ETag']).status_code, 304)
+
+    def test_unhashed_names_are_revalidated(self):
+        self.assertNotIn('immutable', self.get('styles.css')['Cache-Control'])
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_is_rejected(self):
+        self.assertEqual([error.id for error in shared_cache_check(None)], ['store.E001'])
+
+    def test_configured_cache_is_shared(self):
+        self.assertEqual(shared_cache_check(None), [])
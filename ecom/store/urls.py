@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 
 urlpatterns = [
@@ -15,9 +15,19 @@ urlpatterns = [
 
 
     path('product/<int:product_id>/', views.product, name='product'),
-    path('category/<str:category_name>', views.category, name='category'),
+    path('category/<str:category_slug>', views.category, name='category'),
     path('category_summary/', views.category_summary, name='category_summary'),
     path('search/', views.search, name='search'),
+    path('suggest/', views.suggest, name='suggest'),
+    path('products/', views.product_list, name='product_list'),
+
+    # API JSON de solo lectura (ver store/api.py)
+    path('api/books/', api.book_list, name='api_book_list'),
+    path('api/books/<int:book_id>/', api.book_detail, name='api_book_detail'),
+    path('api/categories/', api.category_list, name='api_category_list'),
+
+    # Exportaciones en streaming (solo staff); ver store/exports.py
+    path('export/<str:dataset>.<str:export_format>', views.export, name='export'),
 
 
 
@@ -1,5 +1,7 @@
 
 from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.http import JsonResponse, StreamingHttpResponse
 from .models import Book, Category, Profile
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
@@ -11,17 +13,26 @@ from payment.forms import ShippingForm
 from payment.models import ShippingAddress
 
 from .forms import SignUpForm, UpdateUserForm, ChangePasswordForm, UserInfoForm
+from .cache import cache_anonymous_page, conditional_page, category_by_id, category_by_slug, category_menu, category_scope
+from .exports import DATASETS, FORMATS, export_lines, parse_since
+from .facets import CatalogFilters, facet_counts
+from .pagination import InvalidCursor, keyset_paginate
+from .recommendations import recommendations_for
+from .search import fts_enabled, search_book_ids, SEARCH_LIMIT
+from .suggest import suggestion_index, BOOK, KIND_NAMES
 from django.db.models import Q
+from django.db.models.functions import Greatest
 from cart.cart import Cart
-import json
 
 
 def search(request):
     """
     Vista de búsqueda de libros.
     
-    Permite buscar libros por nombre o descripción usando una consulta de texto.
-    Utiliza Q objects de Django para realizar búsquedas case-insensitive en múltiples campos.
+    Busca en el índice de texto completo (FTS5) por título y descripción,
+    ordenando por relevancia (BM25). No distingue mayúsculas ni acentos:
+    "poesia" encuentra "Poesía". La búsqueda usa GET para que los resultados
+    se puedan enlazar y cachear; se sigue aceptando el formulario POST antiguo.
     
     Args:
         request (HttpRequest): Objeto de solicitud HTTP.
@@ -30,25 +41,59 @@ def search(request):
         HttpResponse: Página de resultados de búsqueda con los libros encontrados.
     
     Ejemplos:
-        POST /search/ con {'searched': 'python'}
-        Retorna libros que contengan 'python' en nombre o descripción.
+        GET /search/?q=poesia
+        Retorna los libros que contengan palabras que empiecen por "poesia"
+        en el título o la descripción, los más relevantes primero.
     """
-    # Determine if they filled out the form
-    if request.method == "POST":
-        searched = request.POST['searched']
-        
-        # Query the Books DB Model
-        products = Book.objects.filter(Q(name__icontains=searched)|Q(description__icontains = searched))
-        
-        # Test for null
-        if not products.exists():
-            messages.success(request, "That Product Does Not Exist")
-            return render(request, 'search.html', {})
-        else:
-            return render(request, 'search.html', {'searched': searched, 'products': products})
-    else:
+    searched = request.GET.get('q') or request.POST.get('searched', '')
+    searched = searched.strip()
+
+    if not searched:
         return render(request, 'search.html', {})
 
+    if fts_enabled():
+        # Índice FTS5: IDs ordenados por relevancia
+        book_ids = search_book_ids(searched)
+        books_by_id = Book.objects.cards().in_bulk(book_ids)
+        products = [books_by_id[book_id] for book_id in book_ids if book_id in books_by_id]
+    else:
+        # Bases de datos sin FTS5: búsqueda por subcadena
+        products = list(Book.objects.cards().filter(Q(name__icontains=searched) | Q(description__icontains=searched))[:SEARCH_LIMIT])
+
+    return render(request, 'search.html', {'searched': searched, 'products': products})
+
+
+def suggest(request):
+    """
+    Vista JSON de autocompletado para el buscador.
+    
+    Consulta el índice en memoria de títulos y categorías (store.suggest),
+    sin acceder a la base de datos salvo para construir el índice la primera vez.
+    
+    Args:
+        request (HttpRequest): Solicitud GET con el texto escrito en q.
+    
+    Returns:
+        JsonResponse: Lista de sugerencias con tipo, id, texto y URL.
+    
+    Ejemplos:
+        GET /suggest/?q=poes
+        Retorna {"results": [{"type": "category", "id": 3, "label": "Poesía",
+                 "url": "/category/poesia"}, ...]}
+    """
+    results = []
+    for kind, object_id, label in suggestion_index.suggest(request.GET.get('q', '')):
+        if kind == BOOK:
+            url = reverse('product', args=[object_id])
+        else:
+            category = category_by_id(object_id)
+            if category is None:
+                continue
+            url = category.get_absolute_url()
+        results.append({'type': KIND_NAMES[kind], 'id': object_id, 'label': label, 'url': url})
+
+    return JsonResponse({'results': results})
+
 
 def update_info(request):
     """
@@ -89,6 +134,13 @@ def update_info(request):
         return redirect('home')
 
 
+def _catalog_scopes(request):
+    """Ámbitos de caché de las páginas que solo dependen de las categorías."""
+    return ['catalog']
+
+
+@conditional_page(_catalog_scopes)
+@cache_anonymous_page(_catalog_scopes)
 def category_summary(request):
     """
     Vista que muestra un resumen de todas las categorías de libros disponibles.
@@ -99,40 +151,59 @@ def category_summary(request):
     Returns:
         HttpResponse: Página con listado completo de categorías.
     """
-    categories = Category.objects.all()
-    return render(request, 'category_summary.html', {"categories": categories })
+    return render(request, 'category_summary.html', {"categories": category_menu()})
+
 
+def _category_scopes(request, category_slug):
+    """Ámbitos de caché de la página de una categoría."""
+    return ['catalog', category_scope(category_slug)]
 
-def category(request, category_name):
+
+@conditional_page(_category_scopes)
+@cache_anonymous_page(_category_scopes)
+def category(request, category_slug):
     """
     Vista que muestra todos los libros de una categoría específica.
     
-    Recibe el nombre de la categoría desde la URL, reemplaza guiones por espacios
-    y filtra los libros que pertenecen a dicha categoría.
+    La categoría se busca por su slug en el menú de categorías cacheado (solo
+    se consulta la base de datos si no está en él), así que la página solo
+    consulta sus libros, paginados por cursor y con los filtros de oferta y
+    precio (ver store.facets).
+    Las URLs antiguas con el nombre de la categoría redirigen a la del slug.
     
     Args:
         request (HttpRequest): Objeto de solicitud HTTP.
-        category_name (str): Nombre de la categoría desde la URL.
+        category_slug (str): Slug de la categoría desde la URL.
     
     Returns:
         HttpResponse: Página con libros de la categoría o redirección si no existe.
     
     Ejemplos:
-        /category/ciencia-ficcion/ → Muestra libros de "ciencia ficcion"
+        /category/ciencia-ficcion → Muestra libros de "Ciencia ficción"
+        /category/Ciencia ficción → Redirige a /category/ciencia-ficcion
     """
-    # Replace Hyphens with Spaces
-    category_name = category_name.replace('-', ' ')
-    
-    # Grab the category from the URL
-    try:
-        # Look Up The Category
-        category = Category.objects.get(name=category_name)
-        products = Book.objects.filter(category=category)
-        return render(request, 'category.html', {'products': products, 'category': category})
-    except Category.DoesNotExist:
+    category = category_by_slug(category_slug)
+    if category is None:
+        # URLs antiguas: nombre de la categoría, con guiones en lugar de espacios
+        legacy = Category.objects.filter(
+            Q(name=category_slug) | Q(name=category_slug.replace('-', ' '))
+        ).only('slug').first()
+        if legacy is not None:
+            return redirect(legacy, permanent=True)
+
         messages.success(request, "That Category Doesn't Exist")
         return redirect('home')
 
+    filters = CatalogFilters(request.GET, category_id=category.id)
+    page = _paginate(request, filters.apply(Book.objects.cards()), category=category.id)
+    return render(request, 'category.html', {
+        'products': page.items,
+        'page': page,
+        'category': category,
+        'filters': filters,
+        'facets': facet_counts(Book.objects.filter(category_id=category.id), filters),
+    })
+
 
 
 def update_password(request):
@@ -206,6 +277,20 @@ def update_user(request):
 
 
 
+def _product_scopes(request, product_id):
+    """Ámbitos de caché de la ficha de un libro."""
+    return ['catalog', f'product:{product_id}']
+
+
+def _product_last_modified(request, product_id):
+    """Última modificación de la ficha: la del libro o la de su categoría (una consulta por clave primaria)."""
+    return Book.objects.filter(pk=product_id).values_list(
+        Greatest('updated_at', 'category__updated_at'), flat=True
+    ).first()
+
+
+@conditional_page(_product_scopes, last_modified=_product_last_modified)
+@cache_anonymous_page(_product_scopes, csrf_cookie=True)
 def product(request, product_id):
     """
     Vista de detalle de un libro específico.
@@ -215,24 +300,106 @@ def product(request, product_id):
         product_id (int): ID del libro a mostrar.
     
     Returns:
-        HttpResponse: Página con detalles completos del libro.
+        HttpResponse: Página con detalles completos del libro y los libros que
+            los clientes también compraron (ver store.recommendations).
     """
-    product = Book.objects.get(id=product_id)
-    return render(request, 'product.html', {'product': product})
+    product = Book.objects.detail().get(id=product_id)
+    return render(request, 'product.html', {
+        'product': product,
+        'recommendations': recommendations_for(product.id),
+    })
 
+def _home_scopes(request):
+    """Ámbitos de caché del listado de inicio."""
+    return ['catalog', 'home']
+
+
+@conditional_page(_home_scopes)
+@cache_anonymous_page(_home_scopes)
 def home(request):
     """
-    Vista principal que muestra el catálogo completo de libros.
+    Vista principal que muestra el catálogo de libros paginado por cursor,
+    con filtros por categoría, oferta y precio y sus recuentos (ver store.facets).
     
     Args:
         request (HttpRequest): Objeto de solicitud HTTP.
     
     Returns:
-        HttpResponse: Página de inicio con todos los libros disponibles.
+        HttpResponse: Página de inicio con una página de libros.
+    
+    Ejemplos:
+        /?sort=price&after=<cursor> → Siguiente página ordenada por precio
+        /?category=3&sale=1&price=10-20&sort=newest → Ofertas de 10 a 20 $ de la categoría 3
     """
-    products = Book.objects.all()
-    return render(request, 'home.html', {'products': products})
+    filters = CatalogFilters(request.GET)
+    page = _paginate(request, filters.apply(Book.objects.cards()))
+    return render(request, 'home.html', {
+        'products': page.items,
+        'page': page,
+        'filters': filters,
+        'facets': facet_counts(Book.objects.all(), filters),
+    })
+
+
+def _product_list_scopes(request):
+    """Ámbitos de caché del fragmento de tarjetas: el de la categoría filtrada o el de home."""
+    category_id = request.GET.get('category')
+    if category_id and category_id.isdigit():
+        return ['catalog', f'category:{category_id}']
+    return ['catalog', 'home']
+
+
+@conditional_page(_product_list_scopes)
+@cache_anonymous_page(_product_list_scopes)
+def product_list(request):
+    """
+    Fragmento HTML con una página de tarjetas de libros (scroll infinito).
+    
+    Devuelve solo las tarjetas (product_cards.html) para añadirlas a la rejilla
+    del listado. La URL de la página siguiente va en las cabeceras X-Next-Fragment
+    (este fragmento) y X-Next-Page (la página completa equivalente).
+    
+    Args:
+        request (HttpRequest): Solicitud GET con los filtros de CatalogFilters
+            (category, sale, price, min_price, max_price), sort y after.
+    
+    Returns:
+        HttpResponse: Fragmento HTML con las tarjetas de la página.
+    """
+    page = _paginate(request, CatalogFilters(request.GET).apply(Book.objects.cards()))
+    response = render(request, 'product_cards.html', {'products': page.items})
+    if page.has_next:
+        response['X-Next-Fragment'] = page.next_fragment_url
+        response['X-Next-Page'] = page.next_url
+    return response
+
+
+def _paginate(request, books, **fragment_params):
+    """
+    Pagina un queryset de libros por cursor según ?sort= y ?after=.
+    
+    Además de la página, calcula las URLs de la página siguiente: next_url
+    (misma vista) y next_fragment_url (vista product_list con los mismos filtros).
+    Un cursor no válido (manipulado o truncado) muestra la primera página.
+    """
+    try:
+        page = keyset_paginate(books, request.GET.get('sort'), request.GET.get('after'))
+    except InvalidCursor:
+        page = keyset_paginate(books, request.GET.get('sort'))
+
+    if page.has_next:
+        params = request.GET.copy()
+        params['after'] = page.next_cursor
+        page.next_url = f'{request.path}?{params.urlencode()}'
 
+        fragment = params.copy()
+        for key, value in fragment_params.items():
+            fragment[key] = value
+        page.next_fragment_url = f"{reverse('product_list')}?{fragment.urlencode()}"
+
+    return page
+
+@cache_anonymous_page(_catalog_scopes)
 def about(request):
     """
     Vista de la página "Acerca de".
@@ -250,9 +417,8 @@ def login_user(request):
     """
     Vista de inicio de sesión de usuario.
     
-    Autentica al usuario y restaura su carrito guardado desde la base de datos.
-    Convierte el carrito almacenado en formato JSON a un diccionario de Python
-    y lo carga en la sesión actual.
+    Autentica al usuario y restaura su carrito guardado desde la base de datos,
+    fusionándolo con el carrito de la sesión actual.
     
     Args:
         request (HttpRequest): Objeto de solicitud HTTP.
@@ -261,8 +427,8 @@ def login_user(request):
         HttpResponse: Redirección a home o formulario de login.
     
     Notas:
-        - Restaura el carrito antiguo del campo old_cart del Profile.
-        - Usa json.loads() para deserializar el carrito guardado.
+        - Lee las líneas guardadas en CartItem con una sola consulta.
+        - CartPersistenceMiddleware guarda el carrito resultante con una sola escritura.
     """
     if request.method == "POST":
         username = request.POST['username']
@@ -272,22 +438,9 @@ def login_user(request):
         if user is not None:
             login(request, user)
 
-            # Do some shopping cart stuff
-            current_user = Profile.objects.get(user_id=request.user.id)
-
-            # Get their saved cart from database
-            saved_cart = current_user.old_cart
-
-            # Convert database string to Python dictionary
-            if saved_cart:
-                converted_cart = json.loads(saved_cart)
-
-                # Get the cart instance
-                cart = Cart(request)
-
-                # Loop through the cart and add the items from saved_cart
-                for key, value in converted_cart.items():
-                    cart.db_add(product=key, quantity=value)
+            # Fusionar el carrito guardado con el de la sesión
+            cart = Cart(request)
+            cart.merge_saved()
 
             messages.success(request, "You Have Been Logged In")
             return redirect('home')
@@ -347,3 +500,40 @@ def register_user(request):
             return redirect('register')
     else:
         return render(request, 'register.html', {'form': form})
+
+
+def export(request, dataset, export_format):
+    """
+    Descarga en streaming de libros, categorías, pedidos o líneas de pedido (solo staff).
+    
+    El archivo se genera fila a fila mientras se envía (ver store.exports),
+    así que la memoria usada no depende del tamaño de la tabla.
+    
+    Args:
+        request (HttpRequest): Solicitud GET; ?since= para exportar solo
+            lo creado o modificado desde una fecha (ISO 8601).
+        dataset (str): books, categories, orders u order_items.
+        export_format (str): csv o jsonl.
+    
+    Returns:
+        StreamingHttpResponse: Archivo descargable.
+    
+    Ejemplos:
+        /export/order_items.csv?since=2026-10-01
+    """
+    if not (request.user.is_authenticated and request.user.is_staff):
+        messages.error(request, "Acceso Denegado - Solo Administradores")
+        return redirect('home')
+
+    if dataset not in DATASETS or export_format not in FORMATS:
+        return JsonResponse({'error': 'Exportación no disponible'}, status=404)
+
+    try:
+        since = parse_since(request.GET.get('since'))
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_lines(dataset, export_format, since), content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{export_format}"'
+    return response